@@ -21,8 +21,9 @@
 ##########################################################################
 
 from twisted.web import static, resource, http, server
-from enigma import eServiceCenter, eServiceReference, iServiceInformation
+from enigma import eServiceReference, iServiceInformation
 from base import BaseController
+from models.servicelist import serviceListSnapshot, getBouquetNumbering
 from Components.config import config
 from Components.ParentalControl import parentalControl
 import os
@@ -257,27 +258,14 @@ class BQEWebController(BaseController):
 		elif ' "bouquets.tv" ' in sRef:
 			CalcPos = True
 
-		serviceHandler = eServiceCenter.getInstance()
-		serviceslist = serviceHandler.list(eServiceReference(sRef))
-		fulllist = serviceslist and serviceslist.getContent("RN", True)
+		fulllist = serviceListSnapshot.getContent(sRef, "RN")
+
+		if CalcPos:
+			# the bouquet editor counts the services of all bouquets
+			startpos = getBouquetNumbering(sRef, allbouquets=True).startpos
 
 		pos = 0
-		oPos = 0
 		for item in fulllist:
-			
-			oldoPos = oPos
-			if CalcPos:
-				sref = item[0].toString()
-				serviceslist = serviceHandler.list(eServiceReference(sref))
-				sfulllist = serviceslist and serviceslist.getContent("RN", True)
-				for sitem in sfulllist:
-					sref = sitem[0].toString()
-					hs = (int(sref.split(":")[1]) & 512)
-					sp = (sref[:7] == '1:832:D')
-					if not hs or sp:  # 512 is hidden service on sifteam image. Doesn't affect other images
-						oPos = oPos + 1
-						if not sp and sitem[0].flags & eServiceReference.isMarker:
-							oPos = oPos - 1
 			sref = item[0].toString()
 			hs = (int(sref.split(":")[1]) & 512)
 			sp = (sref[:7] == '1:832:D')
@@ -285,7 +273,7 @@ class BQEWebController(BaseController):
 				pos = pos + 1
 				service = {}
 				if CalcPos:
-					service['startpos'] = oldoPos
+					service['startpos'] = startpos.get(sref, 0)
 				service['pos'] = pos
 				service['servicereference'] = sref
 				service['isgroup'] = '0'
@@ -300,8 +288,7 @@ class BQEWebController(BaseController):
 						gservices = []
 						service['isgroup'] = '1'
 						#get members of group
-						gserviceslist = serviceHandler.list(eServiceReference(sref))
-						gfulllist = gserviceslist and gserviceslist.getContent("RN", True)
+						gfulllist = serviceListSnapshot.getContent(sref, "RN")
 						for gitem in gfulllist:
 							gservice = {}
 							gservice['servicereference'] = gitem[0].toString()
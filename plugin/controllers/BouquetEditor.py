@@ -19,6 +19,7 @@ from ServiceReference import ServiceReference
 from Components.ParentalControl import parentalControl
 from re import compile as re_compile
 from Components.NimManager import nimmanager
+from models.servicelist import serviceListSnapshot
 
 
 class BouquetEditor(Source):
@@ -84,6 +85,8 @@ class BouquetEditor(Source):
 			self.result = self.importBouquet(cmd)
 		else:
 			self.result = (False, _("one two three four unknown command"))
+		if self.func is not self.BACKUP:
+			serviceListSnapshot.invalidate()
 
 	def addToBouquet(self, param):
 		print "[WebComponents.BouquetEditor] addToBouquet with param = ", param
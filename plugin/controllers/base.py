@@ -23,7 +23,9 @@
 import os
 import imp
 import json
+import hashlib
 
+from twisted.internet import reactor
 from twisted.web import server, http, resource
 from twisted.web.resource import EncodingResourceWrapper
 from twisted.web.server import GzipEncoderFactory
@@ -39,7 +41,8 @@ from models.info import getInfo
 from models.config import getCollapsedMenus, getConfigsSections
 from models.config import getShowName, getCustomName, getBoxName
 
-from defaults import getPublicPath, getViewsPath
+from defaults import getPublicPath, getViewsPath, VIEWS_PATH
+from metrics import metrics
 
 def new_getRequestHostname(self):
 	host = self.getHeader(b'host')
@@ -52,6 +55,11 @@ def new_getRequestHostname(self):
 
 http.Request.getRequestHostname = new_getRequestHostname
 
+try:
+	import ujson
+except ImportError:
+	ujson = None
+
 REMOTE = ''
 
 try:
@@ -62,6 +70,102 @@ except:  # noqa: E722
 	REMOTE = rc_model().getRcFolder()
 
 
+def dumpJson(data, pretty=False):
+	"""
+	Serialize an API response. Compact unless `pretty` is set, using
+	ujson when it is installed and able to encode the data.
+	"""
+	if pretty:
+		return json.dumps(data, indent=1)
+	if ujson is not None:
+		try:
+			return ujson.dumps(data)
+		except Exception:
+			pass
+	return json.dumps(data, separators=(',', ':'))
+
+
+class TemplateRegistry(object):
+	"""
+	Process wide registry of compiled view templates.
+
+	Every view is resolved (.pyo, .py or .tmpl, in that order) and compiled
+	once; the generated class is reused for each render until the mtime of
+	its source file changes.
+	"""
+	EXTENSIONS = (".pyo", ".py", ".tmpl")
+
+	def __init__(self):
+		# base path (without extension) -> (filename, mtime, isTmpl, class)
+		self.templates = {}
+
+	def get(self, base, module):
+		entry = self.templates.get(base)
+		if entry is not None:
+			try:
+				mtime = os.stat(entry[0]).st_mtime
+			except OSError:
+				mtime = None
+			if mtime == entry[1]:
+				return entry[2:]
+			del self.templates[base]
+		return self.load(base, module)
+
+	def load(self, base, module):
+		for ext in self.EXTENSIONS:
+			filename = base + ext
+			if fileExists(filename):
+				break
+		else:
+			return None
+		mtime = os.stat(filename).st_mtime
+		if ext == ".tmpl":
+			entry = (filename, mtime, True, Template.compile(file=filename))
+		else:
+			# load every view under its own module name, views sharing a
+			# basename (e.g. ajax/index and mobile/index) must not clobber
+			# each other's globals
+			name = "owif_view_" + base.replace(VIEWS_PATH, "").strip("/").replace("/", "_")
+			if ext == ".pyo":
+				template = imp.load_compiled(name, filename)
+			else:
+				template = imp.load_source(name, filename)
+			mod = getattr(template, module, None)
+			if not callable(mod):
+				return None
+			entry = (filename, mtime, False, mod)
+		self.templates[base] = entry
+		return entry[2:]
+
+	def warmUp(self):
+		"""
+		Compile all templates below the views folder, one per reactor
+		iteration so that the web server stays responsive meanwhile.
+		"""
+		bases = set()
+		for root, dirs, files in os.walk(VIEWS_PATH):
+			for filename in files:
+				name, ext = os.path.splitext(filename)
+				if ext in self.EXTENSIONS and name != "__init__":
+					bases.add(os.path.join(root, name))
+		self._warmUpNext(sorted(bases))
+
+	def _warmUpNext(self, bases):
+		while bases:
+			base = bases.pop(0)
+			if base in self.templates:
+				continue
+			try:
+				self.load(base, os.path.basename(base))
+			except Exception as exc:
+				print "[OpenWebif] failed to precompile template '%s': %s" % (base, exc)
+			reactor.callLater(0, self._warmUpNext, bases)
+			return
+
+
+templates = TemplateRegistry()
+
+
 class BaseController(resource.Resource):
 	"""
 	Web Base Controller
@@ -104,17 +208,12 @@ class BaseController(resource.Resource):
 		request.finish()
 
 	def loadTemplate(self, path, module, args):
-		if fileExists(getViewsPath(path + ".py")) or fileExists(getViewsPath(path + ".pyo")):
-			if fileExists(getViewsPath(path + ".pyo")):
-				template = imp.load_compiled(module, getViewsPath(path + ".pyo"))
-			else:
-				template = imp.load_source(module, getViewsPath(path + ".py"))
-			mod = getattr(template, module, None)
-			if callable(mod):
-				return str(mod(searchList=args))
-		elif fileExists(getViewsPath(path + ".tmpl")):
-			return str(Template(file=getViewsPath(path + ".tmpl"), searchList=[args]))
-		return None
+		template = templates.get(getViewsPath(path), module)
+		if template is None:
+			return None
+		if template[0]:
+			return str(template[1](searchList=[args]))
+		return str(template[1](searchList=args))
 
 	def putGZChild(self, path, child):
 		child.isGZ = True
@@ -163,57 +262,102 @@ class BaseController(resource.Resource):
 			if callable(plfunc):
 				plfunc(request)
 
-			data = func(request)
-			if data is None:
-				# if not self.suppresslog:
-					# print "[OpenWebif] page '%s' without content" % request.uri
-				self.error404(request)
-			elif self.isCustom:
-				# if not self.suppresslog:
-					# print "[OpenWebif] page '%s' ok (custom)" % request.uri
-				request.write(data)
-				request.finish()
-			elif self.isJson:
-				request.setHeader("content-type", "application/json; charset=utf-8")
-				try:
-					return json.dumps(data, indent=1)
-				except Exception as exc:
-					request.setResponseCode(http.INTERNAL_SERVER_ERROR)
-					return json.dumps({"result": False, "request": request.path, "exception": repr(exc)})
-					pass
-			elif type(data) is str:
-				# if not self.suppresslog:
-					# print "[OpenWebif] page '%s' ok (simple string)" % request.uri
-				request.setHeader("content-type", "text/plain")
-				request.write(data)
-				request.finish()
-			else:
-				# print "[OpenWebif] page '%s' ok (cheetah template)" % request.uri
-				module = request.path
-				if module[-1] == "/":
-					module += "index"
-				elif module[-5:] != "index" and self.path == "index":
-					module += "/index"
-				module = module.strip("/")
-				module = module.replace(".", "")
-				out = self.loadTemplate(module, self.path, data)
-				if out is None:
-					print "[OpenWebif] ERROR! Template not found for page '%s'" % request.uri
+			timing = None
+			if metrics.enabled:
+				name = self.path if func.__name__ == "noData" else func.__name__[2:]
+				timing = metrics.start("/".join((request.prepath[:1] or [""]) + [name]))
+
+			try:
+				data = func(request)
+			except Exception:
+				if timing:
+					timing.finish(error=True)
+				raise
+			if timing:
+				timing.lap("handler")
+
+			try:
+				if data is None:
+					# if not self.suppresslog:
+						# print "[OpenWebif] page '%s' without content" % request.uri
 					self.error404(request)
-				else:
-					if self.isMobile:
-						head = self.loadTemplate('mobile/head', 'head', [])
-						out = head + out
-					elif self.withMainTemplate:
-						args = self.prepareMainTemplate(request)
-						args["content"] = out
-						nout = self.loadTemplate("main", "main", args)
-						if nout:
-							out = nout
-					elif self.isGZ:
-						return out
-					request.write(out)
+					if timing:
+						timing.finish(error=True)
+				elif data is server.NOT_DONE_YET:
+					# the handler writes and finishes the response itself,
+					# possibly later through a producer
+					if timing:
+						timing.watch(request)
+				elif self.isCustom:
+					# if not self.suppresslog:
+						# print "[OpenWebif] page '%s' ok (custom)" % request.uri
+					request.write(data)
 					request.finish()
+					if timing:
+						timing.finish(len(data))
+				elif self.isJson:
+					request.setHeader("content-type", "application/json; charset=utf-8")
+					error = False
+					try:
+						out = dumpJson(data, request.args.get("pretty", ["0"])[0] == "1")
+					except Exception as exc:
+						request.setResponseCode(http.INTERNAL_SERVER_ERROR)
+						out = json.dumps({"result": False, "request": request.path, "exception": repr(exc)})
+						error = True
+					if not error and config.OpenWebif.json_etag.value:
+						etag = '"%s"' % hashlib.sha256(out).hexdigest()[:32]
+						request.setHeader("etag", etag)
+						if etag in (request.getHeader("if-none-match") or ""):
+							request.setResponseCode(http.NOT_MODIFIED)
+							out = ""
+					if timing:
+						timing.lap("serialize")
+						timing.finish(len(out), error)
+					return out
+				elif type(data) is str:
+					# if not self.suppresslog:
+						# print "[OpenWebif] page '%s' ok (simple string)" % request.uri
+					request.setHeader("content-type", "text/plain")
+					request.write(data)
+					request.finish()
+					if timing:
+						timing.finish(len(data))
+				else:
+					# print "[OpenWebif] page '%s' ok (cheetah template)" % request.uri
+					module = request.path
+					if module[-1] == "/":
+						module += "index"
+					elif module[-5:] != "index" and self.path == "index":
+						module += "/index"
+					module = module.strip("/")
+					module = module.replace(".", "")
+					out = self.loadTemplate(module, self.path, data)
+					if out is None:
+						print "[OpenWebif] ERROR! Template not found for page '%s'" % request.uri
+						self.error404(request)
+						if timing:
+							timing.finish(error=True)
+					else:
+						if self.isMobile:
+							head = self.loadTemplate('mobile/head', 'head', [])
+							out = head + out
+						elif self.withMainTemplate:
+							args = self.prepareMainTemplate(request)
+							args["content"] = out
+							nout = self.loadTemplate("main", "main", args)
+							if nout:
+								out = nout
+						if timing:
+							timing.lap("template")
+							timing.finish(len(out))
+						if self.isGZ and not self.isMobile and not self.withMainTemplate:
+							return out
+						request.write(out)
+						request.finish()
+			except Exception:
+				if timing:
+					timing.finish(error=True)
+				raise
 
 		else:
 			print "[OpenWebif] page '%s' not found" % request.uri
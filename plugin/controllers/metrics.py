@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#                        2019 E2OpenPlugins                                  #
+#                                                                            #
+#  This file is open source software; you can redistribute it and/or modify  #
+#     it under the terms of the GNU General Public License version 2 as      #
+#               published by the Free Software Foundation.                   #
+#                                                                            #
+##############################################################################
+from time import time
+
+#: upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#: phases a request is split into
+PHASES = ('handler', 'template', 'serialize')
+
+
+class EndpointStats(object):
+	def __init__(self):
+		self.count = 0
+		self.errors = 0
+		self.bytes = 0
+		self.duration = 0.0
+		self.buckets = [0] * (len(BUCKETS) + 1)
+		self.phases = dict((phase, 0.0) for phase in PHASES)
+
+	def add(self, duration, phases, size, error):
+		self.count += 1
+		self.duration += duration
+		self.bytes += size
+		if error:
+			self.errors += 1
+		for phase, value in phases.iteritems():
+			self.phases[phase] += value
+		for i, bound in enumerate(BUCKETS):
+			if duration <= bound:
+				self.buckets[i] += 1
+				return
+		self.buckets[-1] += 1
+
+	def toDict(self):
+		return {
+			"count": self.count,
+			"errors": self.errors,
+			"bytes": self.bytes,
+			"duration": self.duration,
+			"phases": self.phases,
+			"histogram": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], self.buckets)),
+		}
+
+
+class RequestTiming(object):
+	"""
+	Timing of a single request, split into the phases of BaseController.render.
+	"""
+	def __init__(self, metrics, endpoint):
+		self.metrics = metrics
+		self.endpoint = endpoint
+		self.begin = self.last = time()
+		self.phases = {}
+		self.size = 0
+		self.finished = False
+
+	def lap(self, phase):
+		now = time()
+		self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+		self.last = now
+
+	def finish(self, size=0, error=False):
+		# only the first call counts, e.g. when rendering fails after a
+		# response was already recorded
+		if self.finished:
+			return
+		self.finished = True
+		self.metrics.record(self.endpoint, time() - self.begin, self.phases, size, error)
+
+	def watch(self, request):
+		"""
+		Finish once a response written outside of render, e.g. by a
+		producer, is complete, counting the bytes written until then. A
+		connection lost before counts as an error.
+		"""
+		if request.finished:
+			self.finish()
+			return
+		write = request.write
+
+		def countingWrite(data):
+			self.size += len(data)
+			write(data)
+		request.write = countingWrite
+		request.notifyFinish().addCallbacks(
+			lambda result: self.finish(self.size),
+			lambda failure: self.finish(self.size, True))
+
+
+class Metrics(object):
+	"""
+	Per endpoint request statistics.
+
+	Nothing is recorded while `enabled` is False, callers are expected to
+	check it before calling start() so a disabled instrumentation costs a
+	single attribute lookup per request.
+	"""
+	def __init__(self):
+		self.enabled = False
+		self.since = time()
+		self.endpoints = {}
+
+	def start(self, endpoint):
+		return RequestTiming(self, endpoint)
+
+	def record(self, endpoint, duration, phases, size, error):
+		stats = self.endpoints.get(endpoint)
+		if stats is None:
+			stats = self.endpoints[endpoint] = EndpointStats()
+		stats.add(duration, phases, size, error)
+
+	def reset(self):
+		self.since = time()
+		self.endpoints = {}
+
+	def toDict(self):
+		return {
+			"enabled": self.enabled,
+			"since": int(self.since),
+			"endpoints": dict((k, v.toDict()) for k, v in self.endpoints.iteritems()),
+		}
+
+	def toPrometheus(self):
+		lines = []
+
+		def metric(name, kind, helptext):
+			lines.append("# HELP %s %s" % (name, helptext))
+			lines.append("# TYPE %s %s" % (name, kind))
+
+		endpoints = sorted(self.endpoints.iteritems())
+		metric("openwebif_requests_total", "counter", "Number of handled requests.")
+		for endpoint, stats in endpoints:
+			lines.append('openwebif_requests_total{endpoint="%s"} %d' % (endpoint, stats.count))
+		metric("openwebif_request_errors_total", "counter", "Number of failed requests.")
+		for endpoint, stats in endpoints:
+			lines.append('openwebif_request_errors_total{endpoint="%s"} %d' % (endpoint, stats.errors))
+		metric("openwebif_response_bytes_total", "counter", "Size of the response bodies.")
+		for endpoint, stats in endpoints:
+			lines.append('openwebif_response_bytes_total{endpoint="%s"} %d' % (endpoint, stats.bytes))
+		metric("openwebif_request_phase_seconds_total", "counter", "Time spent per request phase.")
+		for endpoint, stats in endpoints:
+			for phase in PHASES:
+				lines.append('openwebif_request_phase_seconds_total{endpoint="%s",phase="%s"} %f' % (endpoint, phase, stats.phases[phase]))
+		metric("openwebif_request_duration_seconds", "histogram", "Request latency.")
+		for endpoint, stats in endpoints:
+			cumulative = 0
+			for bound, value in zip([repr(b) for b in BUCKETS] + ["+Inf"], stats.buckets):
+				cumulative += value
+				lines.append('openwebif_request_duration_seconds_bucket{endpoint="%s",le="%s"} %d' % (endpoint, bound, cumulative))
+			lines.append('openwebif_request_duration_seconds_sum{endpoint="%s"} %f' % (endpoint, stats.duration))
+			lines.append('openwebif_request_duration_seconds_count{endpoint="%s"} %d' % (endpoint, stats.count))
+		return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -25,7 +25,7 @@ from models.movies import getMovieList
 from models.timers import getTimers
 from models.services import getBouquets, getChannels, getChannelEpg, getEvent, getPicon
 from urllib import quote
-from time import localtime, strftime
+from models.timeformat import formatClock
 
 from defaults import TRANSCODING
 
@@ -118,8 +118,8 @@ class MobileController(BaseController):
 			event['end'] = event['begin'] + event['duration']
 			event['duration'] = int(event['duration'] / 60)
 			event['start'] = event['begin']
-			event['begin'] = strftime("%H:%M", (localtime(event['begin'])))
-			event['end'] = strftime("%H:%M", (localtime(event['end'])))
+			event['begin'] = formatClock(event['begin'])
+			event['end'] = formatClock(event['end'])
 
 		return {"event": event}
 
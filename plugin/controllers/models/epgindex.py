@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#                        2019 E2OpenPlugins                                  #
+#                                                                            #
+#  This file is open source software; you can redistribute it and/or modify  #
+#     it under the terms of the GNU General Public License version 2 as      #
+#               published by the Free Software Foundation.                   #
+#                                                                            #
+##############################################################################
+import re
+from bisect import bisect_left
+from time import time
+
+from Components.config import config
+from enigma import eEPGCache
+from twisted.internet import reactor
+
+#: services looked up per reactor iteration while building
+BATCH_SIZE = 20
+#: minutes of EPG data indexed per service
+INDEX_MINUTES = 14 * 24 * 60
+#: seconds between two rebuilds
+REFRESH_INTERVAL = 1800
+#: completions returned for the last, incomplete query word
+MAX_COMPLETIONS = 10
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def epgText(text):
+	"""
+	EPG text as UTF-8. With an `epg_encoding` other than utf-8 configured,
+	the encoding getSearchEpg converts the search string to, text that
+	isn't valid UTF-8 is decoded from that encoding.
+	"""
+	if not text:
+		return text
+	encoding = config.OpenWebif.epg_encoding.value
+	if encoding == 'utf-8':
+		return text
+	try:
+		text.decode('utf-8')
+		return text
+	except UnicodeDecodeError:
+		return text.decode(encoding, 'replace').encode('utf-8')
+
+
+def tokenize(text):
+	if not text:
+		return []
+	if not isinstance(text, unicode):
+		text = text.decode("utf-8", "ignore")
+	return _WORD.findall(text.lower())
+
+
+class EpgSearchIndex(object):
+	"""
+	Inverted index over the titles and short descriptions of the EPG of
+	all services in the TV bouquets.
+
+	The index is built in batches of BATCH_SIZE services per reactor
+	iteration, so the web server stays responsive, and swapped in once
+	complete. It is rebuilt every REFRESH_INTERVAL seconds and after the
+	EPG has been loaded or saved. Until the first build is done `ready`
+	is False and callers are expected to fall back to eEPGCache.search.
+
+	Events are stored as (id, begin, duration, title, shortdesc, sref,
+	genre) tuples, service names in `names`, all texts converted to UTF-8
+	by epgText(); long descriptions are not kept to limit memory use.
+	"""
+	def __init__(self):
+		self.enabled = False
+		self.ready = False
+		self.built = 0
+		self.events = []
+		self.postings = {}
+		self.words = []
+		self.channels = {}
+		self.genres = {}
+		self.names = {}
+		self.building = None
+		self.timer = None
+
+	def start(self):
+		self.enabled = True
+		self.rebuild()
+
+	def stop(self):
+		self.enabled = False
+		self.building = None
+		if self.timer is not None and self.timer.active():
+			self.timer.cancel()
+		self.timer = None
+
+	def invalidate(self):
+		if self.enabled:
+			self.rebuild()
+
+	def rebuild(self):
+		# imported here, services imports this module for loadEpg/saveEpg
+		from services import getBouquetMembership
+		if self.timer is not None and self.timer.active():
+			self.timer.cancel()
+		self.timer = None
+		services = [sref for sref in getBouquetMembership("tv") if "FROM BOUQUET" not in sref]
+		self.building = {
+			"services": services,
+			"events": [],
+			"postings": {},
+			"channels": {},
+			"genres": {},
+			"names": {},
+		}
+		reactor.callLater(0, self._step, self.building)
+
+	def _step(self, state):
+		if state is not self.building:
+			# superseded by a newer rebuild or stopped
+			return
+		services = state["services"][:BATCH_SIZE]
+		del state["services"][:BATCH_SIZE]
+		if services:
+			query = ['IBDTSRWN']
+			for sref in services:
+				query.append((sref, 0, -1, INDEX_MINUTES))
+			for event in eEPGCache.getInstance().lookupEvent(query) or []:
+				if event[0] is None or event[1] is None:
+					continue
+				self._add(state, event)
+			reactor.callLater(0, self._step, state)
+			return
+		self.events = state["events"]
+		self.postings = state["postings"]
+		self.channels = state["channels"]
+		self.genres = state["genres"]
+		self.names = state["names"]
+		self.words = sorted(self.postings)
+		self.built = time()
+		self.ready = True
+		self.building = None
+		self.timer = reactor.callLater(REFRESH_INTERVAL, self.rebuild)
+
+	def _add(self, state, event):
+		index = len(state["events"])
+		genre = 0
+		if event[6]:
+			nibbles = event[6][0]
+			if len(nibbles) > 1 and nibbles[0] > 0:
+				genre = nibbles[0] * 16 + nibbles[1]
+		title = epgText(event[3])
+		shortdesc = epgText(event[4])
+		state["events"].append((event[0], event[1], event[2], title, shortdesc, event[5], genre))
+		postings = state["postings"]
+		for word in set(tokenize(title) + tokenize(shortdesc)):
+			if word in postings:
+				postings[word].append(index)
+			else:
+				postings[word] = [index]
+		if event[5] not in state["channels"]:
+			state["channels"][event[5]] = []
+			state["names"][event[5]] = epgText(event[7])
+		state["channels"][event[5]].append(index)
+		state["genres"].setdefault(genre, []).append(index)
+
+	def complete(self, prefix):
+		"""
+		Return the indexed words starting with `prefix`.
+		"""
+		words = []
+		i = bisect_left(self.words, prefix)
+		while i < len(self.words) and self.words[i].startswith(prefix):
+			words.append(self.words[i])
+			i += 1
+		return words
+
+	def search(self, query, limit=None, offset=0, channel=None, genre=None):
+		"""
+		Find the events containing all words of `query`, the last word
+		being completed as a prefix. Events which already ended are
+		skipped.
+
+		Args:
+			query (str): search words
+			limit (int): maximum number of events to return
+			offset (int): number of matching events to skip
+			channel (str): only return events of this service
+			genre (int): only return events of this genre id
+		Returns:
+			dict: events ordered by begin time, total number of matches,
+			completions of the last word and per service / genre counts
+		"""
+		words = tokenize(query)
+		if not words:
+			return {"events": [], "total": 0, "completions": [], "channels": {}, "genres": {}}
+
+		matches = None
+		for word in words[:-1]:
+			found = set(self.postings.get(word, ()))
+			matches = found if matches is None else matches & found
+			if not matches:
+				break
+		completions = self.complete(words[-1])
+		if matches is None or matches:
+			found = set()
+			for word in completions:
+				found.update(self.postings[word])
+			matches = found if matches is None else matches & found
+		if channel is not None:
+			matches &= set(self.channels.get(channel, ()))
+		if genre is not None:
+			matches &= set(self.genres.get(genre, ()))
+
+		now = time()
+		events = [self.events[i] for i in matches]
+		events = [event for event in events if event[1] + event[2] > now]
+		events.sort(key=lambda x: x[1])
+
+		channels = {}
+		genres = {}
+		for event in events:
+			channels[event[5]] = channels.get(event[5], 0) + 1
+			genres[event[6]] = genres.get(event[6], 0) + 1
+
+		total = len(events)
+		if limit is not None:
+			events = events[offset:offset + limit]
+		elif offset:
+			events = events[offset:]
+		return {
+			"events": events,
+			"total": total,
+			"completions": [word.encode("utf-8") for word in completions[:MAX_COMPLETIONS]],
+			"channels": channels,
+			"genres": genres,
+		}
+
+
+epgSearchIndex = EpgSearchIndex()
@@ -32,6 +32,8 @@ from ..i18n import _
 from ..defaults import OPENWEBIFVER, TRANSCODING
 from boxbranding import getImageDistro, getImageVersion, getImageBuild, getOEVersion
 from owibranding import getLcd, getGrabPip
+from servicelist import serviceListSnapshot
+from timeformat import formatClock
 
 
 def getEnigmaVersionString():
@@ -599,7 +601,7 @@ def getStreamEventName(ref):
 	return ""
 
 
-def getStatusInfo(self):
+def _buildStatusInfo(session):
 	# Get Current Volume and Mute Status
 	vcontrol = eDVBVolumecontrol.getInstance()
 	statusinfo = {
@@ -612,14 +614,14 @@ def getStatusInfo(self):
 
 	# Get currently running Service
 	event = None
-	serviceref = self.session.nav.getCurrentlyPlayingServiceReference()
+	serviceref = session.nav.getCurrentlyPlayingServiceReference()
 	serviceref_string = None
 	currservice_station = None
 	if serviceref is not None:
 		serviceHandler = eServiceCenter.getInstance()
 		serviceHandlerInfo = serviceHandler.info(serviceref)
 
-		service = self.session.nav.getCurrentService()
+		service = session.nav.getCurrentService()
 		serviceinfo = service and service.info()
 		event = serviceinfo and serviceinfo.getEvent(0)
 		serviceref_string = serviceref.toString()
@@ -636,9 +638,9 @@ def getStatusInfo(self):
 		end_timestamp = int(curEvent[1]) - (config.recording.margin_after.value * 60)
 		statusinfo['currservice_name'] = curEvent[2].replace('\xc2\x86', '').replace('\xc2\x87', '')
 		statusinfo['currservice_serviceref'] = serviceref_string
-		statusinfo['currservice_begin'] = time.strftime("%H:%M", (time.localtime(begin_timestamp)))
+		statusinfo['currservice_begin'] = formatClock(begin_timestamp)
 		statusinfo['currservice_begin_timestamp'] = begin_timestamp
-		statusinfo['currservice_end'] = time.strftime("%H:%M", (time.localtime(end_timestamp)))
+		statusinfo['currservice_end'] = formatClock(end_timestamp)
 		statusinfo['currservice_end_timestamp'] = end_timestamp
 		statusinfo['currservice_description'] = curEvent[3]
 		if len(curEvent[3].decode('utf-8')) > 220:
@@ -694,9 +696,83 @@ def getStatusInfo(self):
 	return statusinfo
 
 
+class StatusInfoSnapshot(object):
+	"""
+	The last result of _buildStatusInfo, shared by all pollers of
+	statusinfo.
+
+	The snapshot is rebuilt once it is older than `maxage` seconds, on
+	navigation and recording events, on standby transitions and when the
+	volume or mute state differ from the snapshot; the latter two are
+	cheap to read and have no change notification. `version` is bumped
+	whenever a rebuild yields different values, so etag() only changes
+	with the content.
+	"""
+	def __init__(self, maxage=5):
+		self.maxage = maxage
+		self.session = None
+		self.info = None
+		self.expires = 0
+		self.version = 0
+		self.started = int(time.time())
+
+	def attach(self, session):
+		self.detach()
+		self.session = session
+		session.nav.event.append(self.invalidate)
+		session.nav.record_event.append(self.invalidate)
+		config.misc.standbyCounter.addNotifier(self.onStandby, initial_call=False)
+
+	def detach(self):
+		if self.session is None:
+			return
+		if self.invalidate in self.session.nav.event:
+			self.session.nav.event.remove(self.invalidate)
+		if self.invalidate in self.session.nav.record_event:
+			self.session.nav.record_event.remove(self.invalidate)
+		config.misc.standbyCounter.removeNotifier(self.onStandby)
+		self.session = None
+
+	def invalidate(self, *args):
+		self.expires = 0
+
+	def onStandby(self, configelement):
+		from Screens.Standby import inStandby
+		if inStandby is not None and self.invalidate not in inStandby.onClose:
+			inStandby.onClose.append(self.invalidate)
+		self.invalidate()
+
+	def get(self, session):
+		if session is not self.session:
+			self.attach(session)
+		vcontrol = eDVBVolumecontrol.getInstance()
+		now = time.time()
+		info = self.info
+		if info is None or now >= self.expires or info['volume'] != vcontrol.getVolume() or info['muted'] != vcontrol.isMuted():
+			info = _buildStatusInfo(session)
+			if info != self.info:
+				self.version += 1
+				self.info = info
+			self.expires = now + self.maxage
+		return dict(self.info)
+
+	def etag(self):
+		return '"%x-%x"' % (self.started, self.version)
+
+
+statusInfoSnapshot = StatusInfoSnapshot()
+
+
+def getStatusInfo(self):
+	"""
+	Get volume, current service and event, standby and recording state,
+	see StatusInfoSnapshot.
+	"""
+	return statusInfoSnapshot.get(self.session)
+
+
 def getAlternativeChannels(service):
-	alternativeServices = eServiceCenter.getInstance().list(eServiceReference(service))
-	return alternativeServices and alternativeServices.getContent("S", True)
+	return serviceListSnapshot.getContent(service, "S")
 
 
 def GetWithAlternative(service, onlyFirst=True):
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#                        2019 E2OpenPlugins                                  #
+#                                                                            #
+#  This file is open source software; you can redistribute it and/or modify  #
+#     it under the terms of the GNU General Public License version 2 as      #
+#               published by the Free Software Foundation.                   #
+#                                                                            #
+##############################################################################
+import hashlib
+from urllib import quote
+
+from services import getServices, getPicon, piconIndex
+from servicelist import serviceListSnapshot, getBouquetNumbering
+from Screens.ChannelSelection import service_types_tv, service_types_radio
+
+M3U_HEADER = "#EXTM3U\n#EXTVLCOPT--http-reconnect=true\n"
+
+
+def _attr(value):
+	return value.replace('"', "'")
+
+
+def getRootRef(stype):
+	if stype == "radio":
+		return '%s FROM BOUQUET "bouquets.radio" ORDER BY bouquet' % (service_types_radio)
+	return '%s FROM BOUQUET "bouquets.tv" ORDER BY bouquet' % (service_types_tv)
+
+
+def servicesEtag(*args):
+	"""
+	Entity tag of a service playlist. It changes with the service lists,
+	the picon directory and the request parameters passed in `args`.
+	"""
+	serviceListSnapshot.validate()
+	parts = [str(serviceListSnapshot.version)]
+	if piconIndex is not None:
+		piconIndex.refresh()
+		parts.append(str(piconIndex.mtime))
+	parts.extend(str(arg) for arg in args)
+	return '"%s"' % hashlib.sha256("\0".join(parts)).hexdigest()[:32]
+
+
+def moviesEtag(host, movies):
+	digest = hashlib.sha256(host)
+	for movie in movies:
+		digest.update("\0" + movie['filename'])
+	return '"%s"' % digest.hexdigest()[:32]
+
+
+def serviceM3uChunks(bouquets, host, auth, stype="tv", tvgid=True, logo=True, header=True):
+	"""
+	Generate an M3U playlist of services, one chunk per bouquet.
+
+	Args:
+		bouquets: iterable of (group, services) tuples, `group` is the
+			group-title of the services or None, `services` a list of
+			services as returned by getServices
+		host (str): host and port of the streaming server
+		auth (str): credentials to put in front of the host, e.g. "user:pw@"
+		stype (str): "tv" or "radio", selects the channel numbering
+		tvgid (bool): add the tvg-id attribute
+		logo (bool): add the tvg-logo attribute
+		header (bool): start with the #EXTM3U header, False to append
+			to another playlist
+	"""
+	if header:
+		yield M3U_HEADER
+	url = "http://" + auth + host.split(":")[0]
+	channels = getBouquetNumbering(getRootRef(stype)).channels
+	for group, services in bouquets:
+		chunk = []
+		for service in services:
+			sref = ":".join(service['servicereference'].split(":", 10)[:-1]) + ":"
+			name = service['servicename']
+			attrs = ['tvg-chno="%s"' % channels.get(service['servicereference'], service['program'])]
+			if logo:
+				attrs.append('tvg-logo="%s"' % (url + getPicon(sref)))
+			if tvgid:
+				attrs.append('tvg-id="%s"' % _attr(sref))
+			attrs.append('tvg-name="%s"' % _attr(name))
+			if group is not None:
+				attrs.append('group-title="%s"' % _attr(group))
+			chunk.append("#EXTINF:-1 %s,%s\n" % (" ".join(attrs), name))
+			if "//127.0.0.1%3" in sref:
+				chunk.append("%s:%s\n" % (url, sref.split(":")[10].split("//127.0.0.1%3")[-1][1:]))
+			else:
+				chunk.append("#EXTVLCOPT:program=%d\n" % service['program'])
+				chunk.append("http://%s%s/%s\n" % (auth, host, sref))
+			chunk.append("\n")
+		if chunk:
+			yield "".join(chunk)
+
+
+def bouquetServices(bouquets):
+	"""
+	Lazily list the playable services of each bouquet, for
+	serviceM3uChunks.
+
+	Args:
+		bouquets: iterable of (bouquet reference, bouquet name) tuples
+	"""
+	for bref, bname in bouquets:
+		yield bname, getServices(bref, False)["services"]
+
+
+def movieM3uChunks(movies, host):
+	"""
+	Generate an M3U playlist of recordings.
+
+	Args:
+		movies: list of movies as returned by getMovieList
+		host (str): base URL of the web interface
+	"""
+	yield M3U_HEADER
+	for movie in movies:
+		filename = movie['filename']
+		yield "#EXTINF:-1,: %s\n%s/file?file=%s\n" % (filename.split("/")[-1], host, quote(filename))
@@ -21,7 +21,11 @@
 ##########################################################################
 
 import os
+import json
 import struct
+from time import time
+
+from twisted.internet import reactor
 
 from enigma import eServiceReference, iServiceInformation, eServiceCenter
 from ServiceReference import ServiceReference
@@ -63,11 +67,246 @@ def checkParentalProtection(directory):
 	return False
 
 
+def _readableSize(size):
+	if size > 1073741824:
+		return "%.2f %s" % ((size / 1073741824.), _("GB"))
+	elif size > 1048576:
+		return "%.2f %s" % ((size / 1048576.), _("MB"))
+	elif size > 1024:
+		return "%.2f %s" % ((size / 1024.), _("kB"))
+	return ''
+
+
+def _bytes(value):
+	# the index file stores byte strings as latin-1, which maps every
+	# byte to one code point and back, whatever the original encoding was
+	if isinstance(value, unicode):
+		return value.encode('latin-1')
+	if isinstance(value, list):
+		return [_bytes(v) for v in value]
+	if isinstance(value, dict):
+		return dict((_bytes(k), _bytes(v)) for k, v in value.iteritems())
+	return value
+
+
+class MovieIndex(object):
+	"""
+	Metadata index of the recordings of movie locations.
+
+	Everything getMovieList needs from a recording (meta data, length,
+	play position, descriptions, size) is read once and kept together
+	with a signature made of the mtime and size of the recording and the
+	mtimes of its .meta and .cuts files. The signatures of a location are
+	checked at most every STAT_INTERVAL seconds; in between, and as long
+	as the directory mtime is unchanged, the recordings are served from
+	memory.
+
+	Which recordings are listed, and in which order, is left to
+	MovieList.load as before. It is only called again when the directory,
+	the sort mode or the tag filter changed.
+
+	The metadata of all locations is persisted to INDEX_FILE, at most once
+	per SAVE_DELAY seconds, so it survives restarts. A recording whose
+	mtime and size changed but not its sidecar files, e.g. one still being
+	recorded, is refreshed in memory only.
+	"""
+	INDEX_FILE = "/etc/enigma2/openwebif-movies.json"
+	#: per-location index file of earlier versions, removed when seen
+	LEGACY_INDEX_FILE = ".openwebif-movies.json"
+	VERSION = 2
+	STAT_INTERVAL = 10
+	SAVE_DELAY = 60
+
+	def __init__(self):
+		self.locations = {}
+		self.stored = None
+		self.saver = None
+
+	def _location(self, directory):
+		index = self.locations.get(directory)
+		if index is None:
+			if self.stored is None:
+				self.stored = {}
+				try:
+					with open(self.INDEX_FILE, "rb") as handle:
+						stored = _bytes(json.load(handle))
+					if stored.get("version") == self.VERSION:
+						self.stored = stored["locations"]
+				except (IOError, OSError, ValueError, KeyError, AttributeError):
+					pass
+			try:
+				os.remove(directory + self.LEGACY_INDEX_FILE)
+			except OSError:
+				pass
+			index = {
+				"mtime": None,
+				"names": set(),
+				"listing": None,
+				"checked": 0,
+				"result": None,
+				"movies": self.stored.get(directory, {}),
+			}
+			self.locations[directory] = index
+		return index
+
+	def _scheduleSave(self):
+		if self.saver is None or not self.saver.active():
+			self.saver = reactor.callLater(self.SAVE_DELAY, self._save)
+
+	def _save(self):
+		self.saver = None
+		locations = dict(self.stored or {})
+		for directory, index in self.locations.iteritems():
+			locations[directory] = index["movies"]
+		try:
+			with open(self.INDEX_FILE + ".tmp", "wb") as handle:
+				json.dump({"version": self.VERSION, "locations": locations}, handle, encoding='latin-1', separators=(',', ':'))
+			os.rename(self.INDEX_FILE + ".tmp", self.INDEX_FILE)
+		except (IOError, OSError):
+			pass
+
+	def _signature(self, filename, names):
+		name = os.path.splitext(filename)[0]
+		signature = []
+		st = os.stat(filename)
+		signature.extend((int(st.st_mtime), st.st_size))
+		for sidecar in (filename + '.meta', filename + '.cuts'):
+			if os.path.basename(sidecar) in names:
+				signature.append(int(os.stat(sidecar).st_mtime))
+			else:
+				signature.append(0)
+		for sidecar in (name + '.eit', name + '.txt'):
+			signature.append(os.path.basename(sidecar) in names)
+		return signature
+
+	def _list(self, directory, tag):
+		movielist = MovieList(None)
+		movielist.load(root=eServiceReference(MOVIE_LIST_SREF_ROOT + directory), filter_tags=tag is not None and [tag] or None)
+		order = []
+		for (serviceref, info, begin, unknown) in movielist.list:
+			if serviceref.flags & eServiceReference.mustDescent:
+				continue
+			order.append(serviceref.toString())
+		del movielist
+		return order
+
+	def _read(self, serviceref, info, filename, size):
+		name, ext = os.path.splitext(filename)
+		sourceRef = ServiceReference(info.getInfoString(serviceref, iServiceInformation.sServiceref))
+		movie = {
+			'serviceref': serviceref.toString(),
+			'recordingtime': info.getInfo(serviceref, iServiceInformation.sTimeCreate),
+			'eventname': ServiceReference(serviceref).getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
+			'servicename': sourceRef.getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
+			'tags': info.getInfoString(serviceref, iServiceInformation.sTags),
+			'length': 0,
+			'lastseen': 0,
+			'filesize': size,
+		}
+
+		try:
+			movie['length'] = info.getLength(serviceref)
+		except:  # noqa: E722
+			pass
+
+		if movie['length']:
+			movie['lastseen'] = _moviePlayState(filename + '.cuts', serviceref, movie['length']) or 0
+
+		txtdesc = ""
+		txtfile = name + '.txt'
+		if ext.lower() != '.ts' and os.path.isfile(txtfile):
+			with open(txtfile, "rb") as handle:
+				txtdesc = ''.join(handle.readlines())
+
+		event = info.getEvent(serviceref)
+		extended_description = event and event.getExtendedDescription() or ""
+		if extended_description == '' and txtdesc != '':
+			extended_description = txtdesc
+		movie['descriptionExtended'] = unicode(extended_description, 'utf_8', errors='ignore').encode('utf_8', 'ignore')
+
+		desc = info.getInfoString(serviceref, iServiceInformation.sDescription)
+		movie['description'] = unicode(desc, 'utf_8', errors='ignore').encode('utf_8', 'ignore')
+		return movie
+
+	def getMovies(self, directory, tag=None):
+		"""
+		Return (filename, metadata) tuples of the recordings of `directory`
+		MovieList lists, in its order, refreshing stale entries.
+
+		Args:
+			directory (str): movie location, ending with a slash
+			tag (str): only list recordings with this tag
+		"""
+		index = self._location(directory)
+		try:
+			mtime = int(os.stat(directory).st_mtime)
+		except OSError:
+			return []
+		now = time()
+
+		if mtime != index["mtime"]:
+			index["mtime"] = mtime
+			index["names"] = set(os.listdir(directory))
+			index["checked"] = 0
+		try:
+			sortType = config.movielist.moviesort.value
+		except AttributeError:
+			sortType = None
+		key = (mtime, sortType, tag)
+		if index["listing"] is None or index["listing"][0] != key:
+			index["listing"] = (key, self._list(directory, tag))
+			index["checked"] = 0
+		if index["result"] is not None and 0 <= now - index["checked"] < self.STAT_INTERVAL:
+			return index["result"][:]
+
+		serviceHandler = eServiceCenter.getInstance()
+		names = index["names"]
+		movies = index["movies"]
+		persist = False
+		listed = set()
+		result = []
+		for sref in index["listing"][1]:
+			filename = '/' + '/'.join(sref.split("/")[1:])
+			try:
+				signature = self._signature(filename, names)
+			except OSError:
+				continue
+			entry = movies.get(filename)
+			if entry is None or entry["signature"] != signature:
+				serviceref = eServiceReference(sref)
+				info = serviceHandler.info(serviceref)
+				if info is None:
+					continue
+				# mtime and size alone change while recording, no need to persist
+				if entry is None or entry["signature"][2:] != signature[2:]:
+					persist = True
+				entry = movies[filename] = {"signature": signature, "movie": self._read(serviceref, info, filename, signature[1])}
+			listed.add(filename)
+			result.append((filename, entry["movie"]))
+
+		if tag is None:
+			for filename in movies.keys():
+				if filename not in listed:
+					del movies[filename]
+					persist = True
+		if persist:
+			self._scheduleSave()
+		index["result"] = result
+		index["checked"] = now
+		return result[:]
+
+
+movieIndex = MovieIndex()
+
+
 def getMovieList(rargs=None, locations=None):
 	movieliste = []
 	tag = None
 	directory = None
 	fields = None
+	sort = None
+	offset = 0
+	limit = None
 	bookmarklist = []
 
 	if rargs and "tag" in rargs.keys():
@@ -79,6 +318,23 @@ def getMovieList(rargs=None, locations=None):
 	if rargs and "fields" in rargs.keys():
 		fields = rargs["fields"][0]
 
+	if rargs and "sort" in rargs.keys():
+		sort = rargs["sort"][0]
+
+	if rargs and "offset" in rargs.keys():
+		try:
+			offset = max(0, int(rargs["offset"][0]))
+		except ValueError:
+			pass
+
+	if rargs and "limit" in rargs.keys():
+		try:
+			limit = max(0, int(rargs["limit"][0]))
+		except ValueError:
+			pass
+
+	projection = _getProjection(fields)
+
 	if directory is None:
 		directory = MovieSelection.defaultMoviePath()
 	else:
@@ -104,20 +360,17 @@ def getMovieList(rargs=None, locations=None):
 			"directory": [],
 		}
 
-	root = eServiceReference(MOVIE_LIST_SREF_ROOT + directory)
-
 	for item in sorted(os.listdir(directory)):
 		abs_p = os.path.join(directory, item)
 		if os.path.isdir(abs_p):
 			bookmarklist.append(item)
 
-	folders = [root]
+	folders = [directory]
 	if rargs and "recursive" in rargs.keys():
 		for f in bookmarklist:
 			if f[-1] != "/":
 				f += "/"
-			ff = eServiceReference(MOVIE_LIST_SREF_ROOT + directory + f)
-			folders.append(ff)
+			folders.append(directory + f)
 
 	# get all locations
 	if locations is not None:
@@ -126,119 +379,164 @@ def getMovieList(rargs=None, locations=None):
 		for f in locations:
 			if f[-1] != "/":
 				f += "/"
-			ff = eServiceReference(MOVIE_LIST_SREF_ROOT + f)
-			folders.append(ff)
+			folders.append(f)
 
 	if config.OpenWebif.parentalenabled.value:
 		dir_is_protected = checkParentalProtection(directory)
 	else:
 		dir_is_protected = False
 
+	entries = []
 	if not dir_is_protected:
-		movielist = MovieList(None)
-		for root in folders:
-			if tag is not None:
-				movielist.load(root=root, filter_tags=[tag])
-			else:
-				movielist.load(root=root, filter_tags=None)
+		for folder in folders:
+			entries.extend(movieIndex.getMovies(folder, tag))
 
-			for (serviceref, info, begin, unknown) in movielist.list:
-				if serviceref.flags & eServiceReference.mustDescent:
-					continue
-
-				length_minutes = 0
-				txtdesc = ""
-				filename = '/'.join(serviceref.toString().split("/")[1:])
-				filename = '/' + filename
-				name, ext = os.path.splitext(filename)
-
-				sourceRef = ServiceReference(
-					info.getInfoString(
-						serviceref, iServiceInformation.sServiceref))
-				rtime = info.getInfo(
-					serviceref, iServiceInformation.sTimeCreate)
-
-				movie = {
-					'filename': filename,
-					'filename_stripped': filename.split("/")[-1],
-					'serviceref': serviceref.toString(),
-					'length': "?:??",
-					'lastseen': 0,
-					'filesize_readable': '',
-					'recordingtime': rtime,
-					'begintime': 'undefined',
-					'eventname': ServiceReference(serviceref).getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
-					'servicename': sourceRef.getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
-					'tags': info.getInfoString(serviceref, iServiceInformation.sTags),
-					'fullname': serviceref.toString(),
-				}
+	if sort is not None:
+		reverse = sort.startswith('-')
+		key = MOVIE_SORT_KEYS.get(sort.lstrip('-'))
+		if key is not None:
+			entries.sort(key=key, reverse=reverse)
 
-				if rtime > 0:
-					fuzzy_rtime = FuzzyTime(rtime)
-					movie['begintime'] = fuzzy_rtime[0] + ", " + fuzzy_rtime[1]
-
-				try:
-					length_minutes = info.getLength(serviceref)
-				except:  # noqa: E722
-					pass
+	total = len(entries)
+	if limit is not None:
+		entries = entries[offset:offset + limit]
+	elif offset:
+		entries = entries[offset:]
 
-				if length_minutes:
-					movie['length'] = "%d:%02d" % (length_minutes / 60, length_minutes % 60)
-					if fields is None or 'pos' in fields:
-						movie['lastseen'] = _moviePlayState(filename + '.cuts', serviceref, length_minutes) or 0
-
-				if fields is None or 'desc' in fields:
-					txtfile = name + '.txt'
-					if ext.lower() != '.ts' and os.path.isfile(txtfile):
-						with open(txtfile, "rb") as handle:
-							txtdesc = ''.join(handle.readlines())
-
-					event = info.getEvent(serviceref)
-					extended_description = event and event.getExtendedDescription() or ""
-					if extended_description == '' and txtdesc != '':
-						extended_description = txtdesc
-					movie['descriptionExtended'] = unicode(extended_description, 'utf_8', errors='ignore').encode('utf_8', 'ignore')
-
-					desc = info.getInfoString(serviceref, iServiceInformation.sDescription)
-					movie['description'] = unicode(desc, 'utf_8', errors='ignore').encode('utf_8', 'ignore')
-
-				if fields is None or 'size' in fields:
-					size = 0
-					sz = ''
-
-					try:
-						size = os.stat(filename).st_size
-						if size > 1073741824:
-							sz = "%.2f %s" % ((size / 1073741824.), _("GB"))
-						elif size > 1048576:
-							sz = "%.2f %s" % ((size / 1048576.), _("MB"))
-						elif size > 1024:
-							sz = "%.2f %s" % ((size / 1024.), _("kB"))
-					except:  # noqa: E722
-						pass
-
-					movie['filesize'] = size
-					movie['filesize_readable'] = sz
-
-				movieliste.append(movie)
-		del movielist
+	for (filename, meta) in entries:
+		movieliste.append(_movieItem(filename, meta, fields, projection))
 
 	if locations is None:
 		return {
 			"movies": movieliste,
 			"bookmarks": bookmarklist,
-			"directory": directory
+			"directory": directory,
+			"total": total
 		}
 
 	return {
 		"movies": movieliste,
-		"locations": locations
+		"locations": locations,
+		"total": total
 	}
 
 
-def getAllMovies():
+def _movieItem(filename, meta, fields, projection):
+	rtime = meta['recordingtime']
+	length_minutes = meta['length']
+	if projection is not None:
+		movie = {}
+		for key in projection:
+			if key in MOVIE_FIELDS:
+				movie[key] = MOVIE_FIELDS[key](filename, meta)
+		return movie
+
+	movie = {
+		'filename': filename,
+		'filename_stripped': filename.split("/")[-1],
+		'serviceref': meta['serviceref'],
+		'length': "?:??",
+		'lastseen': 0,
+		'filesize_readable': '',
+		'recordingtime': rtime,
+		'begintime': 'undefined',
+		'eventname': meta['eventname'],
+		'servicename': meta['servicename'],
+		'tags': meta['tags'],
+		'fullname': meta['serviceref'],
+	}
+
+	if rtime > 0:
+		movie['begintime'] = _beginTime(rtime)
+
+	if length_minutes:
+		movie['length'] = _length(length_minutes)
+		if fields is None or 'pos' in fields:
+			movie['lastseen'] = meta['lastseen']
+
+	if fields is None or 'desc' in fields:
+		movie['descriptionExtended'] = meta['descriptionExtended']
+		movie['description'] = meta['description']
+
+	if fields is None or 'size' in fields:
+		movie['filesize'] = meta['filesize']
+		movie['filesize_readable'] = _readableSize(meta['filesize'])
+
+	return movie
+
+
+def _beginTime(rtime):
+	fuzzy_rtime = FuzzyTime(rtime)
+	return fuzzy_rtime[0] + ", " + fuzzy_rtime[1]
+
+
+def _length(length_minutes):
+	return "%d:%02d" % (length_minutes / 60, length_minutes % 60)
+
+
+#: attributes of a movie item, used for strict field projection
+MOVIE_FIELDS = {
+	'filename': lambda f, m: f,
+	'filename_stripped': lambda f, m: f.split("/")[-1],
+	'serviceref': lambda f, m: m['serviceref'],
+	'fullname': lambda f, m: m['serviceref'],
+	'length': lambda f, m: m['length'] and _length(m['length']) or "?:??",
+	'lastseen': lambda f, m: m['length'] and m['lastseen'] or 0,
+	'recordingtime': lambda f, m: m['recordingtime'],
+	'begintime': lambda f, m: m['recordingtime'] > 0 and _beginTime(m['recordingtime']) or 'undefined',
+	'eventname': lambda f, m: m['eventname'],
+	'servicename': lambda f, m: m['servicename'],
+	'tags': lambda f, m: m['tags'],
+	'description': lambda f, m: m['description'],
+	'descriptionExtended': lambda f, m: m['descriptionExtended'],
+	'filesize': lambda f, m: m['filesize'],
+	'filesize_readable': lambda f, m: _readableSize(m['filesize']),
+}
+
+#: legacy field groups of the `fields` parameter
+MOVIE_FIELD_GROUPS = {
+	'pos': ('lastseen',),
+	'desc': ('description', 'descriptionExtended'),
+	'size': ('filesize', 'filesize_readable'),
+}
+
+#: sort keys of the `sort` parameter
+MOVIE_SORT_KEYS = {
+	'recordingtime': lambda x: x[1]['recordingtime'],
+	'name': lambda x: x[1]['eventname'].lower(),
+	'size': lambda x: x[1]['filesize'],
+}
+
+
+def _getProjection(fields):
+	"""
+	`fields` used to be a list of optional groups (pos, desc, size) added
+	to the default attributes. As soon as it names any movie attribute,
+	only the listed attributes (and groups) are returned.
+	"""
+	if fields is None:
+		return None
+	names = [f.strip() for f in fields.split(',') if f.strip()]
+	if not any(name in MOVIE_FIELDS for name in names):
+		return None
+	projection = []
+	for name in names:
+		for key in MOVIE_FIELD_GROUPS.get(name, (name,)):
+			if key not in projection:
+				projection.append(key)
+	return projection
+
+
+def getAllMovies(rargs=None):
+	"""
+	List the recordings of all movie locations. Only the paging, sorting
+	and projection parameters of `rargs` are honoured, the list is not
+	filtered by dirname, tag or recursive.
+	"""
 	locations = config.movielist.videodirs.value[:] or []
-	return getMovieList(locations=locations)
+	if rargs is not None:
+		rargs = dict((key, value) for key, value in rargs.iteritems() if key in ("fields", "sort", "offset", "limit"))
+	return getMovieList(rargs, locations=locations)
 
 
 def removeMovie(session, sRef, Force=False):
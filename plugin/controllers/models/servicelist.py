@@ -8,18 +8,174 @@
 #               published by the Free Software Foundation.                   #
 #                                                                            #
 ##############################################################################
+import os
+import re
+from time import time
 from urllib import unquote
-from enigma import eDVBDB
+from enigma import eDVBDB, eServiceCenter, eServiceReference
 from Components.NimManager import nimmanager
 import Components.ParentalControl
 
 
+class ServiceListSnapshot(object):
+	"""
+	Shared, versioned snapshot of the bouquet tree and service lists.
+
+	The content of every listed reference (bouquet lists, bouquets,
+	provider and satellite lists, alternatives) is fetched from the
+	eServiceCenter once and served from memory until the snapshot is
+	invalidated. That happens when lamedb or the bouquets are reloaded
+	through the web API, when the BouquetEditor changes anything, and
+	when a file is added to or removed from the settings folder or
+	lamedb, a bouquet list or a listed bouquet file is rewritten, e.g.
+	after the bouquets have been edited on the receiver itself. The
+	cached lists are dropped once there are `maxentries` of them.
+
+	Data derived from the service lists (channel numbering, provider
+	map) is kept in `derived` and dropped along with the lists.
+	"""
+	SETTINGS_PATH = "/etc/enigma2"
+	CHECK_INTERVAL = 2
+	#: files checked for changes besides the bouquet files listed, "" is
+	#: the settings folder itself
+	WATCHED = ("", "lamedb", "bouquets.tv", "bouquets.radio")
+	BOUQUET_FILE = re.compile(r'FROM BOUQUET "([^"/]+)"')
+
+	def __init__(self, maxentries=1000):
+		self.maxentries = maxentries
+		self.version = 0
+		self.lists = {}
+		self.derived = {}
+		self.files = set(self.WATCHED)
+		self.mtimes = None
+		self.checked = 0
+
+	def invalidate(self):
+		self.version += 1
+		self.lists = {}
+		self.derived = {}
+
+	def _mtime(self, name):
+		try:
+			return os.stat(os.path.join(self.SETTINGS_PATH, name)).st_mtime
+		except OSError:
+			return None
+
+	def validate(self):
+		now = time()
+		if now - self.checked < self.CHECK_INTERVAL:
+			return
+		self.checked = now
+		mtimes = dict((name, self._mtime(name)) for name in self.files)
+		if mtimes != self.mtimes:
+			self.mtimes = mtimes
+			self.invalidate()
+
+	def getContent(self, ref, fmt="SN", sort=True):
+		"""
+		Cached equivalent of eServiceCenter.list(ref).getContent(fmt, sort).
+		Returns None if the reference can't be listed, otherwise a copy of
+		the content the caller is free to modify.
+		"""
+		self.validate()
+		key = (ref, fmt, sort)
+		content = self.lists.get(key, False)
+		if content is False:
+			match = self.BOUQUET_FILE.search(ref)
+			if match and match.group(1) not in self.files:
+				self.files.add(match.group(1))
+				self.mtimes[match.group(1)] = self._mtime(match.group(1))
+			if len(self.lists) >= self.maxentries:
+				self.lists = {}
+			services = eServiceCenter.getInstance().list(eServiceReference(ref))
+			content = services and services.getContent(fmt, sort)
+			if content is not None:
+				content = tuple(content)
+			self.lists[key] = content
+		if content is None:
+			return None
+		return list(content)
+
+	def getDerived(self, key, build):
+		"""
+		Return data derived from the service lists, built by calling
+		`build` once per snapshot version.
+		"""
+		self.validate()
+		if key not in self.derived:
+			self.derived[key] = build()
+		return self.derived[key]
+
+
+serviceListSnapshot = ServiceListSnapshot()
+
+
+class BouquetNumbering(object):
+	"""
+	Channel numbers of all bouquets of a bouquet list, computed in a single
+	pass over the bouquet tree.
+
+	By default only bouquets whose reference contains `userbouquet` are
+	numbered, like getServices always did; other entries of the bouquet
+	list keep the running number as their startpos. With `allbouquets`
+	the services of every entry are counted, the rule of the bouquet
+	editor. Entries flagged hidden (512) don't get a number, `1:832:D`
+	number markers take one, other markers don't.
+
+	Attributes:
+		startpos (dict): bouquet reference -> number of the service
+			preceding its first one
+		numbers (dict): bouquet reference -> list of channel numbers in
+			list order, 0 for entries without a number
+		channels (dict): service reference -> first channel number
+		total (int): number of numbered entries
+	"""
+	def __init__(self, root, allbouquets=False):
+		self.root = root
+		self.allbouquets = allbouquets
+		self.startpos = {}
+		self.numbers = {}
+		self.channels = {}
+		pos = 0
+		for bouquet in serviceListSnapshot.getContent(root, "RN") or []:
+			bref = bouquet[0].toString()
+			self.startpos[bref] = pos
+			if not allbouquets and 'userbouquet' not in bref:
+				continue
+			numbers = []
+			for item in serviceListSnapshot.getContent(bref, "RN") or []:
+				sref = item[0].toString()
+				sp = sref[:7] == '1:832:D'
+				number = 0
+				# 512 is hidden service on sifteam image. Doesn't affect other images
+				if sp or not int(sref.split(":")[1]) & 512:
+					if sp or not item[0].flags & eServiceReference.isMarker:
+						pos += 1
+						number = pos
+						if not sp and sref not in self.channels:
+							self.channels[sref] = number
+				numbers.append(number)
+			self.numbers[bref] = numbers
+		self.total = pos
+
+
+def getBouquetNumbering(root, allbouquets=False):
+	"""
+	Return the BouquetNumbering of a bouquet list (e.g. the
+	`FROM BOUQUET "bouquets.tv"` reference), shared until the service
+	lists change.
+	"""
+	return serviceListSnapshot.getDerived(("numbering", root, allbouquets), lambda: BouquetNumbering(root, allbouquets))
+
+
 def reloadLameDB(self):
 	self.eDVBDB.reloadServicelist()
+	serviceListSnapshot.invalidate()
 
 
 def reloadUserBouquets(self):
 	self.eDVBDB.reloadBouquets()
+	serviceListSnapshot.invalidate()
 
 
 def reloadTransponders(self):
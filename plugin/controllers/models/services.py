@@ -8,12 +8,12 @@
 #               published by the Free Software Foundation.                   #
 #                                                                            #
 ##############################################################################
+import os
 import re
 import unicodedata
+from operator import itemgetter
 from time import time, localtime, strftime, mktime
 
-from Tools.Directories import fileExists
-from Components.Sources.ServiceList import ServiceList
 from Components.ParentalControl import parentalControl
 from Components.config import config
 from Components.NimManager import nimmanager
@@ -22,9 +22,13 @@ from Screens.ChannelSelection import service_types_tv, service_types_radio, FLAG
 from Screens.InfoBar import InfoBar
 from enigma import eServiceCenter, eServiceReference, iServiceInformation, eEPGCache
 from info import GetWithAlternative, getOrbitalText, getOrb
+from servicelist import serviceListSnapshot, getBouquetNumbering
+from epgindex import epgSearchIndex
+from timeformat import formatClock, formatDay
+from timerindex import timerIndex, descriptionCache, normalizeRef
 from urllib import quote, unquote
 from ..utilities import parse_servicereference, SERVICE_TYPE_LOOKUP, NS_LOOKUP
-from ..i18n import _, tstrings
+from ..i18n import _
 from ..defaults import PICON_PATH
 
 try:
@@ -70,6 +74,87 @@ def convertGenre(val):
 	return "",0
 
 
+def _genre(pos):
+	return lambda e: convertGenre(e[pos['W']])[0]
+
+
+def _genreid(pos):
+	return lambda e: convertGenre(e[pos['W']])[1]
+
+
+#: event keys producible from lookupEvent columns:
+#: key -> (needed format characters, getter factory taking the positions
+#: of the format characters and the encode flag)
+EVENT_FIELDS = {
+	'id': ('I', lambda p, enc: itemgetter(p['I'])),
+	'begin_timestamp': ('B', lambda p, enc: itemgetter(p['B'])),
+	'duration_sec': ('D', lambda p, enc: itemgetter(p['D'])),
+	'now_timestamp': ('C', lambda p, enc: itemgetter(p['C'])),
+	'title': ('T', lambda p, enc: lambda e: filterName(e[p['T']], enc)),
+	'shortdesc': ('S', lambda p, enc: lambda e: convertDesc(e[p['S']], enc)),
+	'longdesc': ('E', lambda p, enc: lambda e: convertDesc(e[p['E']], enc)),
+	'sref': ('R', lambda p, enc: itemgetter(p['R'])),
+	'sname': ('N', lambda p, enc: lambda e: filterName(e[p['N']], enc)),
+	'genre': ('W', lambda p, enc: _genre(p)),
+	'genreid': ('W', lambda p, enc: _genreid(p)),
+	'date': ('B', lambda p, enc: lambda e: formatDay(e[p['B']])),
+	'begin': ('B', lambda p, enc: lambda e: formatClock(e[p['B']])),
+	'end': ('BD', lambda p, enc: lambda e: formatClock(e[p['B']] + e[p['D']])),
+	'duration': ('D', lambda p, enc: lambda e: int(e[p['D']] / 60)),
+	'remaining': ('BDC', lambda p, enc: lambda e: (e[p['B']] + e[p['D']]) - e[p['C']]),
+	'tleft': ('BDC', lambda p, enc: lambda e: int(((e[p['B']] + e[p['D']]) - e[p['C']]) / 60)),
+	'progress': ('BDC', lambda p, enc: lambda e: e[p['D']] and int(((e[p['C']] - e[p['B']]) * 100 / e[p['D']]) * 4) or 0),
+	'picon': ('R', lambda p, enc: lambda e: getPicon(e[p['R']])),
+}
+
+
+class EventSerializer(object):
+	"""
+	Build event dicts from lookupEvent or search rows.
+
+	Args:
+		fmt (str): format string the EPG function would use to return
+			every key, e.g. 'IBDCTSERNW'
+		keys (tuple): the keys the EPG function returns
+		fields (str): comma separated `fields` request parameter, None
+			for all keys; unknown names are ignored
+		encode (bool): escape texts
+		extra (str): format characters the caller reads itself
+
+	`fmt` is then reduced to the characters needed for the selected keys,
+	so e.g. long descriptions are neither fetched nor converted unless
+	requested. Use `pos` to find a column in the reduced rows and
+	`wants(key)` for keys the caller fills in itself.
+	"""
+	def __init__(self, fmt, keys, fields=None, encode=False, extra=''):
+		selected = keys
+		if fields is not None:
+			names = set(f.strip() for f in fields.split(','))
+			if names & set(keys):
+				selected = [key for key in keys if key in names]
+		self.selected = set(selected)
+		needed = set(extra)
+		for key in selected:
+			if key in EVENT_FIELDS:
+				needed.update(EVENT_FIELDS[key][0])
+		# X (one row per query) changes the result layout, keep it
+		self.fmt = ''.join(c for c in fmt if c in needed or c == 'X')
+		self.pos = dict((c, i) for i, c in enumerate(self.fmt))
+		self.getters = []
+		for key in selected:
+			if key in EVENT_FIELDS and all(c in self.pos for c in EVENT_FIELDS[key][0]):
+				self.getters.append((key, EVENT_FIELDS[key][1](self.pos, encode)))
+
+	def wants(self, key):
+		return key in self.selected
+
+	def serialize(self, event):
+		ev = {}
+		for key, getter in self.getters:
+			ev[key] = getter(event)
+		return ev
+
+
 def getServiceInfoString(info, what):
 	v = info.getInfo(what)
 	if v == -1:
@@ -279,9 +364,7 @@ def getBouquets(stype):
 	if stype == "radio":
 		s_type = service_types_radio
 		s_type2 = "bouquets.radio"
-	serviceHandler = eServiceCenter.getInstance()
-	services = serviceHandler.list(eServiceReference('%s FROM BOUQUET "%s" ORDER BY bouquet' % (s_type, s_type2)))
-	bouquets = services and services.getContent("SN", True)
+	bouquets = serviceListSnapshot.getContent('%s FROM BOUQUET "%s" ORDER BY bouquet' % (s_type, s_type2))
 	bouquets = removeHiddenBouquets(bouquets)
 	return {"bouquets": bouquets}
 
@@ -300,17 +383,42 @@ def getProviders(stype):
 	s_type = service_types_tv
 	if stype == "radio":
 		s_type = service_types_radio
-	serviceHandler = eServiceCenter.getInstance()
-	services = serviceHandler.list(eServiceReference('%s FROM PROVIDERS ORDER BY name' % (s_type)))
-	providers = services and services.getContent("SN", True)
+	providers = serviceListSnapshot.getContent('%s FROM PROVIDERS ORDER BY name' % (s_type))
 	return {"providers": providers}
 
 
+def _buildProviderMap(s_type):
+	providermap = {}
+	for provider in serviceListSnapshot.getContent('%s FROM PROVIDERS ORDER BY name' % (s_type)) or []:
+		for sitem in serviceListSnapshot.getContent(provider[0], 'S') or []:
+			providermap[sitem] = provider[1]
+	return providermap
+
+
+def getProviderMap(stype):
+	"""
+	Return a dict mapping service references to their provider name,
+	built once per service list version.
+
+	Args:
+		stype (str): "tv" or "radio"
+	"""
+	s_type = service_types_tv
+	if stype == "radio":
+		s_type = service_types_radio
+	return serviceListSnapshot.getDerived(("providers", s_type), lambda: _buildProviderMap(s_type))
+
+
 def getSatellites(stype):
-	ret = []
 	s_type = service_types_tv
 	if stype == "radio":
 		s_type = service_types_radio
+	ret = serviceListSnapshot.getDerived(("satellites", s_type), lambda: _buildSatellites(s_type))
+	return {"satellites": [dict(sat) for sat in ret]}
+
+
+def _buildSatellites(s_type):
+	ret = []
 	refstr = '%s FROM SATELLITES ORDER BY satellitePosition' % (s_type)
 	ref = eServiceReference(refstr)
 	serviceHandler = eServiceCenter.getInstance()
@@ -345,8 +453,7 @@ def getSatellites(stype):
 				"service": service.toString(),
 				"name": service.getName()
 			})
-	ret = sortSatellites(ret)
-	return {"satellites": ret}
+	return sortSatellites(ret)
 
 
 def sortSatellites(satList):
@@ -405,9 +512,22 @@ def getChannels(idbouquet, stype):
 		idbouquet = '%s ORDER BY name' % (s_type)
 
 	epgcache = eEPGCache.getInstance()
-	serviceHandler = eServiceCenter.getInstance()
-	services = serviceHandler.list(eServiceReference(idbouquet))
-	channels = services and services.getContent("SN", True)
+	channels = serviceListSnapshot.getContent(idbouquet)
+
+	# Fetch now and next events of all channels with a single EPG query.
+	# The rows are joined to the channels by their service reference (R),
+	# the now event of a service is returned before its next event.
+	search = ['TBDCIRX']
+	for channel in channels:
+		if not int(channel[0].split(":")[1]) & 64:
+			search.append((channel[0], 0, -1))
+			search.append((channel[0], 1, -1))
+	nownext = {}
+	if len(search) > 1:
+		for event in epgcache.lookupEvent(search) or []:
+			if event[5]:
+				nownext.setdefault(normalizeRef(event[5]), []).append(event)
+
 	for channel in channels:
 		chan = {}
 		chan['ref'] = quote(channel[0], safe=' ~@%#$&()*!+=:;,.?/\'')
@@ -430,27 +550,30 @@ def getChannels(idbouquet, stype):
 				chan['protection'] = getProtection(channel[0])
 			else:
 				chan['protection'] = "0"
-			nowevent = epgcache.lookupEvent(['TBDCIX', (channel[0], 0, -1)])
-			if len(nowevent) > 0 and nowevent[0][0] is not None:
-				chan['now_title'] = filterName(nowevent[0][0])
-				chan['now_begin'] = strftime("%H:%M", (localtime(nowevent[0][1])))
-				chan['now_end'] = strftime("%H:%M", (localtime(nowevent[0][1] + nowevent[0][2])))
-				chan['now_left'] = int(((nowevent[0][1] + nowevent[0][2]) - nowevent[0][3]) / 60)
-				chan['progress'] = int(((nowevent[0][3] - nowevent[0][1]) * 100 / nowevent[0][2]))
-				chan['now_ev_id'] = nowevent[0][4]
+			events = nownext.get(normalizeRef(channel[0]), [])
+			nowevent = events[0] if events else None
+			nextevent = events[1] if len(events) > 1 else None
+			if nowevent is not None and nowevent[0] is not None:
+				chan['now_title'] = filterName(nowevent[0])
+				chan['now_begin'] = formatClock(nowevent[1])
+				chan['now_end'] = formatClock(nowevent[1] + nowevent[2])
+				chan['now_left'] = int(((nowevent[1] + nowevent[2]) - nowevent[3]) / 60)
+				chan['progress'] = int(((nowevent[3] - nowevent[1]) * 100 / nowevent[2]))
+				chan['now_ev_id'] = nowevent[4]
 				chan['now_idp'] = "nowd" + str(idp)
-				nextevent = epgcache.lookupEvent(['TBDIX', (channel[0], +1, -1)])
 # Some fields have been seen to be missing from the next event...
-				if len(nextevent) > 0 and nextevent[0][0] is not None:
-					if nextevent[0][1] is None:
-						nextevent[0][1] = time()
-					if nextevent[0][2] is None:
-						nextevent[0][2] = 0
-					chan['next_title'] = filterName(nextevent[0][0])
-					chan['next_begin'] = strftime("%H:%M", (localtime(nextevent[0][1])))
-					chan['next_end'] = strftime("%H:%M", (localtime(nextevent[0][1] + nextevent[0][2])))
-					chan['next_duration'] = int(nextevent[0][2] / 60)
-					chan['next_ev_id'] = nextevent[0][3]
+				if nextevent is not None and nextevent[0] is not None:
+					next_begin = nextevent[1]
+					if next_begin is None:
+						next_begin = time()
+					next_duration = nextevent[2]
+					if next_duration is None:
+						next_duration = 0
+					chan['next_title'] = filterName(nextevent[0])
+					chan['next_begin'] = formatClock(next_begin)
+					chan['next_end'] = formatClock(next_begin + next_duration)
+					chan['next_duration'] = int(next_duration / 60)
+					chan['next_ev_id'] = nextevent[4]
 					chan['next_idp'] = "nextd" + str(idp)
 				else:   # Have to fudge one in, as rest of OWI code expects it...
 					chan['next_title'] = filterName("<<absent>>")
@@ -480,41 +603,14 @@ def getServices(sRef, showAll=True, showHidden=False, pos=0, provider=False, pic
 		CalcPos = True
 
 	if provider:
-		s_type = service_types_tv
-		if "radio" in sRef:
-			s_type = service_types_radio
-		pserviceHandler = eServiceCenter.getInstance()
-		pservices = pserviceHandler.list(eServiceReference('%s FROM PROVIDERS ORDER BY name' % (s_type)))
-		providers = pservices and pservices.getContent("SN", True)
-
-		if provider:
-			for provider in providers:
-				servicelist = ServiceList(eServiceReference(provider[0]))
-				slist = servicelist.getServicesAsList()
-				for sitem in slist:
-					allproviders[sitem[0]] = provider[1]
-
-	servicelist = ServiceList(eServiceReference(sRef))
-	slist = servicelist.getServicesAsList()
-	serviceHandler = eServiceCenter.getInstance()
+		allproviders = getProviderMap("radio" if "radio" in sRef else "tv")
 
-	oPos = 0
-	for sitem in slist:
-		
-		oldoPos = oPos
-		sref = sitem[0]
-		if CalcPos and 'userbouquet' in sref:
-			serviceslist = serviceHandler.list(eServiceReference(sref))
-			sfulllist = serviceslist and serviceslist.getContent("RN", True)
-			for citem in sfulllist:
-				sref = citem[0].toString()
-				hs = (int(sref.split(":")[1]) & 512)
-				sp = (sref[:7] == '1:832:D')
-				if not hs or sp:  # 512 is hidden service on sifteam image. Doesn't affect other images
-					oPos = oPos + 1
-					if not sp and citem[0].flags & eServiceReference.isMarker:
-						oPos = oPos - 1
+	slist = serviceListSnapshot.getContent(sRef) or []
+
+	if CalcPos:
+		startpos = getBouquetNumbering(sRef).startpos
 
+	for sitem in slist:
 		st = int(sitem[0].split(":")[1])
 		if (sitem[0][:7] == '1:832:D') or (not (st & 512) and not (st & 64)):
 			pos = pos + 1
@@ -524,17 +620,14 @@ def getServices(sRef, showAll=True, showHidden=False, pos=0, provider=False, pic
 				service['pos'] = 0 if (st & 64) else pos
 				sr = unicode(sitem[0], 'utf_8', errors='ignore').encode('utf_8', 'ignore')
 				if CalcPos:
-					service['startpos'] = oldoPos
+					service['startpos'] = startpos.get(sitem[0], 0)
 				if picon:
 					service['picon'] = getPicon(sr)
 				service['servicereference'] = sr
 				service['program'] = int(service['servicereference'].split(':')[3], 16)
 				service['servicename'] = unicode(sitem[1], 'utf_8', errors='ignore').encode('utf_8', 'ignore')
 				if provider:
-					if sitem[0] in allproviders:
-						service['provider'] = allproviders[sitem[0]]
-					else:
-						service['provider'] = ""
+					service['provider'] = allproviders.get(sitem[0], "")
 				services.append(service)
 
 	return {"services": services, "pos": pos}
@@ -567,8 +660,7 @@ def getPlayableServices(sRef, sRefPlaying):
 
 	services = []
 	servicecenter = eServiceCenter.getInstance()
-	servicelist = servicecenter.list(eServiceReference(sRef))
-	servicelist2 = servicelist and servicelist.getContent('S') or []
+	servicelist2 = serviceListSnapshot.getContent(sRef, 'S', False) or []
 
 	for service in servicelist2:
 		if not int(service.split(":")[1]) & 512:  # 512 is hidden service on sifteam image. Doesn't affect other images
@@ -642,9 +734,9 @@ def getEvent(ref, idev, encode=True):
 	info = {}
 	for event in events:
 		info['id'] = event[0]
-		info['begin_str'] = strftime("%H:%M", (localtime(event[1])))
+		info['begin_str'] = formatClock(event[1])
 		info['begin'] = event[1]
-		info['end'] = strftime("%H:%M", (localtime(event[1] + event[2])))
+		info['end'] = formatClock(event[1] + event[2])
 		info['duration'] = event[2]
 		info['title'] = filterName(event[3], encode)
 		info['shortdesc'] = convertDesc(event[4], encode)
@@ -656,7 +748,10 @@ def getEvent(ref, idev, encode=True):
 	return {'event': info}
 
 
-def getChannelEpg(ref, begintime=-1, endtime=-1, encode=True):
+CHANNEL_EPG_KEYS = ('picon', 'id', 'date', 'begin', 'begin_timestamp', 'duration', 'duration_sec', 'end', 'title', 'shortdesc', 'longdesc', 'sref', 'sname', 'tleft', 'progress', 'now_timestamp', 'genre', 'genreid')
+
+
+def getChannelEpg(ref, begintime=-1, endtime=-1, encode=True, fields=None):
 	ret = []
 	ev = {}
 	use_empty_ev = False
@@ -667,36 +762,25 @@ def getChannelEpg(ref, begintime=-1, endtime=-1, encode=True):
 		if "://" in ref:
 			ref = ":".join(ref.split(":")[:10]) + "::" + ref.split(":")[-1]
 
-		picon = getPicon(ref)
+		serializer = EventSerializer('IBDTSENCW', CHANNEL_EPG_KEYS, fields, encode, 'IB')
+		picon = serializer.wants('picon') and getPicon(ref)
 		epgcache = eEPGCache.getInstance()
-		events = epgcache.lookupEvent(['IBDTSENCW', (ref, 0, begintime, endtime)])
+		events = epgcache.lookupEvent([serializer.fmt, (ref, 0, begintime, endtime)])
 		if events is not None:
 			for event in events:
-				ev = {}
-				ev['picon'] = picon
-				ev['id'] = event[0]
-				if event[1]:
-					ev['date'] = "%s %s" % (tstrings[("day_" + strftime("%w", (localtime(event[1]))))], strftime("%d.%m.%Y", (localtime(event[1]))))
-					ev['begin'] = strftime("%H:%M", (localtime(event[1])))
-					ev['begin_timestamp'] = event[1]
-					ev['duration'] = int(event[2] / 60)
-					ev['duration_sec'] = event[2]
-					ev['end'] = strftime("%H:%M", (localtime(event[1] + event[2])))
-					ev['title'] = filterName(event[3], encode)
-					ev['shortdesc'] = convertDesc(event[4], encode)
-					ev['longdesc'] = convertDesc(event[5], encode)
-					ev['sref'] = ref
-					ev['sname'] = filterName(event[6], encode)
-					ev['tleft'] = int(((event[1] + event[2]) - event[7]) / 60)
-					if ev['duration_sec'] == 0:
-						ev['progress'] = 0
-					else:
-						ev['progress'] = int(((event[7] - event[1]) * 100 / event[2]) * 4)
-					ev['now_timestamp'] = event[7]
-					ev['genre'],ev['genreid'] = convertGenre(event[8])
+				if event[serializer.pos['B']]:
+					ev = serializer.serialize(event)
+					if serializer.wants('picon'):
+						ev['picon'] = picon
+					if serializer.wants('sref'):
+						ev['sref'] = ref
 					ret.append(ev)
 				else:
 					use_empty_ev = True
+					ev = {}
+					if serializer.wants('picon'):
+						ev['picon'] = picon
+					ev['id'] = event[serializer.pos['I']]
 					ev['sref'] = ref
 	else:
 		use_empty_ev = True
@@ -723,15 +807,19 @@ def getChannelEpg(ref, begintime=-1, endtime=-1, encode=True):
 	return {"events": ret, "result": True}
 
 
-def getBouquetEpg(ref, begintime=-1, endtime=None, encode=False):
+BOUQUET_EPG_KEYS = ('id', 'begin_timestamp', 'duration_sec', 'title', 'shortdesc', 'longdesc', 'sref', 'sname', 'now_timestamp', 'genre', 'genreid')
+
+
+def getBouquetEpg(ref, begintime=-1, endtime=None, encode=False, fields=None):
 	ref = unquote(ref)
 	ret = []
-	services = eServiceCenter.getInstance().list(eServiceReference(ref))
-	if not services:
+	services = serviceListSnapshot.getContent(ref, 'S', False)
+	if services is None:
 		return {"events": ret, "result": False}
 
-	search = ['IBDCTSERNW']
-	for service in services.getContent('S'):
+	serializer = EventSerializer('IBDCTSERNW', BOUQUET_EPG_KEYS, fields, encode)
+	search = [serializer.fmt]
+	for service in services:
 		if endtime:
 			search.append((service, 0, begintime, endtime))
 		else:
@@ -741,29 +829,22 @@ def getBouquetEpg(ref, begintime=-1, endtime=None, encode=False):
 	events = epgcache.lookupEvent(search)
 	if events is not None:
 		for event in events:
-			ev = {}
-			ev['id'] = event[0]
-			ev['begin_timestamp'] = event[1]
-			ev['duration_sec'] = event[2]
-			ev['title'] = filterName(event[4], encode)
-			ev['shortdesc'] = convertDesc(event[5], encode)
-			ev['longdesc'] = convertDesc(event[6], encode)
-			ev['sref'] = event[7]
-			ev['sname'] = filterName(event[8], encode)
-			ev['now_timestamp'] = event[3]
-			ev['genre'],ev['genreid'] = convertGenre(event[9])
-			ret.append(ev)
+			ret.append(serializer.serialize(event))
 
 	return {"events": ret, "result": True}
 
 
-def getServicesNowNextEpg(sList, encode=False):
+NOWNEXT_EPG_KEYS = ('id', 'begin_timestamp', 'duration_sec', 'title', 'shortdesc', 'longdesc', 'asrefs', 'sref', 'sname', 'now_timestamp', 'genre', 'genreid')
+
+
+def getServicesNowNextEpg(sList, encode=False, fields=None):
 	ret = []
 	if not sList:
 		return {"events": ret, "result": False}
 
+	serializer = EventSerializer('IBDCTSERNX', NOWNEXT_EPG_KEYS, fields, encode)
 	sRefList = sList.split(",")
-	search = ['IBDCTSERNX']
+	search = [serializer.fmt]
 	for service in sRefList:
 		search.append((service, 0, -1))
 		search.append((service, 1, -1))
@@ -772,93 +853,71 @@ def getServicesNowNextEpg(sList, encode=False):
 	events = epgcache.lookupEvent(search)
 	if events is not None:
 		for event in events:
-			ev = {}
-			ev['id'] = event[0]
-			ev['begin_timestamp'] = event[1]
-			ev['duration_sec'] = event[2]
-			ev['title'] = filterName(event[4], encode)
-			ev['shortdesc'] = convertDesc(event[5], encode)
-			ev['longdesc'] = convertDesc(event[6], encode)
 			# if event[7] is not None:
 			#  achannels = GetWithAlternative(event[7], False)
 			#   if achannels:
 			#    ev['asrefs'] = achannels
-			ev['sref'] = event[7]
-			ev['sname'] = filterName(event[8], encode)
-			ev['now_timestamp'] = event[3]
-			ret.append(ev)
+			ret.append(serializer.serialize(event))
 
 	return {"events": ret, "result": True}
 
 
-def getBouquetNowNextEpg(ref, servicetype, encode=False):
+def getBouquetNowNextEpg(ref, servicetype, encode=False, fields=None):
 	ref = unquote(ref)
 	ret = []
-	services = eServiceCenter.getInstance().list(eServiceReference(ref))
-	if not services:
+	services = serviceListSnapshot.getContent(ref, 'S', False)
+	if services is None:
 		return {"events": ret, "result": False}
 
-	search = ['IBDCTSERNWX']
+	serializer = EventSerializer('IBDCTSERNWX', NOWNEXT_EPG_KEYS, fields, encode, 'R')
+	search = [serializer.fmt]
 	if servicetype == -1:
-		for service in services.getContent('S'):
+		for service in services:
 			search.append((service, 0, -1))
 			search.append((service, 1, -1))
 	else:
-		for service in services.getContent('S'):
+		for service in services:
 			search.append((service, servicetype, -1))
 
 	epgcache = eEPGCache.getInstance()
 	events = epgcache.lookupEvent(search)
 	if events is not None:
+		asrefs = serializer.wants('asrefs')
 		for event in events:
-			ev = {}
-			ev['id'] = event[0]
-			ev['begin_timestamp'] = event[1]
-			ev['duration_sec'] = event[2]
-			ev['title'] = filterName(event[4], encode)
-			ev['shortdesc'] = convertDesc(event[5], encode)
-			ev['longdesc'] = convertDesc(event[6], encode)
-			if event[7] is not None:
-				achannels = GetWithAlternative(event[7], False)
+			ev = serializer.serialize(event)
+			if asrefs and event[serializer.pos['R']] is not None:
+				achannels = GetWithAlternative(event[serializer.pos['R']], False)
 				if achannels:
 					ev['asrefs'] = achannels
-			ev['sref'] = event[7]
-			ev['sname'] = filterName(event[8], encode)
-			ev['now_timestamp'] = event[3]
-			ev['genre'],ev['genreid'] = convertGenre(event[9])
 			ret.append(ev)
 
 	return {"events": ret, "result": True}
 
 
-def getNowNextEpg(ref, servicetype, encode=False):
+NOWNEXT_SERVICE_KEYS = ('id', 'begin_timestamp', 'duration_sec', 'title', 'shortdesc', 'longdesc', 'sref', 'sname', 'now_timestamp', 'remaining', 'genre', 'genreid')
+
+
+def getNowNextEpg(ref, servicetype, encode=False, fields=None):
 	ref = unquote(ref)
 	ret = []
+	serializer = EventSerializer('IBDCTSERNWX', NOWNEXT_SERVICE_KEYS, fields, encode, 'IBRN')
+	pos = serializer.pos
 	epgcache = eEPGCache.getInstance()
-	events = epgcache.lookupEvent(['IBDCTSERNWX', (ref, servicetype, -1)])
+	events = epgcache.lookupEvent([serializer.fmt, (ref, servicetype, -1)])
 	if events is not None:
 		for event in events:
-			ev = {}
-			ev['id'] = event[0]
-			if event[1]:
-				ev['begin_timestamp'] = event[1]
-				ev['duration_sec'] = event[2]
-				ev['title'] = filterName(event[4], encode)
-				ev['shortdesc'] = convertDesc(event[5], encode)
-				ev['longdesc'] = convertDesc(event[6], encode)
-				ev['sref'] = event[7]
-				ev['sname'] = filterName(event[8], encode)
-				ev['now_timestamp'] = event[3]
-				ev['remaining'] = (event[1] + event[2]) - event[3]
-				ev['genre'],ev['genreid'] = convertGenre(event[9])
+			if event[pos['B']]:
+				ev = serializer.serialize(event)
 			else:
+				ev = {}
+				ev['id'] = event[pos['I']]
 				ev['begin_timestamp'] = 0
 				ev['duration_sec'] = 0
 				ev['title'] = "N/A"
 				ev['shortdesc'] = ""
 				ev['longdesc'] = ""
-				ev['sref'] = event[7]
-				ev['sname'] = filterName(event[8])
+				ev['sref'] = event[pos['R']]
+				ev['sname'] = filterName(event[pos['N']])
 				ev['now_timestamp'] = 0
 				ev['remaining'] = 0
 				ev['genre'] = ""
@@ -869,9 +928,70 @@ def getNowNextEpg(ref, servicetype, encode=False):
 	return {"events": ret, "result": True}
 
 
-def getSearchEpg(sstr, endtime=None, fulldesc=False, bouquetsonly=False, encode=False):
+def _buildBouquetMembership(stype):
+	members = set()
+	for bouquet in getBouquets(stype)["bouquets"]:
+		members.add(bouquet[0])
+		for sref in serviceListSnapshot.getContent(bouquet[0], 'S') or []:
+			# 512 is hidden service on sifteam image. Doesn't affect other images
+			if not int(sref.split(":")[1]) & 512:
+				members.add(sref)
+	return members
+
+
+def getBouquetMembership(stype="tv"):
+	"""
+	Return the set of service references contained in the visible
+	bouquets, built once per service list version.
+	"""
+	return serviceListSnapshot.getDerived(("membership", stype), lambda: _buildBouquetMembership(stype))
+
+
+#: result orders of getSearchEpg
+SEARCH_ORDERS = ('begin', 'relevance')
+
+SEARCH_EPG_FMT = 'IBDTSENRW'
+SEARCH_EPG_KEYS = ('id', 'date', 'begin_timestamp', 'begin', 'duration_sec', 'duration', 'end', 'title', 'shortdesc', 'longdesc', 'sref', 'sname', 'picon', 'now_timestamp', 'genre', 'genreid')
+
+
+def _searchRank(event, sstr):
+	title = (event[3] or "").lower()
+	if title == sstr:
+		rank = 0
+	elif title.startswith(sstr):
+		rank = 1
+	elif sstr in title:
+		rank = 2
+	else:
+		rank = 3
+	return (rank, event[1])
+
+
+def getSearchEpg(sstr, endtime=None, fulldesc=False, bouquetsonly=False, encode=False, limit=None, offset=0, begintime=None, channels=None, order=None, unique=False, fields=None):
+	"""
+	Search the EPG.
+
+	All filters are applied to the raw search results, so only the events
+	actually returned are formatted.
+
+	Args:
+		sstr (str): search string
+		endtime (int): skip events beginning after this time
+		fulldesc (bool): search the extended description too
+		bouquetsonly (bool): only return events of services in TV bouquets
+		encode (bool): escape texts for JSON/HTML output
+		limit (int): maximum number of events to return
+		offset (int): number of matching events to skip
+		begintime (int): skip events ending before this time
+		channels (iterable): only return events of these services
+		order (str): 'begin' or 'relevance', None keeps the EPG order
+		unique (bool): only return the first broadcast of a title and
+			short description
+		fields (str): comma separated event keys to return
+	Returns:
+		dict: events, total number of matches and result
+	"""
 	ret = []
-	ev = {}
 	if config.OpenWebif.epg_encoding.value != 'utf-8':
 		try:
 			sstr = sstr.encode(config.OpenWebif.epg_encoding.value)
@@ -882,82 +1002,212 @@ def getSearchEpg(sstr, endtime=None, fulldesc=False, bouquetsonly=False, encode=
 	if fulldesc:
 		if hasattr(eEPGCache, 'FULL_DESCRIPTION_SEARCH'):
 			search_type = eEPGCache.FULL_DESCRIPTION_SEARCH
-	events = epgcache.search(('IBDTSENRW', 128, search_type, sstr, 1))
+	maxresults = 128
+	if limit is not None:
+		maxresults = max(maxresults, offset + limit)
+	# the filters below read I, B, D, T and S at their usual positions
+	serializer = EventSerializer(SEARCH_EPG_FMT, SEARCH_EPG_KEYS, fields, encode, 'IBDTSR')
+	r = serializer.pos['R']
+	events = epgcache.search((serializer.fmt, maxresults, search_type, sstr, 1))
+	total = 0
 	if events is not None:
 		# TODO : discuss #677
 		# events.sort(key = lambda x: (x[1],x[6])) # sort by date,sname
 		# events.sort(key = lambda x: x[1]) # sort by date
+		bsref = None
 		if bouquetsonly:
-			# collect service references from TV bouquets
-			bsref = {}
-			for service in getAllServices('tv')['services']:
-				for service2 in service['subservices']:
-					bsref[service2['servicereference']] = True
-				else:
-					bsref[service['servicereference']] = True
+			bsref = getBouquetMembership('tv')
+		if channels is not None:
+			channels = set(channels)
 
+		matches = []
+		seen = set()
 		for event in events:
-			if bouquetsonly and not event[7] in bsref:
+			if bsref is not None and event[r] not in bsref:
 				continue
-			ev = {}
-			ev['id'] = event[0]
-			ev['date'] = "%s %s" % (tstrings[("day_" + strftime("%w", (localtime(event[1]))))], strftime("%d.%m.%Y", (localtime(event[1]))))
-			ev['begin_timestamp'] = event[1]
-			ev['begin'] = strftime("%H:%M", (localtime(event[1])))
-			ev['duration_sec'] = event[2]
-			ev['duration'] = int(event[2] / 60)
-			ev['end'] = strftime("%H:%M", (localtime(event[1] + event[2])))
-			ev['title'] = filterName(event[3], encode)
-			ev['shortdesc'] = convertDesc(event[4], encode)
-			ev['longdesc'] = convertDesc(event[5], encode)
-			ev['sref'] = event[7]
-			ev['sname'] = filterName(event[6], encode)
-			ev['picon'] = getPicon(event[7])
-			ev['now_timestamp'] = None
-			ev['genre'],ev['genreid'] = convertGenre(event[8])
-			if endtime:
-				# don't show events if begin after endtime
-				if event[1] <= endtime:
-					ret.append(ev)
+			if channels is not None and event[r] not in channels:
+				continue
+			# don't show events if begin after endtime
+			if endtime and event[1] > endtime:
+				continue
+			if begintime and event[1] + event[2] < begintime:
+				continue
+			if unique:
+				key = (event[3], event[4])
 			else:
-				ret.append(ev)
+				key = (event[r], event[0], event[1])
+			if key in seen:
+				continue
+			seen.add(key)
+			matches.append(event)
+
+		if order == 'begin':
+			matches.sort(key=lambda x: x[1])
+		elif order == 'relevance':
+			lsstr = sstr.lower()
+			matches.sort(key=lambda x: _searchRank(x, lsstr))
+
+		total = len(matches)
+		if limit is not None:
+			matches = matches[offset:offset + limit]
+		elif offset:
+			matches = matches[offset:]
+
+		for event in matches:
+			ev = serializer.serialize(event)
+			if serializer.wants('now_timestamp'):
+				ev['now_timestamp'] = None
+			ret.append(ev)
 
-	return {"events": ret, "result": True}
+	return {"events": ret, "total": total, "result": True}
+
+
+def _indexRow(event, fmt):
+	# lay out an EpgSearchIndex event like a search row of format `fmt`;
+	# the index keeps neither long descriptions nor the genre nibbles
+	columns = {
+		'I': event[0],
+		'B': event[1],
+		'D': event[2],
+		'T': event[3],
+		'S': event[4],
+		'E': "",
+		'N': epgSearchIndex.names.get(event[5]),
+		'R': event[5],
+		'W': event[6] and [(event[6] >> 4, event[6] & 15)] or None,
+	}
+	return tuple(columns[c] for c in fmt)
+
+
+def getIndexedSearchEpg(sstr, limit=None, offset=0, channel=None, genre=None, encode=False, fields=None):
+	"""
+	Search-as-you-type on the in-memory EPG index, falling back to
+	getSearchEpg while the index is disabled or not built yet.
+
+	The events carry no long description, `completions` lists the
+	indexed words the last search word may be completed to and
+	`channels` / `genres` count the matches per service and genre id.
+	"""
+	if not epgSearchIndex.ready:
+		channels = channel and [channel] or None
+		ret = getSearchEpg(sstr, None, False, False, encode, limit, offset, None, channels, 'begin', False, fields)
+		ret["indexed"] = False
+		return ret
+
+	result = epgSearchIndex.search(sstr, limit, offset, channel, genre)
+	serializer = EventSerializer(SEARCH_EPG_FMT, SEARCH_EPG_KEYS, fields, encode)
+	ret = []
+	for event in result["events"]:
+		ev = serializer.serialize(_indexRow(event, serializer.fmt))
+		if serializer.wants('now_timestamp'):
+			ev['now_timestamp'] = None
+		ret.append(ev)
+
+	return {
+		"events": ret,
+		"total": result["total"],
+		"completions": result["completions"],
+		"channels": result["channels"],
+		"genres": result["genres"],
+		"indexed": True,
+		"result": True
+	}
 
 
-def getSearchSimilarEpg(ref, eventid, encode=False):
+def getSearchSimilarEpg(ref, eventid, encode=False, fields=None):
 	ref = unquote(ref)
 	ret = []
 	ev = {}
 	epgcache = eEPGCache.getInstance()
-	events = epgcache.search(('IBDTSENRW', 128, eEPGCache.SIMILAR_BROADCASTINGS_SEARCH, ref, eventid))
+	serializer = EventSerializer(SEARCH_EPG_FMT, SEARCH_EPG_KEYS, fields, encode)
+	events = epgcache.search((serializer.fmt, 128, eEPGCache.SIMILAR_BROADCASTINGS_SEARCH, ref, eventid))
 	if events is not None:
 		# TODO : discuss #677
 		# events.sort(key = lambda x: (x[1],x[6])) # sort by date,sname
 		# events.sort(key = lambda x: x[1]) # sort by date
 		for event in events:
-			ev = {}
-			ev['id'] = event[0]
-			ev['date'] = "%s %s" % (tstrings[("day_" + strftime("%w", (localtime(event[1]))))], strftime("%d.%m.%Y", (localtime(event[1]))))
-			ev['begin_timestamp'] = event[1]
-			ev['begin'] = strftime("%H:%M", (localtime(event[1])))
-			ev['duration_sec'] = event[2]
-			ev['duration'] = int(event[2] / 60)
-			ev['end'] = strftime("%H:%M", (localtime(event[1] + event[2])))
-			ev['title'] = filterName(event[3], encode)
-			ev['shortdesc'] = convertDesc(event[4], encode)
-			ev['longdesc'] = convertDesc(event[5], encode)
-			ev['sref'] = event[7]
-			ev['sname'] = filterName(event[6], encode)
-			ev['picon'] = getPicon(event[7])
-			ev['now_timestamp'] = None
-			ev['genre'],ev['genreid'] = convertGenre(event[8])
+			ev = serializer.serialize(event)
+			if serializer.wants('now_timestamp'):
+				ev['now_timestamp'] = None
 			ret.append(ev)
 
 	return {"events": ret, "result": True}
 
 
+class MultiEpgCache(object):
+	"""
+	Short-lived cache for the multi EPG grid built by getMultiEpg.
+
+	Entries are keyed by bouquet reference, time frame, display mode and
+	the version of the timer index, which changes when a timer is added,
+	removed or reordered by anyone (web API, AutoTimer, the receiver's UI)
+	or changes state. They expire after `ttl` seconds, but never later
+	than the end of the current two hour slot, as the grid layout is
+	aligned to those slots. The cache is flushed whenever the EPG is
+	reloaded.
+	"""
+	SLOT = 7200
+
+	def __init__(self, ttl=120, maxentries=32):
+		self.ttl = ttl
+		self.maxentries = maxentries
+		self.entries = {}
+		self.hits = 0
+		self.misses = 0
+		self.invalidations = 0
+
+	def get(self, key):
+		entry = self.entries.get(key)
+		if entry is not None:
+			if time() < entry[0]:
+				self.hits += 1
+				return entry[1]
+			del self.entries[key]
+		self.misses += 1
+		return None
+
+	def put(self, key, value):
+		now = time()
+		bt = localtime(now)
+		slotend = mktime((bt.tm_year, bt.tm_mon, bt.tm_mday, bt.tm_hour - bt.tm_hour % 2, 0, 0, -1, -1, -1)) + self.SLOT
+		if len(self.entries) >= self.maxentries:
+			self.entries.clear()
+		self.entries[key] = (min(now + self.ttl, slotend), value)
+
+	def invalidate(self):
+		if self.entries:
+			self.entries.clear()
+		self.invalidations += 1
+
+	def getStats(self):
+		return {
+			"entries": len(self.entries),
+			"hits": self.hits,
+			"misses": self.misses,
+			"invalidations": self.invalidations
+		}
+
+
+multiEpgCache = MultiEpgCache()
+
+
+def invalidateMultiEpgCache():
+	multiEpgCache.invalidate()
+
+
 def getMultiEpg(self, ref, begintime=-1, endtime=None, Mode=1):
+	timerIndex.validate(self.session.nav.RecordTimer)
+	key = (ref, begintime, endtime, Mode, timerIndex.version)
+	ret = multiEpgCache.get(key)
+	if ret is None:
+		ret = _getMultiEpg(self, ref, begintime, endtime, Mode)
+		if ret["result"]:
+			multiEpgCache.put(key, ret)
+	# callers decorate the result with request specific keys
+	return dict(ret)
+
+
+def _getMultiEpg(self, ref, begintime=-1, endtime=None, Mode=1):
 	# Check if an event has an associated timer. Unfortunately
 	# we cannot simply check against timer.eit, because a timer
 	# does not necessarily have one belonging to an epg event id.
@@ -976,12 +1226,12 @@ def getMultiEpg(self, ref, begintime=-1, endtime=None, Mode=1):
 		return ''
 
 	ret = OrderedDict()
-	services = eServiceCenter.getInstance().list(eServiceReference(ref))
-	if not services:
+	services = serviceListSnapshot.getContent(ref, 'S', False)
+	if services is None:
 		return {"events": ret, "result": False, "slot": None}
 
 	search = ['IBTSRND']
-	for service in services.getContent('S'):
+	for service in services:
 		if endtime:
 			search.append((service, 0, begintime, endtime))
 		else:
@@ -995,14 +1245,10 @@ def getMultiEpg(self, ref, begintime=-1, endtime=None, Mode=1):
 	if events is not None:
 		# We want to display if an event is covered by a timer.
 		# To keep the costs low for a nested loop against the timer list, we
-		# partition the timers by service reference. For an event we then only
-		# have to check the part of the timers that belong to that specific
-		# service reference. Partition is generated here.
-		timerlist = {}
-		for timer in self.session.nav.RecordTimer.timer_list + self.session.nav.RecordTimer.processed_timers:
-			if not timerlist.has_key(str(timer.service_ref)):
-				timerlist[str(timer.service_ref)] = []
-			timerlist[str(timer.service_ref)].append(timer)
+		# use the timers partitioned by service reference. For an event we
+		# then only have to check the part of the timers that belong to that
+		# specific service reference.
+		timerlist = timerIndex.byService(self.session.nav.RecordTimer)
 
 		if begintime == -1:
 			# If no start time is requested, use current time as start time and extend
@@ -1046,75 +1292,142 @@ def getMultiEpg(self, ref, begintime=-1, endtime=None, Mode=1):
 	return {"events": ret, "result": True, "picons": picons}
 
 
-def getPicon(sname):
+class PiconIndex(object):
+	"""
+	In-memory index of the picon directory.
+
+	The directory is listed once and rescanned only when its mtime changes;
+	the mtime itself is checked at most every `check_interval` seconds, so
+	lookups between checks do not touch the filesystem at all. A service
+	without a picon checks it early, at most every `miss_interval`
+	seconds, so a picon just copied to the directory is found right away.
+	Resolved picon URLs are memoized per service reference until the next
+	rescan.
+	"""
+	def __init__(self, path, check_interval=60, miss_interval=5):
+		self.path = path
+		self.check_interval = check_interval
+		self.miss_interval = miss_interval
+		self.names = set()
+		self.urls = {}
+		self.mtime = None
+		self.checked = 0
+		self.listversion = None
+
+	def refresh(self, force=False, interval=None):
+		"""
+		Rescan the directory if its mtime changed, checked at most every
+		`interval` seconds (default `check_interval`). Returns True if it
+		was rescanned.
+		"""
+		# resolved names depend on service names and alternatives
+		serviceListSnapshot.validate()
+		if self.listversion != serviceListSnapshot.version:
+			self.listversion = serviceListSnapshot.version
+			self.urls.clear()
+		if interval is None:
+			interval = self.check_interval
+		now = time()
+		if not force and now - self.checked < interval:
+			return False
+		self.checked = now
+		try:
+			mtime = os.stat(self.path).st_mtime
+		except OSError:
+			mtime = None
+		if force or mtime != self.mtime:
+			try:
+				self.names = set(os.listdir(self.path))
+			except OSError:
+				self.names = set()
+			self.mtime = mtime
+			self.urls.clear()
+			return True
+		return False
+
+	def invalidate(self):
+		self.refresh(force=True)
+
+	def exists(self, name):
+		return name in self.names
+
 
-	pp = PICON_PATH
-	if pp is not None:
-		# remove URL part
-		if ("://" in sname) or ("%3a//" in sname) or ("%3A//" in sname):
-			cname = unquote(sname.split(":")[-1])
-			sname = unquote(sname)
-			# sname = ":".join(sname.split(":")[:10]) -> old way
-			sname = ":".join(sname.split("://")[:1])
-			sname = GetWithAlternative(sname)
-			cname = unicodedata.normalize('NFKD', unicode(cname, 'utf_8', errors='ignore')).encode('ASCII', 'ignore')
-			cname = re.sub('[^a-z0-9]', '', cname.replace('&', 'and').replace('+', 'plus').replace('*', 'star').replace(':', '').lower())
-			# picon by channel name for URL
-			if len(cname) > 0 and fileExists(pp + cname + ".png"):
-				return "/picon/" + cname + ".png"
-			if len(cname) > 2 and cname.endswith('hd') and fileExists(pp + cname[:-2] + ".png"):
-				return "/picon/" + cname[:-2] + ".png"
-			if len(cname) > 5:
-				series = re.sub(r's[0-9]*e[0-9]*$', '', cname)
-				if fileExists(pp + series + ".png"):
-					return "/picon/" + series + ".png"
+piconIndex = PiconIndex(PICON_PATH) if PICON_PATH is not None else None
 
+
+def getPicon(sname):
+	if piconIndex is None:
+		return "/images/default_picon.png"
+	piconIndex.refresh()
+	url = piconIndex.urls.get(sname)
+	if url is None:
+		url = _resolvePicon(sname, piconIndex.exists)
+		if url == "/images/default_picon.png" and piconIndex.refresh(interval=piconIndex.miss_interval):
+			url = _resolvePicon(sname, piconIndex.exists)
+		piconIndex.urls[sname] = url
+	return url
+
+
+def _resolvePicon(sname, exists):
+	# remove URL part
+	if ("://" in sname) or ("%3a//" in sname) or ("%3A//" in sname):
+		cname = unquote(sname.split(":")[-1])
+		sname = unquote(sname)
+		# sname = ":".join(sname.split(":")[:10]) -> old way
+		sname = ":".join(sname.split("://")[:1])
 		sname = GetWithAlternative(sname)
-		if sname is not None:
-			pos = sname.rfind(':')
-		else:
-			return "/images/default_picon.png"
-		cname = None
-		if pos != -1:
-			cname = ServiceReference(sname[:pos].rstrip(':')).getServiceName()
-			sname = sname[:pos].rstrip(':').replace(':', '_') + ".png"
-		filename = pp + sname
-		if fileExists(filename):
+		cname = unicodedata.normalize('NFKD', unicode(cname, 'utf_8', errors='ignore')).encode('ASCII', 'ignore')
+		cname = re.sub('[^a-z0-9]', '', cname.replace('&', 'and').replace('+', 'plus').replace('*', 'star').replace(':', '').lower())
+		# picon by channel name for URL
+		if len(cname) > 0 and exists(cname + ".png"):
+			return "/picon/" + cname + ".png"
+		if len(cname) > 2 and cname.endswith('hd') and exists(cname[:-2] + ".png"):
+			return "/picon/" + cname[:-2] + ".png"
+		if len(cname) > 5:
+			series = re.sub(r's[0-9]*e[0-9]*$', '', cname)
+			if exists(series + ".png"):
+				return "/picon/" + series + ".png"
+
+	sname = GetWithAlternative(sname)
+	if sname is not None:
+		pos = sname.rfind(':')
+	else:
+		return "/images/default_picon.png"
+	cname = None
+	if pos != -1:
+		cname = ServiceReference(sname[:pos].rstrip(':')).getServiceName()
+		sname = sname[:pos].rstrip(':').replace(':', '_') + ".png"
+	if exists(sname):
+		return "/picon/" + sname
+	fields = sname.split('_', 8)
+	if len(fields) > 7 and not fields[6].endswith("0000"):
+		# remove "sub-network" from namespace
+		fields[6] = fields[6][:-4] + "0000"
+		sname = '_'.join(fields)
+		if exists(sname):
+			return "/picon/" + sname
+	if len(fields) > 1 and fields[0] != '1':
+		# fallback to 1 for other reftypes
+		fields[0] = '1'
+		sname = '_'.join(fields)
+		if exists(sname):
+			return "/picon/" + sname
+	if len(fields) > 3 and fields[2] != '1':
+		# fallback to 1 for tv services with nonstandard servicetypes
+		fields[2] = '1'
+		sname = '_'.join(fields)
+		if exists(sname):
 			return "/picon/" + sname
-		fields = sname.split('_', 8)
-		if len(fields) > 7 and not fields[6].endswith("0000"):
-			# remove "sub-network" from namespace
-			fields[6] = fields[6][:-4] + "0000"
-			sname = '_'.join(fields)
-			filename = pp + sname
-			if fileExists(filename):
-				return "/picon/" + sname
-		if len(fields) > 1 and fields[0] != '1':
-			# fallback to 1 for other reftypes
-			fields[0] = '1'
-			sname = '_'.join(fields)
-			filename = pp + sname
-			if fileExists(filename):
-				return "/picon/" + sname
-		if len(fields) > 3 and fields[2] != '1':
-			# fallback to 1 for tv services with nonstandard servicetypes
-			fields[2] = '1'
-			sname = '_'.join(fields)
-			filename = pp + sname
-			if fileExists(filename):
-				return "/picon/" + sname
-		if cname is not None:  # picon by channel name
-			cname1 = cname.replace('\xc2\x86', '').replace('\xc2\x87', '').replace('/', '_').encode('utf-8', 'ignore')
-			if fileExists(pp + cname1 + ".png"):
-				return "/picon/" + cname1 + ".png"
-			cname = unicodedata.normalize('NFKD', unicode(cname, 'utf_8', errors='ignore')).encode('ASCII', 'ignore')
-			cname = re.sub('[^a-z0-9]', '', cname.replace('&', 'and').replace('+', 'plus').replace('*', 'star').lower())
-			if len(cname) > 0:
-				filename = pp + cname + ".png"
-			if fileExists(filename):
-				return "/picon/" + cname + ".png"
-			if len(cname) > 2 and cname.endswith('hd') and fileExists(pp + cname[:-2] + ".png"):
-				return "/picon/" + cname[:-2] + ".png"
+	if cname is not None:  # picon by channel name
+		cname1 = cname.replace('\xc2\x86', '').replace('\xc2\x87', '').replace('/', '_').encode('utf-8', 'ignore')
+		if exists(cname1 + ".png"):
+			return "/picon/" + cname1 + ".png"
+		cname = unicodedata.normalize('NFKD', unicode(cname, 'utf_8', errors='ignore')).encode('ASCII', 'ignore')
+		cname = re.sub('[^a-z0-9]', '', cname.replace('&', 'and').replace('+', 'plus').replace('*', 'star').lower())
+		if len(cname) > 0 and exists(cname + ".png"):
+			return "/picon/" + cname + ".png"
+		if len(cname) > 2 and cname.endswith('hd') and exists(cname[:-2] + ".png"):
+			return "/picon/" + cname[:-2] + ".png"
 	return "/images/default_picon.png"
 
 
@@ -1147,6 +1460,9 @@ def getParentalControlList():
 def loadEpg():
 	epgcache = eEPGCache.getInstance()
 	epgcache.load()
+	invalidateMultiEpgCache()
+	epgSearchIndex.invalidate()
+	descriptionCache.invalidate()
 	return {
 		"result": True,
 		"message": ""
@@ -1156,6 +1472,7 @@ def loadEpg():
 def saveEpg():
 	epgcache = eEPGCache.getInstance()
 	epgcache.save()
+	epgSearchIndex.invalidate()
 	return {
 		"result": True,
 		"message": ""
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#                        2019 E2OpenPlugins                                  #
+#                                                                            #
+#  This file is open source software; you can redistribute it and/or modify  #
+#     it under the terms of the GNU General Public License version 2 as      #
+#               published by the Free Software Foundation.                   #
+#                                                                            #
+##############################################################################
+import os
+import time
+
+from ..i18n import tstrings
+
+
+class TimeFormatCache(object):
+	"""
+	Memoized local time formatting for EPG rows.
+
+	None of the formatted fields has a finer resolution than a minute,
+	so the strings are cached per minute: one localtime() call fills the
+	clock time, the date and the weekday of that minute. The cache is dropped
+	when the time zone changes (enigma2 sets TZ and calls tzset) or once
+	it holds `maxentries` minutes, about two weeks of distinct minutes
+	by default.
+	"""
+	def __init__(self, maxentries=20160):
+		self.maxentries = maxentries
+		self.minutes = {}
+		self.zone = None
+
+	def _zone(self):
+		return (os.environ.get("TZ"), time.timezone, time.altzone, time.daylight)
+
+	def get(self, timestamp):
+		"""
+		Return ("HH:MM", "dd.mm.YYYY", localized weekday) of a timestamp.
+		"""
+		zone = self._zone()
+		if zone != self.zone:
+			self.zone = zone
+			self.minutes = {}
+		minute = int(timestamp) // 60
+		entry = self.minutes.get(minute)
+		if entry is None:
+			if len(self.minutes) >= self.maxentries:
+				self.minutes = {}
+			lt = time.localtime(minute * 60)
+			entry = self.minutes[minute] = (
+				time.strftime("%H:%M", lt),
+				time.strftime("%d.%m.%Y", lt),
+				tstrings["day_" + time.strftime("%w", lt)])
+		return entry
+
+	def invalidate(self):
+		self.minutes = {}
+
+
+timeFormatCache = TimeFormatCache()
+
+
+def formatClock(timestamp):
+	return timeFormatCache.get(timestamp)[0]
+
+
+def formatDate(timestamp):
+	return timeFormatCache.get(timestamp)[1]
+
+
+def formatDay(timestamp):
+	"""
+	Weekday and date, e.g. "Mon 01.04.2019".
+	"""
+	entry = timeFormatCache.get(timestamp)
+	return "%s %s" % (entry[2], entry[1])
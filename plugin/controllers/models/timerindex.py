@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#                        2019 E2OpenPlugins                                  #
+#                                                                            #
+#  This file is open source software; you can redistribute it and/or modify  #
+#     it under the terms of the GNU General Public License version 2 as      #
+#               published by the Free Software Foundation.                   #
+#                                                                            #
+##############################################################################
+from enigma import eEPGCache
+
+
+def normalizeRef(sref):
+	"""
+	The first 11 fields of a service reference, which identify the
+	service of a timer regardless of name or path.
+	"""
+	return ':'.join(str(sref).split(':')[:11])
+
+
+def _listFingerprint(timers):
+	# identities only, cheap enough to compute on every lookup; it changes
+	# when a timer is added, removed or replaced by another object
+	return (len(timers), hash(tuple(map(id, timers))))
+
+
+def _timerKey(timer):
+	return (normalizeRef(timer.service_ref.ref.toString()), int(timer.begin), int(timer.end))
+
+
+class TimerIndex(object):
+	"""
+	Lookup tables over the timers of a RecordTimer, replacing linear scans
+	of timer_list + processed_timers.
+
+	`entries` maps (normalized service reference, begin, end) and
+	`services` maps the service reference string to the timers, both in
+	list order. The tables are rebuilt when a pending or processed timer
+	was added, removed or replaced by another object, when a timer changed
+	state and after invalidate(), which the web API calls after modifying
+	timers itself.
+	Timers edited in place by other plugins are caught by find(): a stale
+	candidate is verified against its current values and a miss rebuilds
+	the tables once before giving up.
+	`version` counts the rebuilds, caches of data derived from the timers
+	use it to notice changes.
+	"""
+	def __init__(self):
+		self.recordtimer = None
+		self.fingerprint = None
+		self.version = 0
+		self.entries = {}
+		self.services = {}
+
+	def invalidate(self, *args):
+		self.fingerprint = None
+
+	def _hook(self, recordtimer):
+		if self.recordtimer is not None and hasattr(self.recordtimer, "on_state_change"):
+			if self.invalidate in self.recordtimer.on_state_change:
+				self.recordtimer.on_state_change.remove(self.invalidate)
+		self.recordtimer = recordtimer
+		if hasattr(recordtimer, "on_state_change"):
+			recordtimer.on_state_change.append(self.invalidate)
+		self.fingerprint = None
+
+	def validate(self, recordtimer):
+		if recordtimer is not self.recordtimer:
+			self._hook(recordtimer)
+		fingerprint = (_listFingerprint(recordtimer.timer_list), _listFingerprint(recordtimer.processed_timers))
+		if fingerprint != self.fingerprint:
+			self.rebuild(recordtimer)
+			self.fingerprint = fingerprint
+
+	def rebuild(self, recordtimer):
+		entries = {}
+		services = {}
+		for timers in (recordtimer.timer_list, recordtimer.processed_timers):
+			for timer in timers:
+				entries.setdefault(_timerKey(timer), []).append(timer)
+				services.setdefault(str(timer.service_ref), []).append(timer)
+		self.entries = entries
+		self.services = services
+		self.version += 1
+
+	def find(self, recordtimer, serviceref, begin, end):
+		"""
+		Return the first timer of `serviceref` from `begin` to `end`, or None.
+
+		Args:
+			recordtimer: the RecordTimer to search
+			serviceref (str): service reference, only the first 11 fields count
+			begin (int): begin timestamp of the timer
+			end (int): end timestamp of the timer
+		"""
+		key = (normalizeRef(serviceref), int(begin), int(end))
+		self.validate(recordtimer)
+		for attempt in (0, 1):
+			for timer in self.entries.get(key, ()):
+				if _timerKey(timer) == key:
+					return timer
+			if attempt == 0:
+				self.rebuild(recordtimer)
+		return None
+
+	def byService(self, recordtimer):
+		"""
+		Return the timers partitioned by service reference string. The
+		dict is shared, callers must not modify it.
+		"""
+		self.validate(recordtimer)
+		return self.services
+
+
+timerIndex = TimerIndex()
+
+
+class DescriptionCache(object):
+	"""
+	Extended descriptions of the EPG events timers were created from,
+	keyed by (service reference, event id). Lookups are batched into one
+	lookupEvent query per call of get(). Events not found are not cached,
+	their data may still arrive; the cache is dropped when the EPG is
+	reloaded or once it holds `maxentries` descriptions.
+	"""
+	def __init__(self, maxentries=2000):
+		self.maxentries = maxentries
+		self.entries = {}
+
+	def get(self, keys):
+		"""
+		Return a dict of the descriptions found for the (service reference,
+		event id) tuples in `keys`.
+		"""
+		found = {}
+		missing = []
+		for key in set(keys):
+			if key in self.entries:
+				found[key] = self.entries[key]
+			else:
+				missing.append(key)
+		if missing:
+			query = ['EX']
+			for sref, eit in missing:
+				query.append((sref, 2, eit))
+			events = eEPGCache.getInstance().lookupEvent(query) or []
+			if len(self.entries) + len(missing) > self.maxentries:
+				self.entries = {}
+			# X returns one row per query, in query order
+			for key, event in zip(missing, events):
+				if event and event[0]:
+					found[key] = self.entries[key] = event[0]
+		return found
+
+	def invalidate(self):
+		self.entries = {}
+
+
+descriptionCache = DescriptionCache()
@@ -18,19 +18,60 @@ from ServiceReference import ServiceReference
 from time import time, strftime, localtime, mktime
 from urllib import unquote
 from info import GetWithAlternative
+from services import invalidateMultiEpgCache
+from timerindex import timerIndex, descriptionCache
+from timeformat import formatClock, formatDate
 from ..i18n import _
 
-def getTimers(session):
+
+def _timersChanged():
+	timerIndex.invalidate()
+	invalidateMultiEpgCache()
+
+
+#: keys of the timers returned by getTimers
+TIMER_FIELDS = (
+	"serviceref", "servicename", "eit", "name", "description",
+	"descriptionextended", "disabled", "begin", "end", "duration",
+	"startprepare", "justplay", "afterevent", "dirname", "tags",
+	"logentries", "backoff", "firsttryprepare", "state", "repeated",
+	"dontsave", "cancelled", "toggledisabled", "toggledisabledimg",
+	"filename", "nextactivation", "realbegin", "realend", "asrefs",
+	"vpsplugin_enabled", "vpsplugin_overwrite", "vpsplugin_time",
+	"always_zap")
+
+
+def getTimers(session, fields=None):
+	"""
+	Get the pending and processed timers.
+
+	Args:
+		session: enigma2 session
+		fields (str): comma separated keys of TIMER_FIELDS to return,
+			None for all; unknown names are ignored. Extended
+			descriptions, alternatives and service names are only looked
+			up when selected.
+	Returns:
+		dict: timers
+	"""
+	selected = None
+	if fields is not None:
+		names = set(f.strip() for f in fields.split(','))
+		if names & set(TIMER_FIELDS):
+			selected = names
 	rt = session.nav.RecordTimer
-	timers = []
-	for timer in rt.timer_list + rt.processed_timers:
-		descriptionextended = "N/A"
+	timers = rt.timer_list + rt.processed_timers
+
+	descriptions = {}
+	if selected is None or "descriptionextended" in selected:
+		descriptions = descriptionCache.get([(str(timer.service_ref), timer.eit) for timer in timers if timer.eit and timer.service_ref])
+
+	result = []
+	for timer in timers:
+		sref = str(timer.service_ref)
+		descriptionextended = descriptions.get((sref, timer.eit), "N/A")
 		filename = None
 		nextactivation = None
-		if timer.eit and timer.service_ref:
-			event = eEPGCache.getInstance().lookupEvent(['EX', (str(timer.service_ref), 2, timer.eit)])
-			if event and event[0][0]:
-				descriptionextended = event[0][0]
 
 		try:
 			filename = timer.Filename
@@ -68,9 +109,14 @@ def getTimers(session):
 				toggledisabledimg = "on"
 
 		asrefs = ""
-		achannels = GetWithAlternative(str(timer.service_ref), False)
-		if achannels:
-			asrefs = achannels
+		if selected is None or "asrefs" in selected:
+			achannels = GetWithAlternative(sref, False)
+			if achannels:
+				asrefs = achannels
+
+		servicename = ""
+		if selected is None or "servicename" in selected:
+			servicename = timer.service_ref.getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', '')
 
 		vpsplugin_enabled = False
 		vpsplugin_overwrite = False
@@ -91,9 +137,9 @@ def getTimers(session):
 			else:
 				always_zap = 0
 
-		timers.append({
-			"serviceref": str(timer.service_ref),
-			"servicename": timer.service_ref.getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
+		entry = {
+			"serviceref": sref,
+			"servicename": servicename,
 			"eit": timer.eit,
 			"name": timer.name,
 			"description": timer.description,
@@ -118,18 +164,21 @@ def getTimers(session):
 			"toggledisabledimg": toggledisabledimg,
 			"filename": filename,
 			"nextactivation": nextactivation,
-			"realbegin": strftime("%d.%m.%Y %H:%M", (localtime(float(timer.begin)))),
-			"realend": strftime("%d.%m.%Y %H:%M", (localtime(float(timer.end)))),
+			"realbegin": "%s %s" % (formatDate(timer.begin), formatClock(timer.begin)),
+			"realend": "%s %s" % (formatDate(timer.end), formatClock(timer.end)),
 			"asrefs": asrefs,
 			"vpsplugin_enabled": vpsplugin_enabled,
 			"vpsplugin_overwrite": vpsplugin_overwrite,
 			"vpsplugin_time": vpsplugin_time,
 			"always_zap": always_zap
-		})
+		}
+		if selected is not None:
+			entry = dict((key, value) for key, value in entry.iteritems() if key in selected)
+		result.append(entry)
 
 	return {
 		"result": True,
-		"timers": timers
+		"timers": result
 	}
 
 
@@ -196,6 +245,7 @@ def addTimer(session, serviceref, begin, end, name, description, disabled, justp
 			"message": _("Could not add timer '%s'!") % name
 		}
 
+	_timersChanged()
 	return {
 		"result": True,
 		"message": _("Timer '%s' added") % name
@@ -240,72 +290,71 @@ def addTimerByEventId(session, eventid, serviceref, justplay, dirname, tags, vps
 # !!! This new function must be tested !!!!
 # TODO: exception handling
 def editTimer(session, serviceref, begin, end, name, description, disabled, justplay, afterEvent, dirname, tags, repeated, channelOld, beginOld, endOld, vpsinfo, always_zap):
-	channelOld_str = ':'.join(str(channelOld).split(':')[:11])
 	rt = session.nav.RecordTimer
-	for timer in rt.timer_list + rt.processed_timers:
-		needed_ref = ':'.join(timer.service_ref.ref.toString().split(':')[:11]) == channelOld_str
-		if needed_ref and int(timer.begin) == beginOld and int(timer.end) == endOld:
-			timer.service_ref = ServiceReference(serviceref)
-			# TODO: start end time check
-			timer.begin = int(float(begin))
-			timer.end = int(float(end))
-			timer.name = name
-			timer.description = description
-			# TODO : EIT
-			# timer.eit = eit
-			timer.disabled = disabled
-			timer.justplay = justplay
-			timer.afterEvent = afterEvent
-			timer.dirname = dirname
-			timer.tags = tags
-			timer.repeated = repeated
-			timer.processRepeated()
-			if vpsinfo is not None:
-				timer.vpsplugin_enabled = vpsinfo["vpsplugin_enabled"]
-				timer.vpsplugin_overwrite = vpsinfo["vpsplugin_overwrite"]
-				timer.vpsplugin_time = vpsinfo["vpsplugin_time"]
-
-			if always_zap != -1:
-				if hasattr(timer, "always_zap"):
-					timer.always_zap = always_zap == 1
-
-			# TODO: multi tuner test
-			sanity = TimerSanityCheck(rt.timer_list, timer)
-			conflicts = None
-			if not sanity.check():
-				conflicts = sanity.getSimulTimerList()
-				if conflicts is not None:
-					for conflict in conflicts:
-						if conflict.setAutoincreaseEnd(timer):
-							rt.timeChanged(conflict)
-							if not sanity.check():
-								conflicts = sanity.getSimulTimerList()
-			if conflicts is None:
-				rt.timeChanged(timer)
-				return {
-					"result": True,
-					"message": _("Timer '%s' changed") % name
-				}
-			else:
-				errors = []
-				conflictinfo = []
+	timer = timerIndex.find(rt, channelOld, beginOld, endOld)
+	if timer is not None:
+		timer.service_ref = ServiceReference(serviceref)
+		# TODO: start end time check
+		timer.begin = int(float(begin))
+		timer.end = int(float(end))
+		timer.name = name
+		timer.description = description
+		# TODO : EIT
+		# timer.eit = eit
+		timer.disabled = disabled
+		timer.justplay = justplay
+		timer.afterEvent = afterEvent
+		timer.dirname = dirname
+		timer.tags = tags
+		timer.repeated = repeated
+		timer.processRepeated()
+		if vpsinfo is not None:
+			timer.vpsplugin_enabled = vpsinfo["vpsplugin_enabled"]
+			timer.vpsplugin_overwrite = vpsinfo["vpsplugin_overwrite"]
+			timer.vpsplugin_time = vpsinfo["vpsplugin_time"]
+
+		if always_zap != -1:
+			if hasattr(timer, "always_zap"):
+				timer.always_zap = always_zap == 1
+
+		# TODO: multi tuner test
+		sanity = TimerSanityCheck(rt.timer_list, timer)
+		conflicts = None
+		if not sanity.check():
+			conflicts = sanity.getSimulTimerList()
+			if conflicts is not None:
 				for conflict in conflicts:
-					errors.append(conflict.name)
-					conflictinfo.append({
-						"serviceref": str(conflict.service_ref),
-						"servicename": conflict.service_ref.getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
-						"name": conflict.name,
-						"begin": conflict.begin,
-						"end": conflict.end,
-						"realbegin": strftime("%d.%m.%Y %H:%M", (localtime(float(conflict.begin)))),
-						"realend": strftime("%d.%m.%Y %H:%M", (localtime(float(conflict.end))))
-					})
+					if conflict.setAutoincreaseEnd(timer):
+						rt.timeChanged(conflict)
+						if not sanity.check():
+							conflicts = sanity.getSimulTimerList()
+		_timersChanged()
+		if conflicts is None:
+			rt.timeChanged(timer)
+			return {
+				"result": True,
+				"message": _("Timer '%s' changed") % name
+			}
+		else:
+			errors = []
+			conflictinfo = []
+			for conflict in conflicts:
+				errors.append(conflict.name)
+				conflictinfo.append({
+					"serviceref": str(conflict.service_ref),
+					"servicename": conflict.service_ref.getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
+					"name": conflict.name,
+					"begin": conflict.begin,
+					"end": conflict.end,
+					"realbegin": strftime("%d.%m.%Y %H:%M", (localtime(float(conflict.begin)))),
+					"realend": strftime("%d.%m.%Y %H:%M", (localtime(float(conflict.end))))
+				})
 
-				return {
-					"result": False,
-					"message": _("Timer '%s' not saved while Conflict") % name,
-					"conflicts": conflictinfo
-				}
+			return {
+				"result": False,
+				"message": _("Timer '%s' not saved while Conflict") % name,
+				"conflicts": conflictinfo
+			}
 
 	return {
 		"result": False,
@@ -314,16 +363,15 @@ def editTimer(session, serviceref, begin, end, name, description, disabled, just
 
 
 def removeTimer(session, serviceref, begin, end):
-	serviceref_str = ':'.join(str(serviceref).split(':')[:11])
 	rt = session.nav.RecordTimer
-	for timer in rt.timer_list + rt.processed_timers:
-		needed_ref = ':'.join(timer.service_ref.ref.toString().split(':')[:11]) == serviceref_str
-		if needed_ref and int(timer.begin) == begin and int(timer.end) == end:
-			rt.removeEntry(timer)
-			return {
-				"result": True,
-				"message": _("The timer '%s' has been deleted successfully") % timer.name
-			}
+	timer = timerIndex.find(rt, serviceref, begin, end)
+	if timer is not None:
+		rt.removeEntry(timer)
+		_timersChanged()
+		return {
+			"result": True,
+			"message": _("The timer '%s' has been deleted successfully") % timer.name
+		}
 
 	return {
 		"result": False,
@@ -333,42 +381,41 @@ def removeTimer(session, serviceref, begin, end):
 
 def toggleTimerStatus(session, serviceref, begin, end):
 	serviceref = unquote(serviceref)
-	serviceref_str = ':'.join(str(serviceref).split(':')[:11])
 	rt = session.nav.RecordTimer
-	for timer in rt.timer_list + rt.processed_timers:
-		needed_ref = ':'.join(timer.service_ref.ref.toString().split(':')[:11]) == serviceref_str
-		if needed_ref and int(timer.begin) == begin and int(timer.end) == end:
-			if timer.disabled:
-				timer.enable()
-				effect = "enabled"
-				sanity = TimerSanityCheck(rt.timer_list, timer)
-				if not sanity.check():
-					timer.disable()
-					return {
-						"result": False,
-						"message": _("Timer '%s' not enabled while Conflict") % (timer.name)
-					}
-				elif sanity.doubleCheck():
-					timer.disable()
-					return {
-						"result": False,
-						"message": _("Timer '%s' already exists!") % (timer.name)
-					}
+	timer = timerIndex.find(rt, serviceref, begin, end)
+	if timer is not None:
+		if timer.disabled:
+			timer.enable()
+			effect = "enabled"
+			sanity = TimerSanityCheck(rt.timer_list, timer)
+			if not sanity.check():
+				timer.disable()
+				return {
+					"result": False,
+					"message": _("Timer '%s' not enabled while Conflict") % (timer.name)
+				}
+			elif sanity.doubleCheck():
+				timer.disable()
+				return {
+					"result": False,
+					"message": _("Timer '%s' already exists!") % (timer.name)
+				}
+		else:
+			if timer.isRunning():
+				return {
+					"result": False,
+					"message": _("The timer '%s' now recorded! Not disabled!") % (timer.name)
+				}
 			else:
-				if timer.isRunning():
-					return {
-						"result": False,
-						"message": _("The timer '%s' now recorded! Not disabled!") % (timer.name)
-					}
-				else:
-					timer.disable()
-					effect = "disabled"
-			rt.timeChanged(timer)
-			return {
-				"result": True,
-				"message": _("The timer '%s' has been %s successfully") % (timer.name, effect),
-				"disabled": timer.disabled
-			}
+				timer.disable()
+				effect = "disabled"
+		rt.timeChanged(timer)
+		_timersChanged()
+		return {
+			"result": True,
+			"message": _("The timer '%s' has been %s successfully") % (timer.name, effect),
+			"disabled": timer.disabled
+		}
 
 	return {
 		"result": False,
@@ -376,8 +423,228 @@ def toggleTimerStatus(session, serviceref, begin, end):
 	}
 
 
+TIMER_OPERATIONS = ("add", "change", "delete")
+
+
+def _opString(op, key, default=""):
+	value = op.get(key, default)
+	if isinstance(value, unicode):
+		return value.encode("utf-8")
+	return str(value)
+
+
+def _opFlag(op, key):
+	return str(op.get(key, 0)) in ("1", "True", "true")
+
+
+def _opVpsInfo(op):
+	if "vpsplugin_enabled" not in op:
+		return None
+	vpsplugin_time = int(float(op.get("vpsplugin_time", -1)))
+	return {
+		"vpsplugin_enabled": _opFlag(op, "vpsplugin_enabled"),
+		"vpsplugin_overwrite": _opFlag(op, "vpsplugin_overwrite"),
+		"vpsplugin_time": None if vpsplugin_time == -1 else vpsplugin_time
+	}
+
+
+def _setTimerOptions(timer, op):
+	vpsinfo = _opVpsInfo(op)
+	if vpsinfo is not None:
+		timer.vpsplugin_enabled = vpsinfo["vpsplugin_enabled"]
+		timer.vpsplugin_overwrite = vpsinfo["vpsplugin_overwrite"]
+		timer.vpsplugin_time = vpsinfo["vpsplugin_time"]
+	always_zap = int(op.get("always_zap", -1))
+	if always_zap != -1 and hasattr(timer, "always_zap"):
+		timer.always_zap = always_zap == 1
+
+
+#: attributes of a timer set by a change operation, restored on conflict
+TIMER_ATTRIBUTES = ("service_ref", "begin", "end", "name", "description", "disabled", "justplay", "afterEvent", "dirname", "tags", "repeated", "vpsplugin_enabled", "vpsplugin_overwrite", "vpsplugin_time", "always_zap")
+
+
+def _conflictInfo(conflicts, timer):
+	conflictinfo = []
+	for conflict in conflicts or []:
+		if conflict is timer:
+			continue
+		conflictinfo.append({
+			"serviceref": str(conflict.service_ref),
+			"servicename": conflict.service_ref.getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
+			"name": conflict.name,
+			"begin": conflict.begin,
+			"end": conflict.end,
+			"realbegin": strftime("%d.%m.%Y %H:%M", (localtime(float(conflict.begin)))),
+			"realend": strftime("%d.%m.%Y %H:%M", (localtime(float(conflict.end))))
+		})
+	return conflictinfo
+
+
+def _batchAdd(rt, op):
+	serviceref = _opString(op, "sRef")
+	begin = int(float(op["begin"]))
+	end = int(float(op["end"]))
+	eit = int(op.get("eit", 0))
+	if not eit:
+		event = eEPGCache.getInstance().lookupEventTime(eServiceReference(serviceref), begin + (end - begin) / 2)
+		eit = event and event.getEventId() or 0
+	afterevent = int(op.get("afterevent", 3))
+	timer = RecordTimerEntry(
+		ServiceReference(serviceref),
+		begin,
+		end,
+		_opString(op, "name"),
+		_opString(op, "description"),
+		eit,
+		_opFlag(op, "disabled"),
+		_opFlag(op, "justplay"),
+		afterevent if afterevent in (0, 1, 2, 3) else 3,
+		dirname=_opString(op, "dirname") or preferredTimerPath(),
+		tags=_opString(op, "tags").split())
+	timer.repeated = int(op.get("repeated", 0))
+	# like addTimer, a conflicting timer is not added at all
+	conflicts = rt.record(timer, dosave=False)
+	if conflicts:
+		conflictinfo = _conflictInfo(conflicts, timer)
+		return {
+			"result": False,
+			"message": _("Conflicting Timer(s) detected! %s") % " / ".join(c["name"] for c in conflictinfo),
+			"conflicts": conflictinfo
+		}
+	_setTimerOptions(timer, op)
+	return {
+		"result": True,
+		"message": _("Timer '%s' added") % timer.name
+	}
+
+
+def _batchChange(rt, op):
+	timer = timerIndex.find(rt, _opString(op, "channelOld"), int(op["beginOld"]), int(op["endOld"]))
+	if timer is None:
+		return None
+	previous = dict((key, getattr(timer, key)) for key in TIMER_ATTRIBUTES if hasattr(timer, key))
+	timer.service_ref = ServiceReference(_opString(op, "sRef"))
+	timer.begin = int(float(op["begin"]))
+	timer.end = int(float(op["end"]))
+	timer.name = _opString(op, "name")
+	timer.description = _opString(op, "description")
+	timer.disabled = _opFlag(op, "disabled")
+	timer.justplay = _opFlag(op, "justplay")
+	afterevent = int(op.get("afterevent", 3))
+	timer.afterEvent = afterevent if afterevent in (0, 1, 2, 3) else 3
+	timer.dirname = _opString(op, "dirname") or None
+	timer.tags = _opString(op, "tags").split()
+	timer.repeated = int(op.get("repeated", 0))
+	_setTimerOptions(timer, op)
+	# checked before processRepeated(), which also resets state that isn't
+	# part of TIMER_ATTRIBUTES (start_prepare, backoff)
+	if not timer.disabled:
+		sanity = TimerSanityCheck(rt.timer_list, timer)
+		if not sanity.check():
+			conflictinfo = _conflictInfo(sanity.getSimulTimerList(), timer)
+			if conflictinfo:
+				# unlike editTimer, leave the timer as it was
+				for key, value in previous.iteritems():
+					setattr(timer, key, value)
+				return {
+					"result": False,
+					"message": _("Timer '%s' not changed while Conflict") % timer.name,
+					"conflicts": conflictinfo
+				}
+	timer.processRepeated()
+	rt.timeChanged(timer)
+	timerIndex.invalidate()
+	return {
+		"result": True,
+		"message": _("Timer '%s' changed") % timer.name
+	}
+
+
+def _removeTimer(rt, timer):
+	# the steps of RecordTimer.removeEntry but its saveTimer(), the batch
+	# saves the timer list once at the end
+	timer.repeated = False
+	timer.autoincrease = False
+	timer.abort()
+	if timer.state != timer.StateEnded:
+		rt.timeChanged(timer)
+	if not timer.dontSave:
+		for x in rt.timer_list:
+			if x.setAutoincreaseEnd():
+				rt.timeChanged(x)
+	rt.processed_timers.remove(timer)
+
+
+def _batchDelete(rt, op):
+	timer = timerIndex.find(rt, _opString(op, "sRef"), int(op["begin"]), int(op["end"]))
+	if timer is None:
+		return None
+	_removeTimer(rt, timer)
+	return {
+		"result": True,
+		"message": _("The timer '%s' has been deleted successfully") % timer.name
+	}
+
+
+def batchTimers(session, operations):
+	"""
+	Add, change and delete several timers in one request.
+
+	The operations are applied in order, each checked for conflicts
+	against the timers as left by the operations before it, exactly as if
+	timeradd, timerchange and timerdelete were called one by one: a
+	conflicting new timer is not added and a conflicting change is not
+	applied. No operation saves the timer list itself, it is saved once
+	at the end if any operation succeeded.
+
+	Args:
+		session: enigma2 session
+		operations (list): dicts with an `op` of "add", "change" or
+			"delete" and the parameters of timeradd, timerchange or
+			timerdelete respectively
+	Returns:
+		dict: overall result and one result per operation
+	"""
+	rt = session.nav.RecordTimer
+	handlers = {"add": _batchAdd, "change": _batchChange, "delete": _batchDelete}
+	results = []
+	modified = False
+	for op in operations:
+		kind = isinstance(op, dict) and op.get("op")
+		if kind not in TIMER_OPERATIONS:
+			results.append({
+				"result": False,
+				"message": _("Unknown timer operation '%s'") % kind
+			})
+			continue
+		try:
+			result = handlers[kind](rt, op)
+		except (KeyError, ValueError, TypeError) as exc:
+			result = {
+				"result": False,
+				"message": _("Invalid timer operation: %s") % exc
+			}
+		if result is None:
+			result = {
+				"result": False,
+				"message": _("No matching Timer found")
+			}
+		elif result["result"]:
+			modified = True
+		results.append(result)
+
+	if modified:
+		rt.saveTimer()
+	_timersChanged()
+	return {
+		"result": all(r["result"] for r in results),
+		"results": results
+	}
+
+
 def cleanupTimer(session):
 	session.nav.RecordTimer.cleanup()
+	_timersChanged()
 	return {
 		"result": True,
 		"message": _("List of Timers has been cleaned")
@@ -440,6 +707,7 @@ def recordNow(session, infinite):
 			"result": False,
 			"message": _("Timer conflict detected! Not recording!")
 		}
+	_timersChanged()
 	nt = {
 		"serviceref": str(timer.service_ref),
 		"servicename": timer.service_ref.getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
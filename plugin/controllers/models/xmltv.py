@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#                        2019 E2OpenPlugins                                  #
+#                                                                            #
+#  This file is open source software; you can redistribute it and/or modify  #
+#     it under the terms of the GNU General Public License version 2 as      #
+#               published by the Free Software Foundation.                   #
+#                                                                            #
+##############################################################################
+from datetime import datetime
+from urllib import unquote
+from xml.sax.saxutils import escape, quoteattr
+
+from enigma import eEPGCache
+from services import getServices, filterName, convertDesc
+
+
+def _text(value):
+	if value is None:
+		return ""
+	return escape(value)
+
+
+def _timestamp(value, offset):
+	return "%s %s" % (datetime.utcfromtimestamp(value).strftime('%Y%m%d%H%M%S'), offset)
+
+
+def xmltvChunks(ref, lang, offset, begintime=-1, endtime=-1):
+	"""
+	Generate an XMLTV document for a bouquet piece by piece.
+
+	The channel list is emitted first, followed by the programmes of one
+	service per chunk, so at most one service's events are held in memory.
+
+	Args:
+		ref (str): bouquet reference
+		lang (str): language tag used for title and descriptions
+		offset (str): utc offset as returned by getUtcOffset
+		begintime (int): start of the time frame, -1 for now
+		endtime (int): end of the time frame as understood by lookupEvent
+	"""
+	ref = unquote(ref)
+	lang = quoteattr(lang)
+	services = getServices(ref, True, False)["services"]
+
+	yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+	yield '<tv source-info-url="https://github.com/E2OpenPlugins/e2openplugin-OpenWebif" source-info-name="OpenWebif">\n'
+	for service in services:
+		yield '\t<channel id=%s>\n\t\t<display-name>%s</display-name>\n\t</channel>\n' % (
+			quoteattr(service['servicereference']), _text(service['servicename']))
+
+	epgcache = eEPGCache.getInstance()
+	for service in services:
+		sref = service['servicereference']
+		if endtime:
+			query = (sref, 0, begintime, endtime)
+		else:
+			query = (sref, 0, begintime)
+		events = epgcache.lookupEvent(['BDTSE', query])
+		if not events:
+			continue
+		channel = quoteattr(sref)
+		chunk = []
+		for event in events:
+			if event[0] is None:
+				continue
+			chunk.append('\t<programme start="%s" stop="%s" channel=%s>\n\t\t<title lang=%s>%s</title>\n\t\t<sub-title lang=%s>%s</sub-title>\n\t\t<desc lang=%s>%s</desc>\n\t</programme>\n' % (
+				_timestamp(event[0], offset),
+				_timestamp(event[0] + event[1], offset),
+				channel,
+				lang, _text(filterName(event[2], False)),
+				lang, _text(convertDesc(event[3], False)),
+				lang, _text(convertDesc(event[4], False))))
+		if chunk:
+			yield ''.join(chunk)
+	yield '</tv>\n'
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#                        2019 E2OpenPlugins                                  #
+#                                                                            #
+#  This file is open source software; you can redistribute it and/or modify  #
+#     it under the terms of the GNU General Public License version 2 as      #
+#               published by the Free Software Foundation.                   #
+#                                                                            #
+##############################################################################
+import zlib
+
+from twisted.internet.interfaces import IPullProducer
+from twisted.web import http, server
+from zope.interface import implementer
+
+
+def acceptsGzip(request):
+	encoding = request.getHeader('accept-encoding')
+	return encoding is not None and 'gzip' in encoding.lower()
+
+
+def streamGzip(request):
+	"""
+	Whether a ChunkedProducer should compress the response itself: the
+	client accepts gzip and the resource isn't wrapped by an
+	EncodingResourceWrapper (like /api), whose encoder already set the
+	content encoding before the handler runs.
+	"""
+	return acceptsGzip(request) and not request.responseHeaders.hasHeader("content-encoding")
+
+
+def notModified(request, etag):
+	"""
+	Set the entity tag of a response and check it against If-None-Match.
+	Returns True, after setting the status to 304, if the client's copy is
+	still current.
+	"""
+	request.setHeader("etag", etag)
+	if etag in (request.getHeader("if-none-match") or ""):
+		request.setResponseCode(http.NOT_MODIFIED)
+		return True
+	return False
+
+
+@implementer(IPullProducer)
+class ChunkedProducer(object):
+	"""
+	Write the chunks of an iterator to a request, one chunk each time the
+	transport asks for more data, so that a large response never has to be
+	held in memory as a whole.
+
+	Args:
+		request (twisted.web.server.Request): HTTP request object
+		chunks: iterable yielding byte strings
+		gzip (bool): compress the response on the fly
+	"""
+	def __init__(self, request, chunks, gzip=False):
+		self.request = request
+		self.chunks = iter(chunks)
+		self.compressor = None
+		if gzip:
+			# 16 + MAX_WBITS makes zlib write a gzip header and trailer
+			self.compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+			request.setHeader("content-encoding", "gzip")
+			request.setHeader("vary", "Accept-Encoding")
+
+	def start(self):
+		self.request.registerProducer(self, False)
+		return server.NOT_DONE_YET
+
+	def resumeProducing(self):
+		if self.chunks is None:
+			return
+		# a pull producer has to write something on every call, otherwise
+		# it is never asked again, so skip chunks the compressor swallowed
+		while True:
+			try:
+				data = next(self.chunks)
+			except StopIteration:
+				self.finish()
+				return
+			except Exception as exc:
+				print "[OpenWebif] error while streaming '%s': %s" % (self.request.uri, exc)
+				self.finish()
+				return
+			if self.compressor is not None:
+				data = self.compressor.compress(data)
+			if data:
+				self.request.write(data)
+				return
+
+	def stopProducing(self):
+		self.chunks = None
+
+	def finish(self):
+		self.chunks = None
+		if self.compressor is not None:
+			self.request.write(self.compressor.flush())
+			self.compressor = None
+		self.request.unregisterProducer()
+		self.request.finish()
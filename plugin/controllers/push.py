@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#                        2019 E2OpenPlugins                                  #
+#                                                                            #
+#  This file is open source software; you can redistribute it and/or modify  #
+#     it under the terms of the GNU General Public License version 2 as      #
+#               published by the Free Software Foundation.                   #
+#                                                                            #
+##############################################################################
+from twisted.internet import reactor
+from twisted.web import resource, server
+from enigma import eDVBVolumecontrol
+from Components.config import config
+import NavigationInstance
+import RecordTimer
+
+from models.info import getStatusInfo, getFrontendStatus
+from models.services import getCurrentService
+from base import dumpJson
+
+#: topics of the feed, in the order they are sent to new subscribers
+TOPICS = ('status', 'current', 'recordings', 'volume', 'signal')
+#: topics without a change notification, compared every POLL_INTERVAL seconds
+POLLED_TOPICS = ('volume', 'signal')
+POLL_INTERVAL = 1
+#: seconds between SSE comments keeping idle connections open
+KEEPALIVE_INTERVAL = 15
+#: seconds a long-poll request waits for a change
+LONGPOLL_TIMEOUT = 25
+
+
+def _recordings():
+	recordings = []
+	for timer in NavigationInstance.instance.RecordTimer.timer_list:
+		if timer.state == RecordTimer.RecordTimerEntry.StateRunning and not timer.justplay:
+			recordings.append({
+				"name": timer.name,
+				"servicename": timer.service_ref.getServiceName().replace('\xc2\x86', '').replace('\xc2\x87', ''),
+				"serviceref": str(timer.service_ref),
+				"begin": timer.begin,
+				"end": timer.end,
+			})
+	return recordings
+
+
+def _volume():
+	vcontrol = eDVBVolumecontrol.getInstance()
+	return {
+		"current": vcontrol.getVolume(),
+		"ismute": vcontrol.isMuted(),
+	}
+
+
+class StatusFeed(object):
+	"""
+	Box state shared by all clients of the event stream.
+
+	Each topic is computed once per change, no matter how many clients are
+	connected: navigation and recording events and standby transitions mark
+	the affected topics dirty, volume and tuner signal are compared once per
+	POLL_INTERVAL. Recomputation is coalesced into one reactor call and only
+	topics whose value actually changed are sent, each change getting the
+	next version number.
+
+	Nothing is computed or polled while nobody is listening, the state is
+	refreshed when the next client connects.
+	"""
+	def __init__(self):
+		self.session = None
+		self.streams = []
+		self.waiters = []
+		self.state = {}
+		self.versions = {}
+		self.version = 0
+		self.dirty = set()
+		self.pending = None
+		self.poller = None
+		self.keepalive = None
+
+	def attach(self, session):
+		self.detach()
+		self.session = session
+		session.nav.event.append(self.onServiceEvent)
+		session.nav.record_event.append(self.onRecordEvent)
+		config.misc.standbyCounter.addNotifier(self.onStandby, initial_call=False)
+
+	def detach(self):
+		if self.session is None:
+			return
+		if self.onServiceEvent in self.session.nav.event:
+			self.session.nav.event.remove(self.onServiceEvent)
+		if self.onRecordEvent in self.session.nav.record_event:
+			self.session.nav.record_event.remove(self.onRecordEvent)
+		config.misc.standbyCounter.removeNotifier(self.onStandby)
+		self.session = None
+
+	def onServiceEvent(self, event):
+		self.changed('status', 'current')
+
+	def onRecordEvent(self, service, event):
+		self.changed('status', 'recordings')
+
+	def onStandby(self, configelement):
+		from Screens.Standby import inStandby
+		if inStandby is not None and self.onLeaveStandby not in inStandby.onClose:
+			inStandby.onClose.append(self.onLeaveStandby)
+		self.changed('status')
+
+	def onLeaveStandby(self):
+		self.changed('status')
+
+	def changed(self, *topics):
+		"""
+		Mark topics as changed. Also called by the vol, zap,
+		remotecontrol and powerstate handlers of the web API, so their
+		effect is sent right away instead of on the next poll.
+		"""
+		if not self.listening():
+			return
+		self.dirty.update(topics)
+		if self.pending is None:
+			self.pending = reactor.callLater(0, self.update)
+
+	def listening(self):
+		return bool(self.streams or self.waiters)
+
+	def compute(self, topic):
+		if topic == 'status':
+			return getStatusInfo(self)
+		if topic == 'current':
+			return getCurrentService(self.session)
+		if topic == 'recordings':
+			return _recordings()
+		if topic == 'volume':
+			return _volume()
+		if topic == 'signal':
+			return getFrontendStatus(self.session)
+
+	def update(self):
+		self.pending = None
+		topics = [topic for topic in TOPICS if topic in self.dirty]
+		self.dirty = set()
+		changes = {}
+		for topic in topics:
+			try:
+				value = self.compute(topic)
+			except Exception as exc:
+				print "[OpenWebif] status feed: failed to compute '%s': %s" % (topic, exc)
+				continue
+			if self.state.get(topic) != value:
+				self.version += 1
+				self.state[topic] = value
+				self.versions[topic] = self.version
+				changes[topic] = value
+		if not changes:
+			return
+		for request in self.streams[:]:
+			for topic in topics:
+				if topic in changes:
+					self.writeEvent(request, topic)
+		waiters = self.waiters
+		self.waiters = []
+		for request, timeout in waiters:
+			if timeout.active():
+				timeout.cancel()
+			self.answerPoll(request, changes)
+
+	def poll(self):
+		self.poller = None
+		if not self.listening():
+			return
+		self.changed(*POLLED_TOPICS)
+		self.poller = reactor.callLater(POLL_INTERVAL, self.poll)
+
+	def start(self):
+		"""
+		Bring the state up to date for a listener arriving while no other
+		one is connected, changes are ignored meanwhile, and start polling.
+		The previous state is kept while nobody listens, so topics that
+		didn't change in between keep their version.
+		"""
+		if not self.listening():
+			if self.pending is not None and self.pending.active():
+				self.pending.cancel()
+			self.dirty = set(TOPICS)
+			self.update()
+		if self.poller is None:
+			self.poller = reactor.callLater(POLL_INTERVAL, self.poll)
+
+	def stop(self):
+		if self.listening():
+			return
+		for call in (self.poller, self.keepalive, self.pending):
+			if call is not None and call.active():
+				call.cancel()
+		self.poller = self.keepalive = self.pending = None
+		self.dirty = set()
+
+	def sendKeepalive(self):
+		self.keepalive = None
+		if not self.streams:
+			return
+		for request in self.streams[:]:
+			request.write(": keepalive\n\n")
+		self.keepalive = reactor.callLater(KEEPALIVE_INTERVAL, self.sendKeepalive)
+
+	def writeEvent(self, request, topic):
+		request.write("id: %d\nevent: %s\ndata: %s\n\n" % (self.versions[topic], topic, dumpJson(self.state[topic])))
+
+	def subscribe(self, request):
+		request.setHeader("content-type", "text/event-stream")
+		request.setHeader("cache-control", "no-cache")
+		request.write("retry: 3000\n\n")
+		self.start()
+		self.streams.append(request)
+		request.notifyFinish().addBoth(self.unsubscribe, request)
+		if self.keepalive is None:
+			self.keepalive = reactor.callLater(KEEPALIVE_INTERVAL, self.sendKeepalive)
+		for topic in TOPICS:
+			if topic in self.state:
+				self.writeEvent(request, topic)
+		return server.NOT_DONE_YET
+
+	def unsubscribe(self, result, request):
+		if request in self.streams:
+			self.streams.remove(request)
+		self.stop()
+
+	def longPoll(self, request, since):
+		request.setHeader("content-type", "application/json; charset=utf-8")
+		request.setHeader("cache-control", "no-cache")
+		self.start()
+		changes = dict((topic, value) for topic, value in self.state.iteritems() if self.versions.get(topic, 0) > since)
+		if changes:
+			return self.respondPoll(changes)
+		timeout = reactor.callLater(LONGPOLL_TIMEOUT, self.expirePoll, request)
+		self.waiters.append((request, timeout))
+		request.notifyFinish().addBoth(self.abortPoll, request)
+		return server.NOT_DONE_YET
+
+	def respondPoll(self, changes):
+		return dumpJson({"version": self.version, "changes": changes})
+
+	def answerPoll(self, request, changes):
+		request.write(self.respondPoll(changes))
+		request.finish()
+
+	def expirePoll(self, request):
+		self.waiters = [w for w in self.waiters if w[0] is not request]
+		self.answerPoll(request, {})
+
+	def abortPoll(self, result, request):
+		for waiter in self.waiters:
+			if waiter[0] is request:
+				if waiter[1].active():
+					waiter[1].cancel()
+				self.waiters.remove(waiter)
+				break
+		self.stop()
+
+
+statusFeed = StatusFeed()
+
+
+class EventStreamController(resource.Resource):
+	"""
+	Server-sent events of the box state, see StatusFeed.
+
+	.. note::
+
+		Not available in *Enigma2 WebInterface API*.
+
+	.. http:get:: /events
+
+		Event stream of `status`, `current`, `recordings`, `volume` and
+		`signal` events, each carrying the JSON encoded topic whenever it
+		changed. All topics are sent on connect.
+
+		:query int since: long-poll instead: answer with the topics changed
+			after this version, waiting up to 25 seconds for a change
+	"""
+	isLeaf = True
+
+	def __init__(self, session):
+		resource.Resource.__init__(self)
+		statusFeed.attach(session)
+
+	def render_GET(self, request):
+		if "since" in request.args.keys():
+			try:
+				since = int(request.args["since"][0])
+			except ValueError:
+				since = 0
+			return statusFeed.longPoll(request, since)
+		return statusFeed.subscribe(request)
@@ -22,7 +22,7 @@
 
 import os
 
-from twisted.web import static, http, proxy
+from twisted.web import http, proxy
 from Components.config import config
 
 from models.grab import grabScreenshot
@@ -38,6 +38,8 @@ from BQE import BQEController
 from transcoding import TranscodingController
 from wol import WOLSetupController, WOLClientController
 from file import FileController
+from staticfile import StaticFile
+from push import EventStreamController
 
 from defaults import PICON_PATH, getPublicPath, VIEWS_PATH
 
@@ -47,20 +49,22 @@ class RootController(BaseController):
 	"""
 	def __init__(self, session, path=""):
 		BaseController.__init__(self, path=path, session=session)
+		maxAge = config.OpenWebif.static_max_age.value
 
 		self.putChild("web", WebController(session))
 		self.putGZChild("api", ApiController(session))
 		self.putGZChild("ajax", AjaxController(session))
 		self.putChild("file", FileController())
+		self.putChild("events", EventStreamController(session))
 		self.putChild("grab", grabScreenshot(session))
 		if os.path.exists(getPublicPath('mobile')):
 			self.putChild("mobile", MobileController(session))
-			self.putChild("m", static.File(getPublicPath() + "/mobile"))
+			self.putChild("m", StaticFile(getPublicPath() + "/mobile", maxAge=maxAge))
 		for static_val in ('js', 'css', 'static', 'images', 'fonts'):
-			self.putChild(static_val, static.File(getPublicPath() + '/' + static_val))
+			self.putChild(static_val, StaticFile(getPublicPath() + '/' + static_val, maxAge=maxAge))
 		for static_val in ('themes', 'webtv', 'vxg'):
 			if os.path.exists(getPublicPath(static_val)):
-				self.putChild(static_val, static.File(getPublicPath() + '/' + static_val))
+				self.putChild(static_val, StaticFile(getPublicPath() + '/' + static_val, maxAge=maxAge))
 
 		if os.path.exists('/usr/bin/shellinaboxd'):
 			self.putChild("terminal", proxy.ReverseProxyResource('::1', 4200, '/'))
@@ -73,7 +77,7 @@ class RootController(BaseController):
 		self.putChild("wol", WOLClientController())
 		self.putChild("wolsetup", WOLSetupController(session))
 		if PICON_PATH:
-			self.putChild("picon", static.File(PICON_PATH))
+			self.putChild("picon", StaticFile(PICON_PATH, maxAge=maxAge))
 		try:
 			from NET import NetController
 			self.putChild("net", NetController(session))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#                        2019 E2OpenPlugins                                  #
+#                                                                            #
+#  This file is open source software; you can redistribute it and/or modify  #
+#     it under the terms of the GNU General Public License version 2 as      #
+#               published by the Free Software Foundation.                   #
+#                                                                            #
+##############################################################################
+import os
+import zlib
+
+from twisted.web import http, static
+
+from producer import acceptsGzip, notModified
+
+#: content types worth compressing
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/x-javascript', 'application/json', 'application/xml', 'image/svg+xml', 'application/vnd.ms-fontobject', 'application/x-font-ttf', 'font/ttf')
+
+
+class GzipCache(object):
+	"""
+	Gzip compressed copies of static files without a pre-built .gz
+	sibling, compressed on first request and kept until the file changes.
+	Files above `maxfile` bytes are served uncompressed, the whole cache
+	is dropped when it would grow above `maxsize` bytes.
+	"""
+	def __init__(self, maxsize=4 * 1024 * 1024, maxfile=1024 * 1024):
+		self.maxsize = maxsize
+		self.maxfile = maxfile
+		self.size = 0
+		self.entries = {}
+
+	def get(self, path, mtime, size):
+		entry = self.entries.get(path)
+		if entry is not None and entry[0] == mtime and entry[1] == size:
+			return entry[2]
+		if size > self.maxfile:
+			return None
+		try:
+			with open(path, "rb") as f:
+				compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+				data = compressor.compress(f.read()) + compressor.flush()
+		except (IOError, OSError):
+			return None
+		if entry is not None:
+			self.size -= len(entry[2])
+		if self.size + len(data) > self.maxsize:
+			self.entries = {}
+			self.size = 0
+		self.entries[path] = (mtime, size, data)
+		self.size += len(data)
+		return data
+
+
+gzipCache = GzipCache()
+
+
+class StaticFile(static.File):
+	"""
+	static.File with cache validators and compression.
+
+	Every file is sent with a strong ETag built from its modification time
+	and size and a Cache-Control max-age; a matching If-None-Match is
+	answered with 304. Compressible files are sent gzip encoded to clients
+	accepting it, from a pre-built `.gz` sibling when one at least as new
+	as the file exists, otherwise from gzipCache. Byte ranges are served by
+	static.File, for on-the-fly compression only the identity encoding
+	supports them.
+
+	Args:
+		maxAge (int): Cache-Control max-age in seconds
+	"""
+	def __init__(self, path, defaultType="text/html", ignoredExts=(), registry=None, allowExt=0, maxAge=3600):
+		static.File.__init__(self, path, defaultType, ignoredExts, registry, allowExt)
+		self.maxAge = maxAge
+
+	def createSimilarFile(self, path):
+		f = static.File.createSimilarFile(self, path)
+		f.maxAge = self.maxAge
+		return f
+
+	def render_GET(self, request):
+		self.restat(False)
+		if self.isdir() or not self.exists():
+			return static.File.render_GET(self, request)
+
+		path = self.path
+		mtime = int(self.getModificationTime())
+		size = self.getsize()
+		ctype, encoding = static.getTypeAndEncoding(self.basename(), self.contentTypes, self.contentEncodings, self.defaultType)
+		request.setHeader("cache-control", "max-age=%d" % self.maxAge)
+
+		gzpath = None
+		data = None
+		if encoding is None and ctype and ctype.startswith(COMPRESSIBLE_TYPES):
+			request.setHeader("vary", "Accept-Encoding")
+			if acceptsGzip(request):
+				try:
+					if os.stat(path + ".gz").st_mtime >= mtime:
+						gzpath = path + ".gz"
+				except OSError:
+					pass
+				if gzpath is None and request.getHeader("range") is None:
+					data = gzipCache.get(path, mtime, size)
+
+		gzipped = gzpath is not None or data is not None
+		etag = '"%x-%x%s"' % (mtime, size, gzipped and "-gz" or "")
+		if notModified(request, etag):
+			return ""
+
+		if gzpath is not None:
+			# static.File derives type and gzip encoding from the name
+			f = static.File(gzpath, self.defaultType)
+			f.contentTypes = self.contentTypes
+			return f.render_GET(request)
+
+		if data is not None:
+			if request.setLastModified(mtime) is http.CACHED:
+				return ""
+			request.setHeader("content-type", ctype)
+			request.setHeader("content-encoding", "gzip")
+			request.setHeader("content-length", str(len(data)))
+			if request.method == "HEAD":
+				return ""
+			return data
+
+		return static.File.render_GET(self, request)
+
+	render_HEAD = render_GET
@@ -1,6 +1,6 @@
-from time import localtime, strftime
 from urllib import quote
 from Plugins.Extensions.OpenWebif.controllers.i18n import tstrings
+from Plugins.Extensions.OpenWebif.controllers.models.timeformat import formatClock
 
 
 class renderEvtBlock:
@@ -30,7 +30,7 @@ class renderEvtBlock:
         return self.template % (
             quote(event['ref'], safe=' ~@#$&()*!+=:;,.?/\''),
             event['id'],
-            strftime("%H:%M", localtime(event['begin_timestamp'])),
+            formatClock(event['begin_timestamp']),
             timerEventSymbol,
             event['title'],
             shortdesc)
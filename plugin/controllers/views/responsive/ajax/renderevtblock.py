@@ -1,9 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from time import localtime, strftime
 from urllib import quote
 from Plugins.Extensions.OpenWebif.controllers.i18n import tstrings
+from Plugins.Extensions.OpenWebif.controllers.models.timeformat import formatClock
 
 
 class renderEvtBlock:
@@ -33,7 +33,7 @@ class renderEvtBlock:
 			event['id'],
 			event['id'],
 			quote(event['ref'], safe=' ~@#$&()*!+=:;,.?/\''),
-			strftime("%H:%M", localtime(event['begin_timestamp'])),
+			formatClock(event['begin_timestamp']),
 			timerEventSymbol,
 			event['title'],
 			shortdesc
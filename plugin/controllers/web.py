@@ -10,13 +10,13 @@
 ##############################################################################
 
 from Components.config import config as comp_config
-from models.info import getInfo, getCurrentTime, getStatusInfo, getFrontendStatus, testPipStatus
-from models.services import getCurrentService, getBouquets, getServices, getSubServices, getSatellites, getBouquetEpg, getBouquetNowNextEpg, getServicesNowNextEpg, getSearchEpg, getChannelEpg, getNowNextEpg, getSearchSimilarEpg, getAllServices, getPlayableServices, getPlayableService, getParentalControlList, getEvent, loadEpg, saveEpg
+from models.info import getInfo, getCurrentTime, getStatusInfo, getFrontendStatus, testPipStatus, statusInfoSnapshot
+from models.services import getCurrentService, getBouquets, getServices, getSubServices, getSatellites, getBouquetEpg, getBouquetNowNextEpg, getServicesNowNextEpg, getSearchEpg, getChannelEpg, getNowNextEpg, getSearchSimilarEpg, getAllServices, getPlayableServices, getPlayableService, getParentalControlList, getEvent, loadEpg, saveEpg, multiEpgCache, SEARCH_ORDERS, getIndexedSearchEpg
 from models.volume import getVolumeStatus, setVolumeUp, setVolumeDown, setVolumeMute, setVolume
 from models.audiotrack import getAudioTracks, setAudioTrack
 from models.control import zapService, remoteControl, setPowerState, getStandbyState
 from models.locations import getLocations, getCurrentLocation, addLocation, removeLocation
-from models.timers import getTimers, addTimer, addTimerByEventId, editTimer, removeTimer, toggleTimerStatus, cleanupTimer, writeTimerList, recordNow, tvbrowser, getSleepTimer, setSleepTimer, getPowerTimer, setPowerTimer, getVPSChannels
+from models.timers import getTimers, addTimer, addTimerByEventId, editTimer, removeTimer, toggleTimerStatus, batchTimers, cleanupTimer, writeTimerList, recordNow, tvbrowser, getSleepTimer, setSleepTimer, getPowerTimer, setPowerTimer, getVPSChannels
 from models.message import sendMessage, getMessageAnswer
 from models.movies import getMovieList, removeMovie, getMovieInfo, moveMovie, renameMovie, getAllMovies
 from models.config import getSettings, addCollapsedMenu, removeCollapsedMenu, saveConfig, getConfigs, getConfigsSections, getUtcOffset
@@ -24,11 +24,19 @@ from models.stream import getStream, getTS, getStreamSubservices, GetSession
 from models.servicelist import reloadServicesLists
 from models.mediaplayer import mediaPlayerAdd, mediaPlayerRemove, mediaPlayerPlay, mediaPlayerCommand, mediaPlayerCurrent, mediaPlayerList, mediaPlayerLoad, mediaPlayerSave, mediaPlayerFindFile
 from models.plugins import reloadPlugins
+from models.xmltv import xmltvChunks
+from models.m3u import serviceM3uChunks, movieM3uChunks, bouquetServices, servicesEtag, moviesEtag
 from Screens.InfoBar import InfoBar
 
 from i18n import _
 from base import BaseController
 from stream import StreamController
+from push import statusFeed
+from twisted.web import server
+from producer import ChunkedProducer, streamGzip, notModified
+from metrics import metrics
+import itertools
+import json
 import re
 
 
@@ -75,6 +83,15 @@ class WebController(BaseController):
 
 		return None
 
+	def getFieldsArg(self, request):
+		"""
+		Return the `fields` parameter selecting the keys of EPG events or
+		timers. Only honoured for JSON responses, the XML templates expect all keys.
+		"""
+		if self.isJson and "fields" in request.args.keys():
+			return request.args["fields"][0]
+		return None
+
 	def P_tsstart(self, request):
 		"""
 		Request handler for the `tsstart` endpoint.
@@ -169,7 +186,11 @@ class WebController(BaseController):
 	def P_statusinfo(self, request):
 		# we don't need to fill logs with this api (it's called too many times)
 		self.suppresslog = True
-		return getStatusInfo(self)
+		info = getStatusInfo(self)
+		if notModified(request, statusInfoSnapshot.etag()):
+			request.finish()
+			return server.NOT_DONE_YET
+		return info
 
 	def P_pipinfo(self, request):
 		return testPipStatus(self)
@@ -208,7 +229,9 @@ class WebController(BaseController):
 		"""
 		if "set" not in request.args.keys() or request.args["set"][0] == "state":
 			return getVolumeStatus()
-		elif request.args["set"][0] == "up":
+		# the mixer has no change notification, tell the event stream
+		statusFeed.changed('volume', 'status')
+		if request.args["set"][0] == "up":
 			return setVolumeUp()
 		elif request.args["set"][0] == "down":
 			return setVolumeDown()
@@ -290,6 +313,7 @@ class WebController(BaseController):
 		if res:
 			return res
 
+		statusFeed.changed('status', 'current', 'signal')
 		if "title" in request.args.keys():
 			return zapService(self.session, request.args["sRef"][0], request.args["title"][0])
 
@@ -330,6 +354,8 @@ class WebController(BaseController):
 		if "rcu" in request.args.keys():
 			rcu = request.args["rcu"][0]
 
+		# keys may change anything, e.g. the volume
+		statusFeed.changed('status', 'current', 'volume')
 		return remoteControl(id, type, rcu)
 
 	def P_powerstate(self, request):
@@ -349,6 +375,7 @@ class WebController(BaseController):
 		if "shift" in request.args.keys():
 			self.P_set_powerup_without_waking_tv(request)
 		if "newstate" in request.args.keys():
+			statusFeed.changed('status', 'current', 'recordings')
 			return setPowerState(self.session, request.args["newstate"][0])
 		return getStandbyState(self.session)
 
@@ -511,6 +538,9 @@ class WebController(BaseController):
 		.. http:get:: /web/services.m3u
 
 			:query string bRef: bouquet reference
+			:query string bName: bouquet name, used as file name and group-title
+			:query int tvgid: *0* to omit the tvg-id attributes
+			:query int logo: *0* to omit the tvg-logo attributes
 		"""
 		if "bRef" in request.args.keys():
 			bRef = request.args["bRef"][0]
@@ -518,20 +548,71 @@ class WebController(BaseController):
 			bRef = ""
 
 		request.setHeader('Content-Type', 'application/x-mpegurl')
+		bName = None
 		if "bName" in request.args.keys():
-			request.setHeader('Content-Disposition', 'inline; filename=%s.%s;' % (request.args["bName"][0], 'm3u8'))
-		services = getServices(bRef, False)
+			bName = request.args["bName"][0]
+			request.setHeader('Content-Disposition', 'inline; filename=%s.%s;' % (bName, 'm3u8'))
+		stype = "radio" if ".radio" in bRef else "tv"
+		tvgid = request.args.get("tvgid", ["1"])[0] != "0"
+		logo = request.args.get("logo", ["1"])[0] != "0"
+		host = "%s:8001" % request.getRequestHostname()
+		auth = self.getStreamAuth(request)
+		if notModified(request, servicesEtag(bRef, bName, host, auth, tvgid, logo)):
+			request.finish()
+			return server.NOT_DONE_YET
+		chunks = serviceM3uChunks(bouquetServices([(bRef, bName)]), host, auth, stype, tvgid, logo)
+		return ChunkedProducer(request, chunks, streamGzip(request)).start()
+
+	def P_bouquetsm3u(self, request):
+		"""
+		Request handler for the `bouquetsm3u` endpoint.
+		Retrieve all bouquets as a single M3U playlist, with the name of
+		the bouquet as group-title of its services.
+
+		.. note::
+
+			Not available in *Enigma2 WebInterface API*.
+
+		Args:
+			request (twisted.web.server.Request): HTTP request object
+		Returns:
+			HTTP response with headers
+
+		.. http:get:: /web/bouquets.m3u
+
+			:query string type: *tv* (default), *radio* or *all*
+			:query int tvgid: *0* to omit the tvg-id attributes
+			:query int logo: *0* to omit the tvg-logo attributes
+		"""
+		stype = request.args.get("type", ["tv"])[0]
+		if stype == "all":
+			stypes = ["tv", "radio"]
+		elif stype == "radio":
+			stypes = ["radio"]
+		else:
+			stypes = ["tv"]
+		tvgid = request.args.get("tvgid", ["1"])[0] != "0"
+		logo = request.args.get("logo", ["1"])[0] != "0"
+		host = "%s:8001" % request.getRequestHostname()
+		auth = self.getStreamAuth(request)
+
+		request.setHeader('Content-Type', 'application/x-mpegurl')
+		request.setHeader('Content-Disposition', 'inline; filename=bouquets.m3u8;')
+		if notModified(request, servicesEtag("bouquets", stypes, host, auth, tvgid, logo)):
+			request.finish()
+			return server.NOT_DONE_YET
+		chunks = itertools.chain(*[
+			serviceM3uChunks(bouquetServices(getBouquets(t)["bouquets"]), host, auth, t, tvgid, logo, i == 0)
+			for i, t in enumerate(stypes)])
+		return ChunkedProducer(request, chunks, streamGzip(request)).start()
+
+	def getStreamAuth(self, request):
 		if comp_config.OpenWebif.auth_for_streaming.value:
 			session = GetSession()
 			if session.GetAuth(request) is not None:
-				auth = ':'.join(session.GetAuth(request)) + "@"
-			else:
-				auth = '-sid:' + str(session.GetSID(request)) + "@"
-		else:
-			auth = ''
-		services["host"] = "%s:8001" % request.getRequestHostname()
-		services["auth"] = auth
-		return services
+				return ':'.join(session.GetAuth(request)) + "@"
+			return '-sid:' + str(session.GetSID(request)) + "@"
+		return ''
 
 	def P_subservices(self, request):
 		"""
@@ -721,11 +802,27 @@ class WebController(BaseController):
 			request (twisted.web.server.Request): HTTP request object
 		Returns:
 			HTTP response with headers
+
+		.. http:get:: /web/movielist
+
+			:query string dirname: movie location
+			:query string tag: only movies with this tag
+			:query string fields: comma separated attributes to return
+			:query string sort: recordingtime, name or size, prefix with - for descending order
+			:query int offset: index of the first movie to return
+			:query int limit: maximum number of movies to return
+
+			The total number of matching movies is returned in the
+			`X-Total-Count` header.
 		"""
-		return getMovieList(request.args)
+		movielist = getMovieList(request.args)
+		request.setHeader("X-Total-Count", str(movielist.get("total", 0)))
+		return movielist
 
 	def P_fullmovielist(self, request):
-		return getAllMovies()
+		movielist = getAllMovies(request.args)
+		request.setHeader("X-Total-Count", str(movielist.get("total", 0)))
+		return movielist
 
 	def P_movielisthtml(self, request):
 		"""
@@ -759,9 +856,14 @@ class WebController(BaseController):
 			HTTP response with headers
 		"""
 		request.setHeader('Content-Type', 'application/x-mpegurl')
-		movielist = getMovieList(request.args)
-		movielist["host"] = "%s://%s:%s" % (whoami(request)['proto'], request.getRequestHostname(), whoami(request)['port'])
-		return movielist
+		args = dict(request.args)
+		args["fields"] = ["filename"]
+		movies = getMovieList(args)["movies"]
+		host = "%s://%s:%s" % (whoami(request)['proto'], request.getRequestHostname(), whoami(request)['port'])
+		if notModified(request, moviesEtag(host, movies)):
+			request.finish()
+			return server.NOT_DONE_YET
+		return ChunkedProducer(request, movieM3uChunks(movies, host), streamGzip(request)).start()
 
 	def P_movielistrss(self, request):
 		"""
@@ -981,8 +1083,12 @@ class WebController(BaseController):
 			request (twisted.web.server.Request): HTTP request object
 		Returns:
 			HTTP response with headers
+
+		.. http:get:: /api/timerlist
+
+			:query string fields: comma separated attributes to return
 		"""
-		ret = getTimers(self.session)
+		ret = getTimers(self.session, self.getFieldsArg(request))
 		ret["locations"] = comp_config.movielist.videodirs.value
 		return ret
 
@@ -1306,6 +1412,43 @@ class WebController(BaseController):
 
 		return removeTimer(self.session, request.args["sRef"][0], begin, end)
 
+	def P_timerbatch(self, request):
+		"""
+		Request handler for the `timerbatch` endpoint.
+		Add, change and delete several timers at once, see batchTimers.
+
+		.. note::
+
+			Not available in *Enigma2 WebInterface API*.
+
+		Args:
+			request (twisted.web.server.Request): HTTP request object
+		Returns:
+			HTTP response with headers
+
+		.. http:post:: /api/timerbatch
+
+			:query string ops: JSON list of operations, e.g.
+				`[{"op": "delete", "sRef": "...", "begin": 1, "end": 2}]`;
+				read from the request body if missing. `add`, `change`
+				and `delete` operations take the parameters of
+				timeradd, timerchange and timerdelete.
+		"""
+		if "ops" in request.args.keys():
+			data = request.args["ops"][0]
+		else:
+			data = request.content.read()
+		try:
+			operations = json.loads(data)
+		except ValueError:
+			operations = None
+		if not isinstance(operations, list):
+			return {
+				"result": False,
+				"message": _("The parameter 'ops' must be a JSON list")
+			}
+		return batchTimers(self.session, operations)
+
 	def P_timercleanup(self, request):
 		"""
 		Request handler for the `timercleanup` endpoint.
@@ -1409,7 +1552,7 @@ class WebController(BaseController):
 				begintime = int(request.args["time"][0])
 			except ValueError:
 				pass
-		return getBouquetEpg(request.args["bRef"][0], begintime, None, self.isJson)
+		return getBouquetEpg(request.args["bRef"][0], begintime, None, self.isJson, self.getFieldsArg(request))
 
 	def P_epgmulti(self, request):
 		"""
@@ -1441,51 +1584,67 @@ class WebController(BaseController):
 				endtime = int(request.args["endTime"][0])
 			except ValueError:
 				pass
-		return getBouquetEpg(request.args["bRef"][0], begintime, endtime, self.isJson)
+		return getBouquetEpg(request.args["bRef"][0], begintime, endtime, self.isJson, self.getFieldsArg(request))
 	
 	def P_epgxmltv(self, request):
 		"""
 		Request handler for the `epgxmltv` endpoint.
-	
+
+		The document is written service by service while it is generated,
+		gzip compressed if the client accepts it.
+
 		.. note::
-	
+
 			Not available in *Enigma2 WebInterface API*.
-	
+
 		Args:
 			request (twisted.web.server.Request): HTTP request object
-			bRef: mandatory, method uses epgmulti
-			lang: mandatory, needed for xmltv and Enigma2 has no parameter for epg language			
+			bRef: mandatory, bouquet reference
+			lang: mandatory, needed for xmltv and Enigma2 has no parameter for epg language
+			time: optional, begin of the time frame (same as epgmulti)
+			endTime: optional, end of the time frame (same as epgmulti)
 		Returns:
 			HTTP response with headers
 		"""
 		res = self.testMandatoryArguments(request, ["bRef", "lang"])
 		if res:
 			return res
-		ret = self.P_epgmulti(request)
-		bRef = request.args["bRef"][0]
-		ret["services"] = getServices(bRef, True, False)["services"]
-		ret["lang"] = request.args["lang"][0]
-		ret["offset"] = getUtcOffset()
-		return ret
+
+		begintime = -1
+		if "time" in request.args.keys():
+			try:
+				begintime = int(request.args["time"][0])
+			except ValueError:
+				pass
+
+		endtime = -1
+		if "endTime" in request.args.keys():
+			try:
+				endtime = int(request.args["endTime"][0])
+			except ValueError:
+				pass
+
+		chunks = xmltvChunks(request.args["bRef"][0], request.args["lang"][0], getUtcOffset()["utcoffset"], begintime, endtime)
+		return ChunkedProducer(request, chunks, streamGzip(request)).start()
 
 	def P_epgnow(self, request):
 		res = self.testMandatoryArguments(request, ["bRef"])
 		if res:
 			return res
-		return getBouquetNowNextEpg(request.args["bRef"][0], 0, self.isJson)
+		return getBouquetNowNextEpg(request.args["bRef"][0], 0, self.isJson, self.getFieldsArg(request))
 
 	def P_epgnext(self, request):
 		res = self.testMandatoryArguments(request, ["bRef"])
 		if res:
 			return res
-		return getBouquetNowNextEpg(request.args["bRef"][0], 1, self.isJson)
+		return getBouquetNowNextEpg(request.args["bRef"][0], 1, self.isJson, self.getFieldsArg(request))
 
 	def P_epgnownext(self, request):
 		res = self.testMandatoryArguments(request, ["bRef"])
 		if res:
 			return res
 		info = getCurrentService(self.session)
-		ret = getBouquetNowNextEpg(request.args["bRef"][0], -1, self.isJson)
+		ret = getBouquetNowNextEpg(request.args["bRef"][0], -1, self.isJson, self.getFieldsArg(request))
 		ret["info"] = info
 		return ret
 
@@ -1493,7 +1652,7 @@ class WebController(BaseController):
 		res = self.testMandatoryArguments(request, ["sList"])
 		if res:
 			return res
-		ret = getServicesNowNextEpg(request.args["sList"][0], self.isJson)
+		ret = getServicesNowNextEpg(request.args["sList"][0], self.isJson, self.getFieldsArg(request))
 		return ret
 
 	def P_epgsearch(self, request):
@@ -1514,6 +1673,20 @@ class WebController(BaseController):
 			request (twisted.web.server.Request): HTTP request object
 		Returns:
 			HTTP response with headers
+
+		.. http:get:: /web/epgsearch
+
+			:query string search: search string
+			:query int endtime: skip events beginning after this time
+			:query int full: search the extended description too
+			:query int begintime: skip events ending before this time
+			:query string sRef: comma separated services to search in
+			:query int bouquetsonly: only search services in TV bouquets
+			:query int limit: maximum number of events to return
+			:query int offset: number of events to skip
+			:query string order: *begin* or *relevance*
+			:query int unique: only return the first broadcast of a title
+			:query string mode: *index* to search the in-memory EPG index (prefix completion, single `sRef`, `genre` id)
 		"""
 		if "search" in request.args.keys():
 			endtime = None
@@ -1525,7 +1698,41 @@ class WebController(BaseController):
 			fulldesc = False
 			if "full" in request.args.keys():
 				fulldesc = True
-			return getSearchEpg(request.args["search"][0], endtime, fulldesc, False, self.isJson)
+			begintime = None
+			if "begintime" in request.args.keys():
+				try:
+					begintime = int(request.args["begintime"][0])
+				except ValueError:
+					pass
+			limit = None
+			if "limit" in request.args.keys():
+				try:
+					limit = max(0, int(request.args["limit"][0]))
+				except ValueError:
+					pass
+			offset = 0
+			if "offset" in request.args.keys():
+				try:
+					offset = max(0, int(request.args["offset"][0]))
+				except ValueError:
+					pass
+			channels = None
+			if "sRef" in request.args.keys():
+				channels = [sref for sref in request.args["sRef"][0].split(",") if sref]
+			if request.args.get("mode", [None])[0] == "index":
+				genre = None
+				if "genre" in request.args.keys():
+					try:
+						genre = int(request.args["genre"][0])
+					except ValueError:
+						pass
+				return getIndexedSearchEpg(request.args["search"][0], limit, offset, channels and channels[0] or None, genre, self.isJson, self.getFieldsArg(request))
+			order = request.args.get("order", [None])[0]
+			if order not in SEARCH_ORDERS:
+				order = None
+			bouquetsonly = request.args.get("bouquetsonly", ["0"])[0] == "1"
+			unique = request.args.get("unique", ["0"])[0] == "1"
+			return getSearchEpg(request.args["search"][0], endtime, fulldesc, bouquetsonly, self.isJson, limit, offset, begintime, channels, order, unique, self.getFieldsArg(request))
 		else:
 			res = self.testMandatoryArguments(request, ["sref", "eventid"])
 			if res:
@@ -1567,19 +1774,19 @@ class WebController(BaseController):
 				endtime = int(request.args["endTime"][0])
 			except ValueError:
 				pass
-		return getChannelEpg(request.args["sRef"][0], begintime, endtime, self.isJson)
+		return getChannelEpg(request.args["sRef"][0], begintime, endtime, self.isJson, self.getFieldsArg(request))
 
 	def P_epgservicenow(self, request):
 		res = self.testMandatoryArguments(request, ["sRef"])
 		if res:
 			return res
-		return getNowNextEpg(request.args["sRef"][0], 0, self.isJson)
+		return getNowNextEpg(request.args["sRef"][0], 0, self.isJson, self.getFieldsArg(request))
 
 	def P_epgservicenext(self, request):
 		res = self.testMandatoryArguments(request, ["sRef"])
 		if res:
 			return res
-		return getNowNextEpg(request.args["sRef"][0], 1, self.isJson)
+		return getNowNextEpg(request.args["sRef"][0], 1, self.isJson, self.getFieldsArg(request))
 
 	def P_epgsimilar(self, request):
 		res = self.testMandatoryArguments(request, ["sRef", "eventid"])
@@ -1594,7 +1801,7 @@ class WebController(BaseController):
 				"message": "The parameter 'eventid' must be a number"
 			}
 
-		return getSearchSimilarEpg(request.args["sRef"][0], eventid, self.isJson)
+		return getSearchSimilarEpg(request.args["sRef"][0], eventid, self.isJson, self.getFieldsArg(request))
 
 	def P_event(self, request):
 		event = getEvent(request.args["sref"][0], request.args["idev"][0], self.isJson)
@@ -2116,6 +2323,37 @@ class WebController(BaseController):
 	def P_epgmultigz(self, request):
 		return self.P_epgmulti(request)
 
+	def P_metrics(self, request):
+		"""
+		Request handler for the `metrics` endpoint.
+		Per endpoint request counts, latency histogram (split into handler,
+		template and serialization time), response sizes and errors.
+		Recording is enabled with `config.OpenWebif.metrics`.
+
+		.. note::
+
+			Not available in *Enigma2 WebInterface API*.
+
+		Args:
+			request (twisted.web.server.Request): HTTP request object
+		Returns:
+			HTTP response with headers
+
+		.. http:get:: /api/metrics
+
+			:query string format: `json` (default) or `prometheus`
+		"""
+		if request.args.get("format", [""])[0] == "prometheus":
+			self.isCustom = True
+			request.setHeader("content-type", "text/plain; version=0.0.4")
+			return metrics.toPrometheus()
+		ret = metrics.toDict()
+		ret["caches"] = {
+			"multiepg": multiEpgCache.getStats()
+		}
+		ret["result"] = True
+		return ret
+
 	def P_getsatellites(self, request):
 		stype = "tv"
 		if "stype" in request.args.keys():
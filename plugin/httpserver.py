@@ -20,6 +20,9 @@ from twisted.internet.error import CannotListenError
 from twisted.internet.protocol import Factory, Protocol
 
 from controllers.root import RootController
+from controllers.base import templates
+from controllers.metrics import metrics
+from controllers.models.epgindex import epgSearchIndex
 from sslcertificate import SSLCertificateGenerator, KEY_FILE, CERT_FILE, CA_FILE, CHAIN_FILE
 from socket import has_ipv6
 from OpenSSL import SSL
@@ -28,6 +31,7 @@ from Components.Network import iNetwork
 
 import os
 import imp
+from time import time
 #import re
 import ipaddress
 
@@ -72,6 +76,94 @@ def getAllNetworks():
 		return tempaddrs
 
 
+class NetworkAcl(object):
+	"""
+	Pre-parsed access control data for AuthResource.
+
+	The local networks are parsed once and refreshed when the network
+	configuration changes (HttpdStart/HttpdStop are called on interface
+	up/down) or after `ttl` seconds. The result of each peer check is
+	memoized, so authorizing a known peer is a dictionary lookup.
+	"""
+	MAX_PEERS = 1024
+
+	def __init__(self, ttl=300):
+		self.ttl = ttl
+		self.invalidate()
+
+	def invalidate(self):
+		self.networks = None
+		self.expires = 0
+		self.peers = {}
+
+	def getNetworks(self):
+		now = time()
+		if self.networks is None or now > self.expires:
+			networks = []
+			for network in getAllNetworks() or []:
+				networks.append(ipaddress.ip_network(unicode(network), strict=False))
+			self.networks = networks
+			self.expires = now + self.ttl
+			self.peers = {}
+		return self.networks
+
+	def check(self, peer):
+		"""
+		Return a (is in a local network, is a private address) tuple.
+		"""
+		networks = self.getNetworks()
+		result = self.peers.get(peer)
+		if result is None:
+			try:
+				address = ipaddress.ip_address(unicode(peer))
+			except ValueError:
+				result = (False, False)
+			else:
+				result = (any(address in network for network in networks), address.is_private)
+			if len(self.peers) >= self.MAX_PEERS:
+				self.peers = {}
+			self.peers[peer] = result
+		return result
+
+	def isLocal(self, peer):
+		return self.check(peer)[0]
+
+	def isPrivate(self, peer):
+		return self.check(peer)[1]
+
+
+networkAcl = NetworkAcl()
+
+
+class ShellCache(object):
+	"""
+	Users without a login shell, read from /etc/passwd whenever it changes.
+	"""
+	PASSWD = '/etc/passwd'
+
+	def __init__(self):
+		self.mtime = None
+		self.noshell = set()
+
+	def hasNoShell(self, user):
+		try:
+			mtime = os.stat(self.PASSWD).st_mtime
+		except OSError:
+			return False
+		if mtime != self.mtime:
+			noshell = set()
+			for line in file(self.PASSWD).readlines():
+				line = line.strip()
+				if line.endswith(":/bin/false") or line.endswith(":/sbin/nologin"):
+					noshell.add(line.split(":", 1)[0])
+			self.noshell = noshell
+			self.mtime = mtime
+		return user in self.noshell
+
+
+shellCache = ShellCache()
+
+
 def verifyCallback(connection, x509, errnum, errdepth, ok):
 	if not ok:
 		print '[OpenWebif] Invalid cert from subject: ', x509.get_subject()
@@ -169,6 +261,7 @@ def HttpdStart(session):
 	Args:
 		session: (?) session object
 	"""
+	networkAcl.invalidate()
 	if config.OpenWebif.enabled.value is True:
 		global listener, site, sslsite
 		port = config.OpenWebif.port.value
@@ -177,6 +270,12 @@ def HttpdStart(session):
 		root = AuthResource(session, temproot)
 		site = server.Site(root)
 
+		if config.OpenWebif.template_warmup.value:
+			templates.warmUp()
+		metrics.enabled = config.OpenWebif.metrics.value
+		if config.OpenWebif.epg_search_index.value:
+			epgSearchIndex.start()
+
 		# start http webserver on configured port
 		try:
 			if has_ipv6 and fileExists('/proc/net/if_inet6') and version.major >= 12:
@@ -267,6 +366,8 @@ def HttpdStart(session):
 
 
 def HttpdStop(session):
+	networkAcl.invalidate()
+	epgSearchIndex.stop()
 	StopServer(session).doStop()
 
 
@@ -280,13 +381,7 @@ class AuthResource(resource.Resource):
 		self.resource = root
 
 	def noShell(self, request):
-		user = request.getUser()
-		if fileExists('/etc/passwd'):
-			for line in file('/etc/passwd').readlines():
-				line = line.strip()
-				if line.startswith(user + ":") and (line.endswith(":/bin/false") or line.endswith(":/sbin/nologin")):
-					return True
-		return False
+		return shellCache.hasNoShell(request.getUser())
 
 	def render(self, request):
 		host = request.getHost().host
@@ -328,15 +423,12 @@ class AuthResource(resource.Resource):
 
 		# #1: Auth is disabled and access is from local network
 		if (not request.isSecure() and config.OpenWebif.auth.value is False) or (request.isSecure() and config.OpenWebif.https_auth.value is False):
-			networks = getAllNetworks()
-			if networks:
-				for network in networks:
-					if ipaddress.ip_address(unicode(peer)) in ipaddress.ip_network(unicode(network), strict=False):
-						return self.resource.getChildWithDefault(path, request)
+			if networkAcl.isLocal(peer):
+				return self.resource.getChildWithDefault(path, request)
 
 		# #2: Auth is disabled and access is from private address space (Usually VPN) and access for VPNs has been granted
 		if (not request.isSecure() and config.OpenWebif.auth.value is False) or (request.isSecure() and config.OpenWebif.https_auth.value is False):
-			if config.OpenWebif.vpn_access.value is True and ipaddress.ip_address(unicode(peer)).is_private:
+			if config.OpenWebif.vpn_access.value is True and networkAcl.isPrivate(peer):
 				return self.resource.getChildWithDefault(path, request)
 
 		# #3: Access is from localhost and streaming auth is disabled - or - we only want to see our IPv6 (For inadyn-mt)
@@ -387,13 +479,7 @@ class AuthResource(resource.Resource):
 	def login(self, user, passwd, peer):
 		if user == "root" and config.OpenWebif.no_root_access.value:
 			# Override "no root" for logins from local/private networks
-			samenet = False
-			networks = getAllNetworks()
-			if networks:
-				for network in networks:
-					if ipaddress.ip_address(unicode(peer)) in ipaddress.ip_network(unicode(network), strict=False):
-						samenet=True
-			if not (ipaddress.ip_address(unicode(peer)).is_private or samenet):
+			if not (networkAcl.isPrivate(peer) or networkAcl.isLocal(peer)):
 				return False
 		from crypt import crypt
 		from pwd import getpwnam
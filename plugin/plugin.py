@@ -73,6 +73,16 @@ config.OpenWebif.no_root_access = ConfigYesNo(default=False)
 config.OpenWebif.local_access_only = ConfigSelection(default=' ', choices=[' '])
 config.OpenWebif.vpn_access = ConfigYesNo(default=False)
 config.OpenWebif.allow_upload_ipk = ConfigYesNo(default=False)
+# precompile all view templates when the web server starts
+config.OpenWebif.template_warmup = ConfigYesNo(default=False)
+# record request timings for /api/metrics
+config.OpenWebif.metrics = ConfigYesNo(default=False)
+# send an ETag with JSON responses and answer matching If-None-Match with 304
+config.OpenWebif.json_etag = ConfigYesNo(default=False)
+# keep an in-memory word index of the EPG for search-as-you-type
+config.OpenWebif.epg_search_index = ConfigYesNo(default=False)
+# Cache-Control max-age (seconds) of static files and picons
+config.OpenWebif.static_max_age = ConfigInteger(default=3600, limits=(0, 31536000))
 # encoding of EPG data
 config.OpenWebif.epg_encoding = ConfigSelection(default='utf-8', choices=['utf-8',
 										'iso-8859-15',
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Stand-ins for the enigma2 modules imported by the plugin modules tested
+without a receiver.
+
+Importing this module registers the fakes in :py:data:`sys.modules` and
+puts the plugin folder on the include path, so it has to be imported
+before any `controllers` module. Only the behaviour the tested code
+relies on is implemented: RecordTimer keeps its timer list sorted by
+begin time and TimerSanityCheck simulates a single tuner, i.e. any two
+enabled timers overlapping in time conflict.
+"""
+import os
+import sys
+import types
+
+# hack: alter include path in such ways that the controllers package is included
+sys.path.append(os.path.join(os.path.dirname(__file__), '../plugin'))
+
+
+class Anything(object):
+	"""
+	Accepts any attribute access and call, e.g. config.a.b.value. The
+	attributes are kept, so tests can set values on them.
+	"""
+	def __getattr__(self, name):
+		if name.startswith('__'):
+			raise AttributeError(name)
+		value = Anything()
+		setattr(self, name, value)
+		return value
+
+	def __call__(self, *args, **kwargs):
+		return Anything()
+
+	def __iter__(self):
+		return iter(())
+
+	def __nonzero__(self):
+		return False
+
+
+class FakeModule(types.ModuleType):
+	"""
+	Module returning an :py:class:`Anything` for names it doesn't define.
+	"""
+	def __getattr__(self, name):
+		if name.startswith('__'):
+			raise AttributeError(name)
+		value = Anything()
+		setattr(self, name, value)
+		return value
+
+
+class eServiceReference(object):
+	isDirectory = 1
+	mustDescent = 2
+	canDescent = 4
+	isMarker = 64
+
+	def __init__(self, ref, flags=0):
+		if isinstance(ref, eServiceReference):
+			ref, flags = ref.ref, ref.flags
+		self.ref = ref
+		self.flags = flags
+
+	def toString(self):
+		return self.ref
+
+	def valid(self):
+		return bool(self.ref)
+
+
+class FakeServiceList(object):
+	def __init__(self, services):
+		self.services = services
+
+	def getContent(self, fmt, sort=False):
+		# only "RN" is used by the tested code
+		return [(eServiceReference(ref, flags), name) for ref, flags, name in self.services]
+
+
+class FakeServiceCenter(object):
+	"""
+	eServiceCenter listing the references in `lists`, a dict service
+	reference -> list of (reference, flags, name).
+	"""
+	def __init__(self):
+		self.lists = {}
+
+	def list(self, ref):
+		services = self.lists.get(ref.toString())
+		return services is not None and FakeServiceList(services) or None
+
+
+class eServiceCenter(object):
+	instance = FakeServiceCenter()
+
+	@classmethod
+	def getInstance(cls):
+		return cls.instance
+
+
+class FakeEPGCache(object):
+	"""
+	eEPGCache answering `EX` lookups of events by id from `descriptions`,
+	a dict (service reference, event id) -> extended description. The
+	queries are kept in `queries`.
+	"""
+	def __init__(self):
+		self.descriptions = {}
+		self.queries = []
+
+	def lookupEvent(self, query):
+		self.queries.append(query)
+		rows = []
+		for sref, kind, eit in query[1:]:
+			# X: one row per query, None for events not found
+			rows.append((self.descriptions.get((sref, eit)),))
+		return rows
+
+	def lookupEventTime(self, ref, when):
+		return None
+
+
+class eEPGCache(object):
+	instance = FakeEPGCache()
+
+	@classmethod
+	def getInstance(cls):
+		return cls.instance
+
+
+class ServiceReference(object):
+	def __init__(self, ref):
+		self.ref = eServiceReference(ref)
+
+	def __str__(self):
+		return self.ref.toString()
+
+	def getServiceName(self):
+		return self.ref.toString().split(":")[-1]
+
+
+class RecordTimerEntry(object):
+	StateWaiting = 0
+	StateRunning = 2
+	StateEnded = 3
+
+	def __init__(self, serviceref, begin, end, name, description, eit, disabled=False, justplay=False, afterEvent=3, dirname=None, tags=None):
+		self.service_ref = serviceref
+		self.begin = begin
+		self.end = end
+		self.name = name
+		self.description = description
+		self.eit = eit
+		self.disabled = disabled
+		self.justplay = justplay
+		self.afterEvent = afterEvent
+		self.dirname = dirname
+		self.tags = tags or []
+		self.repeated = 0
+		self.state = self.StateWaiting
+		self.autoincrease = False
+		self.dontSave = False
+		self.cancelled = False
+		self.backoff = 0
+		self.start_prepare = begin - 20
+
+	def processRepeated(self):
+		# like TimerEntry.processRepeated, through timeChanged()
+		if self.repeated:
+			self.start_prepare = self.begin - 20
+			self.backoff = 0
+
+	def abort(self):
+		self.cancelled = True
+
+	def setAutoincreaseEnd(self):
+		return False
+
+	def __repr__(self):
+		return "<timer %s>" % self.name
+
+
+class TimerSanityCheck(object):
+	def __init__(self, timerlist, newtimer=None):
+		self.timerlist = timerlist
+		self.newtimer = newtimer
+		self.simultimer = []
+
+	def check(self):
+		timer = self.newtimer
+		self.simultimer = [timer] + [
+			t for t in self.timerlist
+			if t is not timer and not t.disabled and t.begin < timer.end and timer.begin < t.end]
+		return len(self.simultimer) == 1
+
+	def getSimulTimerList(self):
+		return self.simultimer
+
+
+class RecordTimer(object):
+	def __init__(self):
+		self.timer_list = []
+		self.processed_timers = []
+		self.on_state_change = []
+		self.saved = 0
+
+	def record(self, entry, ignoreTSC=False, dosave=True):
+		if not ignoreTSC:
+			sanity = TimerSanityCheck(self.timer_list, entry)
+			if not sanity.check():
+				return sanity.getSimulTimerList()
+		self.timer_list.append(entry)
+		self.timer_list.sort(key=lambda t: t.begin)
+		if dosave:
+			self.saveTimer()
+		return None
+
+	def timeChanged(self, entry):
+		if entry.cancelled and entry in self.timer_list:
+			# an aborted timer ends and moves to the processed timers
+			self.timer_list.remove(entry)
+			self.processed_timers.append(entry)
+			entry.state = entry.StateEnded
+		self.timer_list.sort(key=lambda t: t.begin)
+
+	def removeEntry(self, entry):
+		entry.abort()
+		if entry.state != entry.StateEnded:
+			self.timeChanged(entry)
+		self.processed_timers.remove(entry)
+		self.saveTimer()
+
+	def saveTimer(self):
+		self.saved += 1
+
+
+class Language(object):
+	def getLanguage(self):
+		return "en_EN"
+
+	def addCallback(self, callback):
+		pass
+
+
+#: Components.config.config, settings used by the tested code are set on it
+config = Anything()
+config.OpenWebif.epg_encoding.value = 'utf-8'
+
+
+def _module(name, **attributes):
+	module = FakeModule(name)
+	module.__dict__.update(attributes)
+	sys.modules[name] = module
+	if "." in name:
+		parent, child = name.rsplit(".", 1)
+		setattr(sys.modules[parent], child, module)
+	return module
+
+
+def install():
+	if "enigma" in sys.modules:
+		return
+	_module("enigma", eServiceReference=eServiceReference, eServiceCenter=eServiceCenter, eEPGCache=eEPGCache)
+	_module("Components")
+	_module("Components.config", config=config)
+	_module("Components.Language", language=Language())
+	_module("Components.NimManager")
+	_module("Components.ParentalControl")
+	_module("Components.UsageConfig", preferredTimerPath=lambda: "/media/hdd/movie/")
+	_module("Components.TimerSanityCheck", TimerSanityCheck=TimerSanityCheck)
+	_module("Screens")
+	_module("Screens.ChannelSelection", service_types_tv="1:7:1:0:0:0:0:0:0:0:(type == 1)", service_types_radio="1:7:2:0:0:0:0:0:0:0:(type == 2)")
+	_module("Screens.InfoBar")
+	_module("Tools")
+	_module("Tools.Directories", resolveFilename=lambda scope, path="": path)
+	_module("RecordTimer", RecordTimerEntry=RecordTimerEntry, RecordTimer=RecordTimer)
+	_module("ServiceReference", ServiceReference=ServiceReference)
+	try:
+		import twisted.internet  # noqa
+	except ImportError:
+		# the tested code only schedules calls on the reactor
+		_module("twisted")
+		_module("twisted.internet")
+	# services and timers import the info model for a few helpers only,
+	# keep its receiver dependent imports out
+	import controllers.models  # noqa
+	_module("controllers.models.info", GetWithAlternative=lambda sref, onlyFirst=True: sref)
+
+
+install()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+import enigma_fakes
+from controllers.models.epgindex import EpgSearchIndex, epgText, tokenize
+
+SREF = "1:0:19:283D:3FB:1:C00000:0:0:0:"
+
+
+class TestEpgText(unittest.TestCase):
+	def tearDown(self):
+		enigma_fakes.config.OpenWebif.epg_encoding.value = 'utf-8'
+
+	def testUtf8(self):
+		enigma_fakes.config.OpenWebif.epg_encoding.value = 'utf-8'
+		self.assertEqual(epgText('K\xc3\xa4se'), 'K\xc3\xa4se')
+		self.assertEqual(epgText(None), None)
+
+	def testConfiguredEncoding(self):
+		enigma_fakes.config.OpenWebif.epg_encoding.value = 'iso-8859-1'
+		self.assertEqual(epgText('K\xe4se'), 'K\xc3\xa4se')
+		# already UTF-8, left alone
+		self.assertEqual(epgText('K\xc3\xa4se'), 'K\xc3\xa4se')
+
+	def testTokenize(self):
+		self.assertEqual(tokenize('Die K\xc3\xa4se-Show, Teil 2'), [u'die', u'k\xe4se', u'show', u'teil', u'2'])
+		self.assertEqual(tokenize(None), [])
+
+
+class TestEpgSearchIndex(unittest.TestCase):
+	def setUp(self):
+		enigma_fakes.config.OpenWebif.epg_encoding.value = 'iso-8859-1'
+		self.index = EpgSearchIndex()
+		state = {"events": [], "postings": {}, "channels": {}, "genres": {}, "names": {}}
+		begin = int(time.time()) + 3600
+		self.index._add(state, (1, begin, 1800, 'K\xe4se am Abend', 'Kochen', SREF, [(1, 2)], 'Kanal \xc4'))
+		self.index._add(state, (2, begin + 1800, 1800, 'Nachrichten', 'Wetter', SREF, None, 'Kanal \xc4'))
+		self.index.events = state["events"]
+		self.index.postings = state["postings"]
+		self.index.channels = state["channels"]
+		self.index.genres = state["genres"]
+		self.index.names = state["names"]
+		self.index.words = sorted(self.index.postings)
+
+	def tearDown(self):
+		enigma_fakes.config.OpenWebif.epg_encoding.value = 'utf-8'
+
+	def testStoredAsUtf8(self):
+		self.assertEqual(self.index.events[0][3], 'K\xc3\xa4se am Abend')
+		self.assertEqual(self.index.events[0][6], 18)
+		self.assertEqual(self.index.names[SREF], 'Kanal \xc3\x84')
+
+	def testSearch(self):
+		result = self.index.search('K\xc3\xa4se')
+		self.assertEqual([e[0] for e in result["events"]], [1])
+		self.assertEqual(self.index.search('k\xc3\xa4')["completions"], ['k\xc3\xa4se'])
+		self.assertEqual(self.index.search('wett')["total"], 1)
+		self.assertEqual(self.index.search('abend kochen')["total"], 1)
+		self.assertEqual(self.index.search('abend wetter')["total"], 0)
+
+	def testFilters(self):
+		self.assertEqual(self.index.search('a', genre=18)["total"], 1)
+		self.assertEqual(self.index.search('n', channel=SREF)["channels"], {SREF: 1})
+		self.assertEqual(self.index.search('n', channel="other")["total"], 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
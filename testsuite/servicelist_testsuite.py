@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import enigma_fakes
+from enigma_fakes import eServiceCenter, eServiceReference
+from controllers.models.servicelist import ServiceListSnapshot, serviceListSnapshot, BouquetNumbering, getBouquetNumbering
+
+ROOT = '1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "bouquets.tv" ORDER BY bouquet'
+FAVOURITES = '1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "userbouquet.favourites.tv" ORDER BY bouquet'
+NEWS = '1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "userbouquet.news.tv" ORDER BY bouquet'
+PROVIDERS = '1:7:1:0:0:0:0:0:0:0:(type == 1) FROM PROVIDERS ORDER BY name'
+EMPTY = '1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "userbouquet.empty.tv" ORDER BY bouquet'
+
+CHANNEL_A = "1:0:19:283D:3FB:1:C00000:0:0:0:"
+CHANNEL_B = "1:0:19:2B66:3F3:1:C00000:0:0:0:"
+CHANNEL_C = "1:0:19:EF10:421:1:C00000:0:0:0:"
+HIDDEN = "1:512:19:EF11:421:1:C00000:0:0:0:"
+MARKER = "1:64:0:0:0:0:0:0:0:0:"
+NUMBER_MARKER = "1:832:D:0:0:0:0:0:0:0:"
+
+
+class TestBouquetNumbering(unittest.TestCase):
+	def setUp(self):
+		eServiceCenter.instance = enigma_fakes.FakeServiceCenter()
+		eServiceCenter.instance.lists = {
+			ROOT: [
+				(FAVOURITES, 7, "Favourites"),
+				(PROVIDERS, 7, "Providers"),
+				(NEWS, 7, "News"),
+				(EMPTY, 7, "Empty"),
+			],
+			FAVOURITES: [
+				(MARKER, eServiceReference.isMarker, "Marker"),
+				(CHANNEL_A, 0, "A"),
+				(HIDDEN, 0, "Hidden"),
+				(CHANNEL_B, 0, "B"),
+			],
+			PROVIDERS: [
+				(CHANNEL_C, 0, "C"),
+			],
+			NEWS: [
+				(NUMBER_MARKER, eServiceReference.isMarker, "Gap"),
+				(CHANNEL_B, 0, "B"),
+				(CHANNEL_C, 0, "C"),
+			],
+		}
+		serviceListSnapshot.invalidate()
+		self.numbering = BouquetNumbering(ROOT)
+
+	def testNumbers(self):
+		self.assertEqual(self.numbering.numbers[FAVOURITES], [0, 1, 0, 2])
+		self.assertEqual(self.numbering.numbers[NEWS], [3, 4, 5])
+		self.assertEqual(self.numbering.total, 5)
+
+	def testOnlyUserBouquets(self):
+		self.assertNotIn(PROVIDERS, self.numbering.numbers)
+		self.assertEqual(self.numbering.startpos[PROVIDERS], 2)
+
+	def testStartpos(self):
+		self.assertEqual(self.numbering.startpos, {FAVOURITES: 0, PROVIDERS: 2, NEWS: 2, EMPTY: 5})
+		self.assertEqual(self.numbering.numbers[EMPTY], [])
+
+	def testChannels(self):
+		# first number of a channel, markers and hidden services excluded
+		self.assertEqual(self.numbering.channels, {CHANNEL_A: 1, CHANNEL_B: 2, CHANNEL_C: 5})
+
+	def testAllBouquets(self):
+		# the bouquet editor's rule: the services of every bouquet count
+		numbering = BouquetNumbering(ROOT, allbouquets=True)
+		self.assertEqual(numbering.startpos, {FAVOURITES: 0, PROVIDERS: 2, NEWS: 3, EMPTY: 6})
+		self.assertEqual(numbering.numbers[PROVIDERS], [3])
+		self.assertEqual(numbering.numbers[NEWS], [4, 5, 6])
+		self.assertEqual(numbering.channels, {CHANNEL_A: 1, CHANNEL_B: 2, CHANNEL_C: 3})
+		self.assertEqual(numbering.total, 6)
+
+	def testShared(self):
+		numbering = getBouquetNumbering(ROOT)
+		self.assertIs(getBouquetNumbering(ROOT), numbering)
+		self.assertIsNot(getBouquetNumbering(ROOT, allbouquets=True), numbering)
+		self.assertIs(getBouquetNumbering(ROOT, allbouquets=True), getBouquetNumbering(ROOT, allbouquets=True))
+		serviceListSnapshot.invalidate()
+		self.assertIsNot(getBouquetNumbering(ROOT), numbering)
+
+
+
+class TestServiceListSnapshot(unittest.TestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		for name in ("lamedb", "bouquets.tv", "userbouquet.favourites.tv"):
+			self.write(name, 0)
+		eServiceCenter.instance = enigma_fakes.FakeServiceCenter()
+		eServiceCenter.instance.lists = {
+			ROOT: [(FAVOURITES, 7, "Favourites")],
+			FAVOURITES: [(CHANNEL_A, 0, "A")],
+		}
+		self.snapshot = ServiceListSnapshot()
+		self.snapshot.SETTINGS_PATH = self.path
+		self.snapshot.CHECK_INTERVAL = 0
+
+	def tearDown(self):
+		shutil.rmtree(self.path)
+
+	def write(self, name, mtime):
+		path = os.path.join(self.path, name)
+		with open(path, "w") as f:
+			f.write(name)
+		os.utime(path, (mtime, mtime))
+		os.utime(self.path, (0, 0))
+
+	def fetch(self):
+		self.snapshot.getContent(ROOT, "RN")
+		self.snapshot.getContent(FAVOURITES, "RN")
+		return self.snapshot.version
+
+	def testCached(self):
+		version = self.fetch()
+		lists = eServiceCenter.instance.lists
+		eServiceCenter.instance.lists = {}
+		self.assertEqual(self.snapshot.getContent(FAVOURITES, "RN")[0][1], "A")
+		self.assertIsNone(self.snapshot.getContent(NEWS, "RN"))
+		self.assertEqual(self.snapshot.version, version)
+		eServiceCenter.instance.lists = lists
+
+	def testCopies(self):
+		self.fetch()
+		self.snapshot.getContent(FAVOURITES, "RN").append(None)
+		self.assertEqual(len(self.snapshot.getContent(FAVOURITES, "RN")), 1)
+
+	def testBouquetRewritten(self):
+		version = self.fetch()
+		self.assertIn("userbouquet.favourites.tv", self.snapshot.files)
+		# rewritten in place, the folder's mtime doesn't change
+		self.write("userbouquet.favourites.tv", 100)
+		self.assertNotEqual(self.fetch(), version)
+
+	def testBouquetListRewritten(self):
+		version = self.fetch()
+		self.write("bouquets.tv", 100)
+		self.assertNotEqual(self.fetch(), version)
+		version = self.snapshot.version
+		self.write("lamedb", 100)
+		self.assertNotEqual(self.fetch(), version)
+
+	def testFolderChanged(self):
+		version = self.fetch()
+		os.utime(self.path, (100, 100))
+		self.assertNotEqual(self.fetch(), version)
+
+	def testUnchanged(self):
+		version = self.fetch()
+		self.write("userbouquet.other.tv", 100)
+		self.assertEqual(self.fetch(), version)
+
+	def testDerived(self):
+		self.fetch()
+		built = []
+		self.snapshot.getDerived("key", lambda: built.append(1) or len(built))
+		self.assertEqual(self.snapshot.getDerived("key", lambda: built.append(1) or len(built)), 1)
+		self.snapshot.invalidate()
+		self.assertEqual(self.snapshot.getDerived("key", lambda: built.append(1) or len(built)), 2)
+
+	def testLimit(self):
+		self.snapshot.maxentries = 2
+		self.fetch()
+		self.snapshot.getContent(CHANNEL_A, "RN")
+		self.assertEqual(list(self.snapshot.lists), [(CHANNEL_A, "RN", True)])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+# installs the enigma2 fakes
+import enigma_fakes  # noqa
+from controllers.models import services
+from controllers.models.services import PiconIndex, getPicon
+
+SREF = "1:0:19:283D:3FB:1:C00000:0:0:0:"
+SREF_SUBNET = "1:0:19:2B66:3F3:1:C00001:0:0:0:"
+DEFAULT = "/images/default_picon.png"
+
+
+class TestPiconIndex(unittest.TestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.add("1_0_19_283D_3FB_1_C00000_0_0_0.png", 0)
+		self.index = PiconIndex(self.path)
+		self.previous = services.piconIndex
+		services.piconIndex = self.index
+
+	def tearDown(self):
+		services.piconIndex = self.previous
+		shutil.rmtree(self.path)
+
+	def add(self, name, mtime):
+		open(os.path.join(self.path, name), "w").close()
+		os.utime(self.path, (mtime, mtime))
+
+	def testLookup(self):
+		self.assertEqual(getPicon(SREF), "/picon/1_0_19_283D_3FB_1_C00000_0_0_0.png")
+		self.assertEqual(getPicon(SREF + ":Channel"), "/picon/1_0_19_283D_3FB_1_C00000_0_0_0.png")
+		self.assertEqual(getPicon(SREF_SUBNET), DEFAULT)
+
+	def testFallbacks(self):
+		self.add("1_0_19_2B66_3F3_1_C00000_0_0_0.png", 100)
+		self.add("1_0_1_EF10_421_1_C00000_0_0_0.png", 200)
+		self.index.invalidate()
+		# namespace without sub-network
+		self.assertEqual(getPicon(SREF_SUBNET), "/picon/1_0_19_2B66_3F3_1_C00000_0_0_0.png")
+		# reference type and service type 1
+		self.assertEqual(getPicon("4097:0:16:EF10:421:1:C00000:0:0:0:"), "/picon/1_0_1_EF10_421_1_C00000_0_0_0.png")
+
+	def testMemoized(self):
+		getPicon(SREF)
+		os.remove(os.path.join(self.path, "1_0_19_283D_3FB_1_C00000_0_0_0.png"))
+		self.assertEqual(getPicon(SREF), "/picon/1_0_19_283D_3FB_1_C00000_0_0_0.png")
+		self.assertIn(SREF, self.index.urls)
+
+	def testRescanOnMiss(self):
+		getPicon(SREF)
+		self.add("1_0_19_2B66_3F3_1_C00000_0_0_0.png", 100)
+		# within miss_interval of the last check the directory isn't checked
+		self.assertEqual(getPicon(SREF_SUBNET), DEFAULT)
+		self.index.urls.clear()
+		self.index.checked = time.time() - self.index.miss_interval
+		self.assertEqual(getPicon(SREF_SUBNET), "/picon/1_0_19_2B66_3F3_1_C00000_0_0_0.png")
+		# the rescan dropped the memoized URLs
+		self.assertEqual(self.index.urls.keys(), [SREF_SUBNET])
+
+	def testRescanOnMtime(self):
+		getPicon(SREF)
+		self.add("1_0_19_2B66_3F3_1_C00000_0_0_0.png", 100)
+		self.index.checked = 0
+		self.assertTrue(self.index.refresh())
+		self.assertTrue(self.index.exists("1_0_19_2B66_3F3_1_C00000_0_0_0.png"))
+		self.index.checked = 0
+		self.assertFalse(self.index.refresh())
+
+	def testServiceListsChanged(self):
+		getPicon(SREF)
+		services.serviceListSnapshot.invalidate()
+		self.index.refresh()
+		self.assertEqual(self.index.urls, {})
+
+	def testMissingDirectory(self):
+		shutil.rmtree(self.path)
+		self.index.invalidate()
+		self.assertEqual(getPicon(SREF), DEFAULT)
+		os.mkdir(self.path)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import time
+import unittest
+
+# installs the enigma2 fakes
+import enigma_fakes  # noqa
+from controllers.models import timeformat
+from controllers.models.timeformat import TimeFormatCache, formatClock, formatDate, formatDay
+
+# Mon 01.04.2019 12:34:56 UTC
+TIMESTAMP = 1554122096
+
+
+class TestTimeFormat(unittest.TestCase):
+	def setUp(self):
+		self.tz = os.environ.get("TZ")
+		self.setZone("UTC")
+
+	def tearDown(self):
+		if self.tz is None:
+			del os.environ["TZ"]
+		else:
+			os.environ["TZ"] = self.tz
+		time.tzset()
+
+	def setZone(self, zone):
+		os.environ["TZ"] = zone
+		time.tzset()
+
+	def testFormat(self):
+		self.assertEqual(formatClock(TIMESTAMP), "12:34")
+		self.assertEqual(formatDate(TIMESTAMP), "01.04.2019")
+		self.assertEqual(formatDay(TIMESTAMP), "Mon 01.04.2019")
+
+	def testMatchesStrftime(self):
+		for timestamp in range(TIMESTAMP, TIMESTAMP + 8 * 86400, 3607):
+			lt = time.localtime(timestamp)
+			self.assertEqual(formatClock(timestamp), time.strftime("%H:%M", lt))
+			self.assertEqual(formatDate(timestamp), time.strftime("%d.%m.%Y", lt))
+			self.assertEqual(formatDay(timestamp), time.strftime("%a %d.%m.%Y", lt))
+
+	def testCachedPerMinute(self):
+		cache = TimeFormatCache()
+		entry = cache.get(TIMESTAMP - 56)
+		self.assertIs(cache.get(TIMESTAMP + 3), entry)
+		self.assertEqual(len(cache.minutes), 1)
+		self.assertEqual(entry[0], "12:34")
+		self.assertEqual(cache.get(TIMESTAMP + 4)[0], "12:35")
+		self.assertEqual(len(cache.minutes), 2)
+
+	def testZoneChange(self):
+		cache = TimeFormatCache()
+		self.assertEqual(cache.get(TIMESTAMP)[0], "12:34")
+		self.setZone("CET-1CEST,M3.5.0,M10.5.0/3")
+		self.assertEqual(cache.get(TIMESTAMP)[0], "14:34")
+		self.setZone("UTC")
+		self.assertEqual(cache.get(TIMESTAMP)[0], "12:34")
+
+	def testLimit(self):
+		cache = TimeFormatCache(maxentries=2)
+		for minute in range(3):
+			cache.get(TIMESTAMP + minute * 60)
+		self.assertEqual(len(cache.minutes), 1)
+		cache.invalidate()
+		self.assertEqual(cache.minutes, {})
+
+	def testSharedCache(self):
+		timeformat.timeFormatCache.invalidate()
+		formatClock(TIMESTAMP)
+		formatDay(TIMESTAMP + 1)
+		self.assertEqual(len(timeformat.timeFormatCache.minutes), 1)
+
+
+if __name__ == '__main__':
+	unittest.main()
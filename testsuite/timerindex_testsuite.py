@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+
+import enigma_fakes
+from enigma_fakes import RecordTimer, RecordTimerEntry, ServiceReference, eEPGCache
+from controllers.models.timerindex import TimerIndex, DescriptionCache
+
+SREF_A = "1:0:19:283D:3FB:1:C00000:0:0:0:"
+SREF_B = "1:0:19:2B66:3F3:1:C00000:0:0:0:"
+
+
+def timer(sref, begin, end, name="timer"):
+	return RecordTimerEntry(ServiceReference(sref), begin, end, name, "", None)
+
+
+class TestTimerIndex(unittest.TestCase):
+	def setUp(self):
+		self.rt = RecordTimer()
+		self.index = TimerIndex()
+		self.a = timer(SREF_A, 1000, 2000, "a")
+		self.b = timer(SREF_B, 1000, 2000, "b")
+		self.done = timer(SREF_A, 100, 200, "done")
+		self.rt.timer_list.extend([self.a, self.b])
+		self.rt.processed_timers.append(self.done)
+
+	def testFind(self):
+		self.assertIs(self.index.find(self.rt, SREF_A, 1000, 2000), self.a)
+		self.assertIs(self.index.find(self.rt, SREF_B, "1000", "2000"), self.b)
+		self.assertIs(self.index.find(self.rt, SREF_A, 100, 200), self.done)
+		self.assertIsNone(self.index.find(self.rt, SREF_A, 1000, 2001))
+
+	def testFindIgnoresName(self):
+		self.assertIs(self.index.find(self.rt, SREF_A + ":Channel A", 1000, 2000), self.a)
+
+	def testByService(self):
+		services = self.index.byService(self.rt)
+		self.assertEqual(services[SREF_A], [self.a, self.done])
+		self.assertEqual(services[SREF_B], [self.b])
+
+	def testAddedAndRemoved(self):
+		self.index.find(self.rt, SREF_A, 1000, 2000)
+		c = timer(SREF_B, 3000, 4000, "c")
+		self.rt.timer_list.append(c)
+		self.assertIs(self.index.find(self.rt, SREF_B, 3000, 4000), c)
+		self.rt.timer_list.remove(self.a)
+		self.assertNotIn(self.a, self.index.byService(self.rt)[SREF_A])
+
+	def testReplacedTimer(self):
+		# same list length, another object: byService must not go stale
+		self.index.byService(self.rt)
+		c = timer(SREF_B, 3000, 4000, "c")
+		self.rt.timer_list[0] = c
+		services = self.index.byService(self.rt)
+		self.assertEqual(services[SREF_A], [self.done])
+		self.assertEqual(services[SREF_B], [c, self.b])
+
+	def testEditedInPlace(self):
+		self.index.find(self.rt, SREF_A, 1000, 2000)
+		self.a.begin, self.a.end = 5000, 6000
+		self.assertIsNone(self.index.find(self.rt, SREF_A, 1000, 2000))
+		self.assertIs(self.index.find(self.rt, SREF_A, 5000, 6000), self.a)
+
+	def testStateChangeInvalidates(self):
+		self.index.validate(self.rt)
+		self.assertEqual(self.rt.on_state_change, [self.index.invalidate])
+		self.a.begin = 5000
+		for callback in self.rt.on_state_change:
+			callback(self.a)
+		self.assertEqual(self.index.byService(self.rt)[SREF_A][0].begin, 5000)
+		self.assertIn((SREF_A, 5000, 2000), self.index.entries)
+
+	def testVersion(self):
+		self.index.validate(self.rt)
+		version = self.index.version
+		self.index.validate(self.rt)
+		self.assertEqual(self.index.version, version)
+		self.rt.timer_list.reverse()
+		self.index.validate(self.rt)
+		self.assertEqual(self.index.version, version + 1)
+		for callback in self.rt.on_state_change:
+			callback(self.a)
+		self.index.validate(self.rt)
+		self.assertEqual(self.index.version, version + 2)
+
+	def testRehookOnOtherRecordTimer(self):
+		self.index.validate(self.rt)
+		other = RecordTimer()
+		self.assertEqual(self.index.byService(other), {})
+		self.assertEqual(self.rt.on_state_change, [])
+		self.assertEqual(other.on_state_change, [self.index.invalidate])
+
+
+class TestDescriptionCache(unittest.TestCase):
+	def setUp(self):
+		self.epg = eEPGCache.instance = enigma_fakes.FakeEPGCache()
+		self.epg.descriptions = {
+			(SREF_A, 1): "first",
+			(SREF_A, 3): "third",
+			(SREF_B, 1): "other service",
+		}
+		self.cache = DescriptionCache()
+
+	def testRowsAlignWithKeys(self):
+		keys = [(SREF_A, 1), (SREF_A, 2), (SREF_B, 1), (SREF_A, 3), (SREF_B, 9)]
+		self.assertEqual(self.cache.get(keys), {
+			(SREF_A, 1): "first",
+			(SREF_A, 3): "third",
+			(SREF_B, 1): "other service",
+		})
+		self.assertEqual(len(self.epg.queries), 1)
+		query = self.epg.queries[0]
+		self.assertEqual(query[0], "EX")
+		self.assertEqual(sorted(query[1:]), sorted((sref, 2, eit) for sref, eit in keys))
+
+	def testDuplicatesQueriedOnce(self):
+		self.cache.get([(SREF_A, 1), (SREF_A, 1)])
+		self.assertEqual(self.epg.queries[0][1:], [(SREF_A, 2, 1)])
+
+	def testHitsNotQueried(self):
+		self.cache.get([(SREF_A, 1)])
+		self.assertEqual(self.cache.get([(SREF_A, 1), (SREF_A, 3)]), {(SREF_A, 1): "first", (SREF_A, 3): "third"})
+		self.assertEqual(self.epg.queries[1][1:], [(SREF_A, 2, 3)])
+		self.assertEqual(self.cache.get([(SREF_A, 3)]), {(SREF_A, 3): "third"})
+		self.assertEqual(len(self.epg.queries), 2)
+
+	def testMissesNotCached(self):
+		self.assertEqual(self.cache.get([(SREF_A, 2)]), {})
+		self.epg.descriptions[(SREF_A, 2)] = "late"
+		self.assertEqual(self.cache.get([(SREF_A, 2)]), {(SREF_A, 2): "late"})
+
+	def testLimitAndInvalidate(self):
+		self.cache.maxentries = 2
+		self.cache.get([(SREF_A, 1), (SREF_A, 3)])
+		self.cache.get([(SREF_B, 1)])
+		self.assertEqual(list(self.cache.entries), [(SREF_B, 1)])
+		self.cache.invalidate()
+		self.assertEqual(self.cache.entries, {})
+
+
+if __name__ == '__main__':
+	unittest.main()
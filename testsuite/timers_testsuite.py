@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+
+# installs the enigma2 fakes
+import enigma_fakes  # noqa
+from enigma_fakes import RecordTimer, RecordTimerEntry, ServiceReference
+from controllers.models.timers import batchTimers
+
+SREF_A = "1:0:19:283D:3FB:1:C00000:0:0:0:"
+SREF_B = "1:0:19:2B66:3F3:1:C00000:0:0:0:"
+
+
+class Session(object):
+	def __init__(self):
+		self.nav = self
+		self.RecordTimer = RecordTimer()
+
+
+def add(name, begin, end, sref=SREF_A, **kwargs):
+	op = {"op": "add", "sRef": sref, "begin": begin, "end": end, "name": name, "eit": 1}
+	op.update(kwargs)
+	return op
+
+
+def change(timer, name, begin, end, sref=SREF_A, **kwargs):
+	op = {
+		"op": "change", "channelOld": str(timer.service_ref),
+		"beginOld": timer.begin, "endOld": timer.end,
+		"sRef": sref, "begin": begin, "end": end, "name": name}
+	op.update(kwargs)
+	return op
+
+
+def delete(timer):
+	return {"op": "delete", "sRef": str(timer.service_ref), "begin": timer.begin, "end": timer.end}
+
+
+class TestBatchTimers(unittest.TestCase):
+	def setUp(self):
+		self.session = Session()
+		self.rt = self.session.RecordTimer
+
+	def existing(self, name, begin, end, sref=SREF_A):
+		timer = RecordTimerEntry(ServiceReference(sref), begin, end, name, "", 1)
+		self.rt.timer_list.append(timer)
+		self.rt.timer_list.sort(key=lambda t: t.begin)
+		return timer
+
+	def names(self):
+		return [t.name for t in self.rt.timer_list]
+
+	def testAdd(self):
+		res = batchTimers(self.session, [add("a", 1000, 2000), add("b", "3000.0", 4000, SREF_B)])
+		self.assertTrue(res["result"])
+		self.assertEqual([r["result"] for r in res["results"]], [True, True])
+		self.assertEqual(self.names(), ["a", "b"])
+		self.assertEqual(str(self.rt.timer_list[1].service_ref), SREF_B)
+		self.assertEqual(self.rt.timer_list[1].begin, 3000)
+		self.assertEqual(self.rt.saved, 1)
+
+	def testConflictingAddsFirstWins(self):
+		res = batchTimers(self.session, [add("first", 1000, 2000), add("second", 1500, 2500)])
+		self.assertFalse(res["result"])
+		first, second = res["results"]
+		self.assertTrue(first["result"])
+		self.assertFalse(second["result"])
+		self.assertEqual([c["name"] for c in second["conflicts"]], ["first"])
+		self.assertEqual(self.names(), ["first"])
+
+	def testConflictWithExisting(self):
+		self.existing("old", 1000, 2000)
+		res = batchTimers(self.session, [add("new", 1500, 2500)])
+		self.assertFalse(res["results"][0]["result"])
+		self.assertEqual(res["results"][0]["conflicts"][0]["name"], "old")
+		self.assertEqual(self.names(), ["old"])
+		self.assertEqual(self.rt.saved, 0)
+
+	def testConflictingChangeNotApplied(self):
+		a = self.existing("a", 1000, 2000)
+		self.existing("b", 3000, 4000)
+		res = batchTimers(self.session, [change(a, "moved", 3500, 4500, SREF_B)])
+		result = res["results"][0]
+		self.assertFalse(result["result"])
+		self.assertEqual([c["name"] for c in result["conflicts"]], ["b"])
+		self.assertEqual((a.name, a.begin, a.end, str(a.service_ref)), ("a", 1000, 2000, SREF_A))
+		self.assertEqual(self.rt.saved, 0)
+
+	def testConflictingRepeatingChangeNotApplied(self):
+		a = self.existing("a", 1000, 2000)
+		a.repeated = 127
+		a.backoff = 30
+		self.existing("b", 3000, 4000)
+		res = batchTimers(self.session, [change(a, "moved", 3500, 4500, repeated=31)])
+		self.assertFalse(res["results"][0]["result"])
+		self.assertEqual((a.begin, a.repeated, a.start_prepare, a.backoff), (1000, 127, 980, 30))
+		res = batchTimers(self.session, [change(a, "moved", 5000, 6000, repeated=31)])
+		self.assertTrue(res["results"][0]["result"])
+		self.assertEqual((a.begin, a.repeated, a.start_prepare, a.backoff), (5000, 31, 4980, 0))
+
+	def testChange(self):
+		a = self.existing("a", 1000, 2000)
+		self.existing("b", 3000, 4000)
+		res = batchTimers(self.session, [change(a, "moved", 5000, 6000, tags="x y")])
+		self.assertTrue(res["result"])
+		self.assertEqual((a.name, a.begin, a.end, a.tags), ("moved", 5000, 6000, ["x", "y"]))
+		self.assertEqual(self.names(), ["b", "moved"])
+		self.assertEqual(self.rt.saved, 1)
+
+	def testLaterOperationsSeeEarlierOnes(self):
+		a = self.existing("a", 1000, 2000)
+		res = batchTimers(self.session, [
+			change(a, "a", 5000, 6000),
+			add("b", 1000, 2000),
+			add("c", 5500, 6500),
+		])
+		self.assertEqual([r["result"] for r in res["results"]], [True, True, False])
+		self.assertEqual(self.names(), ["b", "a"])
+		self.assertEqual(self.rt.saved, 1)
+
+	def testDelete(self):
+		a = self.existing("a", 1000, 2000)
+		res = batchTimers(self.session, [delete(a)])
+		self.assertTrue(res["result"])
+		self.assertEqual(self.names(), [])
+		self.assertEqual(self.rt.processed_timers, [])
+		self.assertTrue(a.cancelled)
+		self.assertEqual(self.rt.saved, 1)
+
+	def testSavedOnce(self):
+		a = self.existing("a", 1000, 2000)
+		b = self.existing("b", 3000, 4000)
+		c = self.existing("c", 5000, 6000)
+		res = batchTimers(self.session, [delete(a), delete(b), change(c, "c", 7000, 8000), add("d", 1000, 2000)])
+		self.assertTrue(res["result"])
+		self.assertEqual(self.names(), ["d", "c"])
+		self.assertEqual(self.rt.saved, 1)
+
+	def testNoMatchingTimer(self):
+		a = self.existing("a", 1000, 2000)
+		res = batchTimers(self.session, [delete(a), delete(a), change(a, "x", 1, 2)])
+		self.assertEqual([r["result"] for r in res["results"]], [True, False, False])
+		self.assertEqual(res["results"][1]["message"], "No matching Timer found")
+		self.assertEqual(res["results"][2]["message"], "No matching Timer found")
+
+	def testInvalidOperations(self):
+		res = batchTimers(self.session, [
+			{"op": "rename"},
+			"add",
+			{"op": "add", "sRef": SREF_A},
+			add("a", "soon", 2000),
+			add("b", 1000, 2000),
+		])
+		self.assertFalse(res["result"])
+		results = res["results"]
+		self.assertEqual([r["result"] for r in results], [False, False, False, False, True])
+		self.assertEqual(results[0]["message"], "Unknown timer operation 'rename'")
+		self.assertTrue(results[2]["message"].startswith("Invalid timer operation"))
+		self.assertTrue(results[3]["message"].startswith("Invalid timer operation"))
+		self.assertEqual(self.names(), ["b"])
+
+	def testNothingSaved(self):
+		res = batchTimers(self.session, [])
+		self.assertEqual(res, {"result": True, "results": []})
+		self.assertEqual(self.rt.saved, 0)
+
+
+if __name__ == '__main__':
+	unittest.main()